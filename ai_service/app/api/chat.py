@@ -11,18 +11,25 @@ ONE ENDPOINT - 3 modes:
 1. TEXT:         POST /ai/chat  →  raw JSON body
 2. VOICE:        POST /ai/chat  →  form-data with audio file
 3. PRESCRIPTION: POST /ai/chat  →  form-data with image file
+
+STREAMING GENERAL CHAT:
+   POST /ai/chat/stream  →  raw JSON body, Server-Sent Events response
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional
 from enum import Enum
 from pydantic import BaseModel
+import asyncio
 import requests
 import json
 
-from app.services.stt import SpeechToTextService
-from app.services.ocr import OCRService
-from app.services.extractor import AIExtractorService
+import orjson
+
+from app.services.stt import get_stt_service
+from app.services.ocr import ImageTooLargeError, get_ocr_service
+from app.services.extractor import get_extractor, GENERAL_RESPONSE_FALLBACK
 from app.config import OPENAI_API_KEY
 
 router = APIRouter()
@@ -37,6 +44,10 @@ class ReplyMode(str, Enum):
     both = "both"
 
 
+class StreamChatRequest(BaseModel):
+    text: str
+
+
 # --------------------------------------------------
 # DATABASE API BASE
 # --------------------------------------------------
@@ -162,8 +173,8 @@ async def ai_chat(
                 )
             input_type = "voice"
             audio_bytes = await audio.read()
-            stt_service = SpeechToTextService(api_key=OPENAI_API_KEY)
-            final_text, _ = stt_service.transcribe_audio(
+            stt_service = get_stt_service(OPENAI_API_KEY)
+            final_text, _ = await stt_service.transcribe_audio(
                 audio_bytes=audio_bytes,
                 filename=audio.filename
             )
@@ -171,8 +182,10 @@ async def ai_chat(
         elif file_provided:
             input_type = "prescription"
             file_bytes = await file.read()
-            ocr_service = OCRService(openai_api_key=OPENAI_API_KEY)
-            final_text = ocr_service.extract_text(
+            ocr_service = get_ocr_service(OPENAI_API_KEY)
+            # CPU-heavy OCR + blocking Vision call, keep it off the event loop
+            final_text = await asyncio.to_thread(
+                ocr_service.extract_text,
                 file_bytes=file_bytes,
                 filename=file.filename
             )
@@ -182,6 +195,11 @@ async def ai_chat(
 
     except HTTPException:
         raise
+    except ImageTooLargeError as e:
+        raise HTTPException(
+            status_code=413,
+            detail=str(e)
+        )
     except Exception as e:
         print("REAL STT/OCR ERROR:",e)
         raise HTTPException(
@@ -190,12 +208,28 @@ async def ai_chat(
         )
 
     # --------------------------------------------------
-    # INTENT DETECTION
+    # INTENT DETECTION + PRESCRIPTION → STRUCTURED DATA
     # --------------------------------------------------
-    extractor = AIExtractorService(api_key=OPENAI_API_KEY)
+    # Both GPT calls only need final_text, so they run concurrently
+    extractor = get_extractor(OPENAI_API_KEY)
+
+    async def extract_structured_data():
+        if input_type != "prescription":
+            return None
+        try:
+            return await extractor.extract_prescription_data(
+                raw_text=final_text,
+                return_backend_format=True,
+                user_id=user_id
+            )
+        except Exception:
+            return None
 
     try:
-        intent_result = extractor.extract_voice_intent(final_text)
+        intent_result, structured_data = await asyncio.gather(
+            extractor.extract_voice_intent(final_text),
+            extract_structured_data()
+        )
     except Exception:
         raise HTTPException(status_code=500, detail="AI intent detection failed")
 
@@ -203,21 +237,6 @@ async def ai_chat(
     confidence = intent_result.get("confidence", 0)
     backend_action = intent_result.get("database_action")
 
-    # --------------------------------------------------
-    # PRESCRIPTION → STRUCTURED DATA
-    # --------------------------------------------------
-    structured_data = None
-
-    if input_type == "prescription":
-        try:
-            structured_data = extractor.extract_prescription_data(
-                raw_text=final_text,
-                return_backend_format=True,
-                user_id=user_id
-            )
-        except Exception:
-            structured_data = None
-
     # --------------------------------------------------
     # DATABASE READ (SAFE + TIMEOUT)
     # --------------------------------------------------
@@ -254,7 +273,9 @@ async def ai_chat(
 
             print("FINAL URL:", url)
 
-            response = requests.get(
+            # Blocking HTTP client, run in a worker thread
+            response = await asyncio.to_thread(
+                requests.get,
                 url,
                 params=params,
                 headers={
@@ -280,7 +301,7 @@ async def ai_chat(
     )
     #  GENERAL AI FALLBACK
     if intent == "unclear":
-        assistant_message = extractor.generate_general_response(final_text)
+        assistant_message = await extractor.generate_general_response(final_text)
         backend_action = None
         db_data = None
 
@@ -421,4 +442,50 @@ async def ai_chat(
         "assistant_message": assistant_message,
         "tts": tts_payload,
         "confirmation_needed": intent_result.get("confirmation_needed", False)
-    }
\ No newline at end of file
+    }
+
+
+# --------------------------------------------------
+# STREAMING GENERAL CHAT
+# --------------------------------------------------
+@router.post(
+    "/chat/stream",
+    summary="Streaming general AI chat (text only)",
+    description=(
+        "General conversation answer streamed as Server-Sent Events.\n\n"
+        "Postman Body → raw → JSON:\n"
+        '{"text": "What is a healthy breakfast?"}\n\n'
+        'Each event: data: {"delta": "..."} - stream ends with data: [DONE]'
+    ),
+    tags=["AI Chat"]
+)
+async def ai_chat_stream(body: StreamChatRequest):
+    """
+    Stream a general AI answer token by token.
+
+    Frontend renders text as it arrives instead of waiting
+    for the full completion (same tokens, much faster first byte).
+    """
+
+    if not OPENAI_API_KEY:
+        raise HTTPException(status_code=500, detail="AI service not configured")
+
+    text = body.text.strip()
+    if not text:
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+
+    extractor = get_extractor(OPENAI_API_KEY)
+
+    async def event_stream():
+        sent_any = False
+        try:
+            async for delta in extractor.stream_general_response(text):
+                sent_any = True
+                yield f"data: {orjson.dumps({'delta': delta}).decode()}\n\n"
+        except Exception as e:
+            print("STREAM ERROR:", e)
+            if not sent_any:
+                yield f"data: {orjson.dumps({'delta': GENERAL_RESPONSE_FALLBACK}).decode()}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
@@ -17,15 +17,27 @@ Endpoints:
 - POST /extract/prescription-backend - Extract and convert to backend format
 - POST /extract/prescription-django - Extract and convert to Django format (JSON strings)
 - POST /extract/voice-intent - Extract intent from voice transcription  
+- POST /extract/voice-intent-stream - Same, streamed as Server-Sent Events (intent first)
 - POST /extract/lab-report - Extract lab report data
+- POST /extract/combined - Extract prescription and lab report data in one call
+- POST /extract/all - Run prescription and lab report extraction concurrently
+- POST /extract/prescription-many - Extract many prescriptions concurrently (one call each)
+- POST /extract/prescription-packed - Extract many prescriptions in as few calls as possible
+- POST /extract/prescription-batch - Submit many prescriptions to the Batch API
+- GET /extract/prescription-batch/{batch_id} - Collect batch results
+- POST /extract/lab-report-batch - Submit many lab reports to the Batch API
+- GET /extract/lab-report-batch/{batch_id} - Collect lab report batch results
 """
 
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+import orjson
 
 from app.schemas.extract import ExtractionRequest, ExtractionResponse
-from app.services.extractor import AIExtractorService
+from app.services.extractor import get_extractor
 from app.config import OPENAI_API_KEY
 
 # Create router
@@ -60,6 +72,40 @@ class BackendExtractionRequest(BaseModel):
     )
 
 
+class BatchExtractionRequest(BaseModel):
+    """
+    Request for bulk prescription extraction.
+    
+    Used by /prescription-batch, /lab-report-batch (poll the matching GET endpoint);
+    /prescription-many and /prescription-packed use RealtimeBatchExtractionRequest.
+    """
+    raw_texts: List[str] = Field(
+        ...,
+        min_length=1,
+        description="OCR extracted texts, one per prescription (REQUIRED)"
+    )
+
+
+# Documents per realtime bulk request; each one is a concurrent GPT call
+# (larger sets belong on the Batch API endpoints)
+MAX_REALTIME_DOCUMENTS = 50
+
+
+class RealtimeBatchExtractionRequest(BatchExtractionRequest):
+    """
+    Request for bulk extraction answered in the same response.
+    
+    Used by /prescription-many and /prescription-packed, which start all
+    their GPT calls at once, so the number of documents is capped.
+    """
+    raw_texts: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_REALTIME_DOCUMENTS,
+        description=f"OCR extracted texts, one per prescription (REQUIRED, at most {MAX_REALTIME_DOCUMENTS})"
+    )
+
+
 @router.post(
     "/prescription",
     response_model=ExtractionResponse,
@@ -80,7 +126,7 @@ async def extract_prescription(request: ExtractionRequest):
     What happens here:
     1. Validate raw text is not empty
     2. Check OpenAI API key is configured
-    3. Initialize AI extractor service
+    3. Get shared AI extractor service
     4. Extract data in AI format (text-based)
     5. Return structured response
     
@@ -93,6 +139,8 @@ async def extract_prescription(request: ExtractionRequest):
     
     Parameters:
     - request.raw_text: Unstructured OCR text
+    - request.fields: Only extract these top-level fields (OPTIONAL),
+      e.g. ["medicines"] - smaller, faster GPT response
     
     Returns:
     - ExtractionResponse with AI format data
@@ -118,17 +166,24 @@ async def extract_prescription(request: ExtractionRequest):
         )
     
     try:
-        # Step 3: Initialize AI extractor service
-        extractor = AIExtractorService(api_key=OPENAI_API_KEY)
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
         
         # Step 4: Extract data in AI format (return_backend_format=False)
-        extracted_data = extractor.extract_prescription_data(
-            raw_text=request.raw_text,
-            return_backend_format=False
-        )
+        if request.fields:
+            # Slim path: only the requested fields are generated
+            extracted_data = await extractor.extract_prescription_fields(
+                raw_text=request.raw_text,
+                fields=request.fields
+            )
+        else:
+            extracted_data = await extractor.extract_prescription_data(
+                raw_text=request.raw_text,
+                return_backend_format=False
+            )
         
         # Step 5: Count medicines for response message
-        medicine_count = len(extracted_data.get("medicines", []))
+        medicine_count = len(extracted_data.get("medicines") or [])
         
         # Step 6: Return structured response with AI format
         return ExtractionResponse(
@@ -137,6 +192,13 @@ async def extract_prescription(request: ExtractionRequest):
             message=f"Successfully extracted {medicine_count} medicine(s)"
         )
         
+    except ValueError as error:
+        # Unknown field name
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error)
+        )
+    
     except RuntimeError as error:
         # AI extraction service error
         raise HTTPException(
@@ -176,7 +238,7 @@ async def extract_prescription_backend(request: BackendExtractionRequest):
     What happens here:
     1. Validate raw text is not empty
     2. Check OpenAI API key is configured
-    3. Initialize AI extractor
+    3. Get shared AI extractor
     4. Extract and convert to backend format
     5. Return database-ready JSON
     
@@ -257,12 +319,12 @@ async def extract_prescription_backend(request: BackendExtractionRequest):
         )
     
     try:
-        # Step 3: Initialize AI extractor service
-        extractor = AIExtractorService(api_key=OPENAI_API_KEY)
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
         
         # Step 4: Extract and convert to backend format
         # Pass optional fields (can be None)
-        backend_data = extractor.extract_prescription_data(
+        backend_data = await extractor.extract_prescription_data(
             raw_text=request.raw_text,
             return_backend_format=True,
             user_id=request.user_id,  # Can be None
@@ -329,7 +391,7 @@ async def extract_prescription_django(request: BackendExtractionRequest):
     What happens here:
     1. Validate raw text is not empty
     2. Check OpenAI API key is configured
-    3. Initialize AI extractor
+    3. Get shared AI extractor
     4. Extract and convert to backend format
     5. Convert nested objects to JSON strings
     6. Return Django-ready format
@@ -381,11 +443,11 @@ async def extract_prescription_django(request: BackendExtractionRequest):
         )
     
     try:
-        # Step 3: Initialize AI extractor service
-        extractor = AIExtractorService(api_key=OPENAI_API_KEY)
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
         
         # Step 4: Extract and convert to backend format
-        backend_data = extractor.extract_prescription_data(
+        backend_data = await extractor.extract_prescription_data(
             raw_text=request.raw_text,
             return_backend_format=True,
             user_id=request.user_id,
@@ -463,7 +525,7 @@ async def extract_voice_intent(request: ExtractionRequest):
     What happens here:
     1. Validate transcribed text is not empty
     2. Check OpenAI API key is configured
-    3. Initialize AI extractor
+    3. Get shared AI extractor
     4. Extract intent and relevant data
     5. Return intent with confirmation message
     
@@ -522,11 +584,11 @@ async def extract_voice_intent(request: ExtractionRequest):
         )
     
     try:
-        # Step 3: Initialize AI extractor service
-        extractor = AIExtractorService(api_key=OPENAI_API_KEY)
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
         
         # Step 4: Extract intent from voice transcription
-        intent_data = extractor.extract_voice_intent(request.raw_text)
+        intent_data = await extractor.extract_voice_intent(request.raw_text)
         
         
         # Step 5: Return intent response
@@ -552,6 +614,74 @@ async def extract_voice_intent(request: ExtractionRequest):
         )
 
 
+@router.post(
+    "/voice-intent-stream",
+    summary="Stream intent from voice transcription",
+    description=(
+        "Same as /voice-intent, streamed as Server-Sent Events. "
+        "An 'intent' event with intent and confidence is sent as soon as the model "
+        "has produced them, then a 'result' event with the full intent, then data: [DONE]."
+    )
+)
+async def extract_voice_intent_stream(request: ExtractionRequest):
+    """
+    Stream intent and data from voice input.
+    
+    What happens here:
+    1. Validate transcribed text is not empty
+    2. Check OpenAI API key is configured
+    3. Get shared AI extractor
+    4. Forward each item from the extractor as an SSE event
+    
+    Lets the voice client start TTS or the database lookup on the
+    early 'intent' event instead of waiting for the whole JSON.
+    
+    Parameters:
+    - request.raw_text: Transcribed voice text from STT
+    
+    Returns:
+    - text/event-stream response
+    
+    Called by:
+    - Voice workflow after speech-to-text (streaming clients)
+    
+    Example Output:
+    event: intent
+    data: {"intent": "add_medicine", "confidence": 0.9}
+    
+    event: result
+    data: {"intent": "add_medicine", "confidence": 0.9, "database_action": {...}, ...}
+    
+    data: [DONE]
+    """
+    
+    # Step 1: Validate transcribed text is not empty
+    if not request.raw_text or not request.raw_text.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Transcribed text cannot be empty"
+        )
+    
+    # Step 2: Check OpenAI API key is configured
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI extraction service not configured"
+        )
+    
+    # Step 3: Get shared AI extractor service
+    extractor = get_extractor(OPENAI_API_KEY)
+    
+    # Step 4: Partial items become 'intent' events, the final one a 'result' event
+    async def event_stream():
+        async for item in extractor.extract_voice_intent_stream(request.raw_text):
+            event = "intent" if item.pop("partial", False) else "result"
+            yield f"event: {event}\ndata: {orjson.dumps(item).decode()}\n\n"
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 @router.post(
     "/lab-report",
     response_model=ExtractionResponse,
@@ -569,7 +699,7 @@ async def extract_lab_report(request: ExtractionRequest):
     What happens here:
     1. Validate raw text is not empty
     2. Check OpenAI API key is configured
-    3. Initialize AI extractor
+    3. Get shared AI extractor
     4. Extract all lab test data
     5. Return structured lab results
     
@@ -625,11 +755,11 @@ async def extract_lab_report(request: ExtractionRequest):
         )
     
     try:
-        # Step 3: Initialize AI extractor service
-        extractor = AIExtractorService(api_key=OPENAI_API_KEY)
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
         
         # Step 4: Extract lab report data
-        extracted_data = extractor.extract_lab_report_data(request.raw_text)
+        extracted_data = await extractor.extract_lab_report_data(request.raw_text)
         
         # Step 5: Count tests for response message
         test_count = len(extracted_data.get("tests", []))
@@ -653,4 +783,633 @@ async def extract_lab_report(request: ExtractionRequest):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Extraction failed: {str(error)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post(
+    "/combined",
+    response_model=ExtractionResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Extract prescription and lab report data in one call",
+    description=(
+        "Send OCR text from a document that may contain a prescription, lab results, "
+        "or both. Returns {prescription, lab_report}; a part is null if not present. "
+        "The prescription part is in backend format."
+    )
+)
+async def extract_combined(request: BackendExtractionRequest):
+    """
+    Extract prescription and lab report data from one document.
+    
+    Use for mixed documents (discharge summaries). One GPT call instead
+    of /prescription-backend followed by /lab-report.
+    
+    What happens here:
+    1. Validate raw text is not empty
+    2. Check OpenAI API key is configured
+    3. Get shared AI extractor
+    4. Extract both parts in a single call
+    5. Return both parts
+    
+    Parameters:
+    - request.raw_text: Unstructured OCR text (REQUIRED)
+    - request.user_id, request.doctor_id, request.prescription_image_url: (OPTIONAL)
+    
+    Returns:
+    - ExtractionResponse with {"prescription": ..., "lab_report": ...}
+    
+    Called by:
+    - Frontend after OCR of mixed documents
+    """
+    
+    # Step 1: Validate raw_text
+    if not request.raw_text or not request.raw_text.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Raw text cannot be empty"
+        )
+    
+    # Step 2: Check OpenAI API key is configured
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI extraction service not configured"
+        )
+    
+    try:
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
+        
+        # Step 4: Extract prescription + lab report in one call
+        combined_data = await extractor.extract_combined(
+            raw_text=request.raw_text,
+            return_backend_format=True,
+            user_id=request.user_id,
+            doctor_id=request.doctor_id,
+            prescription_image_url=request.prescription_image_url
+        )
+        
+        # Step 5: Build message from what was found
+        prescription = combined_data.get("prescription") or {}
+        lab_report = combined_data.get("lab_report") or {}
+        medicine_count = len(prescription.get("medicines", []))
+        test_count = len(lab_report.get("tests", []))
+        
+        return ExtractionResponse(
+            success=True,
+            data=combined_data,
+            message=f"Successfully extracted {medicine_count} medicine(s) and {test_count} test(s)"
+        )
+        
+    except RuntimeError as error:
+        # AI extraction service error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(error)
+        )
+    
+    except Exception as error:
+        # Unexpected error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Extraction failed: {str(error)}"
+        )
+
+
+@router.post(
+    "/all",
+    response_model=ExtractionResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Extract prescription and lab report data concurrently",
+    description=(
+        "Send OCR text from a document with both prescription and lab sections. "
+        "Both dedicated extractions run at the same time; returns {prescription, lab} "
+        "in AI format."
+    )
+)
+async def extract_all(request: ExtractionRequest):
+    """
+    Run /prescription and /lab-report extraction on one text concurrently.
+    
+    What happens here:
+    1. Validate raw text is not empty
+    2. Check OpenAI API key is configured
+    3. Get shared AI extractor
+    4. Run both extractions concurrently
+    5. Return both results
+    
+    Parameters:
+    - request.raw_text: Unstructured OCR text
+    
+    Returns:
+    - ExtractionResponse with {"prescription": ..., "lab": ...}
+    
+    Called by:
+    - Frontend after OCR of documents with both sections
+    """
+    
+    # Step 1: Validate raw text is not empty
+    if not request.raw_text or not request.raw_text.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Raw text cannot be empty"
+        )
+    
+    # Step 2: Check OpenAI API key is configured
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI extraction service not configured"
+        )
+    
+    try:
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
+        
+        # Step 4: Both extractions concurrently
+        all_data = await extractor.extract_all(request.raw_text)
+        
+        # Step 5: Return both results
+        medicine_count = len(all_data["prescription"].get("medicines") or [])
+        test_count = len(all_data["lab"].get("tests") or [])
+        
+        return ExtractionResponse(
+            success=True,
+            data=all_data,
+            message=f"Successfully extracted {medicine_count} medicine(s) and {test_count} test(s)"
+        )
+        
+    except RuntimeError as error:
+        # AI extraction service error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(error)
+        )
+    
+    except Exception as error:
+        # Unexpected error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Extraction failed: {str(error)}"
+        )
+
+
+@router.post(
+    "/prescription-many",
+    response_model=ExtractionResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Extract many prescriptions concurrently",
+    description=(
+        "Send many OCR texts and receive backend-format results in input order. "
+        "Each document gets its own GPT call; calls run concurrently up to the "
+        "configured OPENAI_CONCURRENCY."
+    )
+)
+async def extract_prescription_many(request: RealtimeBatchExtractionRequest):
+    """
+    Extract many prescriptions concurrently.
+    
+    What happens here:
+    1. Validate no text is empty
+    2. Check OpenAI API key is configured
+    3. Get shared AI extractor
+    4. Extract all documents concurrently
+    5. Return per-document results
+    
+    Parameters:
+    - request.raw_texts: List of OCR texts
+    
+    Returns:
+    - ExtractionResponse with {"results": [{"index", "data", "error"}, ...]}
+    
+    Called by:
+    - Frontend multi-file upload
+    """
+    
+    # Step 1: Validate every text
+    if any(not raw_text or not raw_text.strip() for raw_text in request.raw_texts):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Raw texts cannot be empty"
+        )
+    
+    # Step 2: Check OpenAI API key is configured
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI extraction service not configured"
+        )
+    
+    try:
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
+        
+        # Step 4: Concurrent extraction
+        results = await extractor.extract_prescription_data_many(
+            request.raw_texts,
+            return_backend_format=True
+        )
+        
+        # Step 5: Return per-document results
+        success_count = sum(1 for result in results if result["error"] is None)
+        
+        return ExtractionResponse(
+            success=True,
+            data={"results": results},
+            message=f"Successfully extracted {success_count} of {len(results)} prescription(s)"
+        )
+        
+    except Exception as error:
+        # Unexpected error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Extraction failed: {str(error)}"
+        )
+
+
+@router.post(
+    "/prescription-packed",
+    response_model=ExtractionResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Extract many prescriptions in packed GPT calls",
+    description=(
+        "Send many short OCR texts and receive AI-format results keyed by "
+        "document id (doc-0, doc-1, ...). Documents are packed several per "
+        "GPT call, which is cheaper and faster than one call each."
+    )
+)
+async def extract_prescription_packed(request: RealtimeBatchExtractionRequest):
+    """
+    Extract many prescriptions now (not via the 24h Batch API).
+    
+    What happens here:
+    1. Validate no text is empty
+    2. Check OpenAI API key is configured
+    3. Get shared AI extractor
+    4. Extract all documents in packed calls
+    5. Return results keyed by document id
+    
+    Parameters:
+    - request.raw_texts: List of OCR texts
+    
+    Returns:
+    - ExtractionResponse with {"doc-0": {...}, "doc-1": {...}}
+    
+    Called by:
+    - Frontend folder upload
+    """
+    
+    # Step 1: Validate every text
+    if any(not raw_text or not raw_text.strip() for raw_text in request.raw_texts):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Raw texts cannot be empty"
+        )
+    
+    # Step 2: Check OpenAI API key is configured
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI extraction service not configured"
+        )
+    
+    try:
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
+        
+        # Step 4: Packed extraction
+        results = await extractor.extract_prescription_data_packed(request.raw_texts)
+        
+        # Step 5: Return results keyed by document id
+        return ExtractionResponse(
+            success=True,
+            data=results,
+            message=f"Successfully extracted {len(results)} of {len(request.raw_texts)} prescription(s)"
+        )
+        
+    except RuntimeError as error:
+        # AI extraction service error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(error)
+        )
+    
+    except Exception as error:
+        # Unexpected error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Extraction failed: {str(error)}"
+        )
+
+
+@router.post(
+    "/prescription-batch",
+    response_model=ExtractionResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit prescriptions for batch extraction",
+    description=(
+        "Send many OCR texts for offline extraction via the OpenAI Batch API "
+        "(50% cheaper, results within 24h). Returns a batch_id to poll."
+    )
+)
+async def submit_prescription_batch(request: BatchExtractionRequest):
+    """
+    Submit many prescriptions for offline extraction.
+    
+    Use this for bulk work (backfills, re-processing) where nobody
+    is waiting on the answer. Interactive uploads should keep using
+    /prescription or /prescription-backend.
+    
+    What happens here:
+    1. Validate no text is empty
+    2. Check OpenAI API key is configured
+    3. Get shared AI extractor
+    4. Submit batch job
+    5. Return batch id
+    
+    Parameters:
+    - request.raw_texts: List of OCR texts
+    
+    Returns:
+    - ExtractionResponse with batch_id, status, request_count
+    
+    Called by:
+    - Admin / backfill scripts
+    """
+    
+    # Step 1: Validate every text
+    if any(not raw_text or not raw_text.strip() for raw_text in request.raw_texts):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Raw texts cannot be empty"
+        )
+    
+    # Step 2: Check OpenAI API key is configured
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI extraction service not configured"
+        )
+    
+    try:
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
+        
+        # Step 4: Submit batch job
+        batch_info = await extractor.submit_batch(request.raw_texts, kind="prescription")
+        
+        # Step 5: Return batch id for polling
+        return ExtractionResponse(
+            success=True,
+            data=batch_info,
+            message=f"Submitted {batch_info['request_count']} prescription(s) for batch extraction"
+        )
+        
+    except RuntimeError as error:
+        # Batch API error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(error)
+        )
+    
+    except Exception as error:
+        # Unexpected error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch submission failed: {str(error)}"
+        )
+
+
+@router.get(
+    "/prescription-batch/{batch_id}",
+    response_model=ExtractionResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Collect batch extraction results",
+    description=(
+        "Returns batch status, and the extracted prescriptions once the batch "
+        "has completed. Set backend_format=true for database-ready format."
+    )
+)
+async def collect_prescription_batch(batch_id: str, backend_format: bool = False):
+    """
+    Collect results of a prescription batch.
+    
+    What happens here:
+    1. Check OpenAI API key is configured
+    2. Get shared AI extractor
+    3. Retrieve batch status and results
+    4. Return results (or status only if still running)
+    
+    Parameters:
+    - batch_id: Id returned by POST /extract/prescription-batch
+    - backend_format: Convert each result to backend format (query param)
+    
+    Returns:
+    - ExtractionResponse with batch_id, status, results
+    
+    Called by:
+    - Admin / backfill scripts (polling)
+    """
+    
+    # Step 1: Check OpenAI API key is configured
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI extraction service not configured"
+        )
+    
+    try:
+        # Step 2: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
+        
+        # Step 3: Retrieve batch results
+        batch_result = await extractor.collect_batch(
+            batch_id=batch_id,
+            kind="prescription",
+            return_backend_format=backend_format
+        )
+        
+        # Step 4: Build message from status
+        if batch_result["results"] is None:
+            message = f"Batch is {batch_result['status']}"
+        else:
+            message = f"Collected {len(batch_result['results'])} batch result(s)"
+        
+        return ExtractionResponse(
+            success=True,
+            data=batch_result,
+            message=message
+        )
+        
+    except ValueError as error:
+        # Batch id belongs to another kind
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error)
+        )
+    
+    except RuntimeError as error:
+        # Batch API error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(error)
+        )
+    
+    except Exception as error:
+        # Unexpected error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch collection failed: {str(error)}"
+        )
+
+
+@router.post(
+    "/lab-report-batch",
+    response_model=ExtractionResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Submit lab reports for batch extraction",
+    description=(
+        "Send many lab report OCR texts for offline extraction via the OpenAI Batch API "
+        "(50% cheaper, results within 24h). Returns a batch_id to poll."
+    )
+)
+async def submit_lab_report_batch(request: BatchExtractionRequest):
+    """
+    Submit many lab reports for offline extraction (e.g. PDF backfills).
+    
+    What happens here:
+    1. Validate no text is empty
+    2. Check OpenAI API key is configured
+    3. Get shared AI extractor
+    4. Submit batch job
+    5. Return batch id
+    
+    Parameters:
+    - request.raw_texts: List of lab report OCR texts
+    
+    Returns:
+    - ExtractionResponse with batch_id, kind, status, request_count
+    
+    Called by:
+    - Admin / backfill scripts
+    """
+    
+    # Step 1: Validate every text
+    if any(not raw_text or not raw_text.strip() for raw_text in request.raw_texts):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Raw texts cannot be empty"
+        )
+    
+    # Step 2: Check OpenAI API key is configured
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI extraction service not configured"
+        )
+    
+    try:
+        # Step 3: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
+        
+        # Step 4: Submit batch job
+        batch_info = await extractor.submit_batch(request.raw_texts, kind="lab_report")
+        
+        # Step 5: Return batch id for polling
+        return ExtractionResponse(
+            success=True,
+            data=batch_info,
+            message=f"Submitted {batch_info['request_count']} lab report(s) for batch extraction"
+        )
+        
+    except RuntimeError as error:
+        # Batch API error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(error)
+        )
+    
+    except Exception as error:
+        # Unexpected error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch submission failed: {str(error)}"
+        )
+
+
+@router.get(
+    "/lab-report-batch/{batch_id}",
+    response_model=ExtractionResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Collect lab report batch results",
+    description=(
+        "Returns batch status, and the extracted lab reports once the batch "
+        "has completed."
+    )
+)
+async def collect_lab_report_batch(batch_id: str):
+    """
+    Collect results of a lab report batch.
+    
+    What happens here:
+    1. Check OpenAI API key is configured
+    2. Get shared AI extractor
+    3. Retrieve batch status and results
+    4. Return results (or status only if still running)
+    
+    Parameters:
+    - batch_id: Id returned by POST /extract/lab-report-batch
+    
+    Returns:
+    - ExtractionResponse with batch_id, kind, status, results
+    
+    Called by:
+    - Admin / backfill scripts (polling)
+    """
+    
+    # Step 1: Check OpenAI API key is configured
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="AI extraction service not configured"
+        )
+    
+    try:
+        # Step 2: Get shared AI extractor service
+        extractor = get_extractor(OPENAI_API_KEY)
+        
+        # Step 3: Retrieve batch results
+        batch_result = await extractor.collect_batch(batch_id=batch_id, kind="lab_report")
+        
+        # Step 4: Build message from status
+        if batch_result["results"] is None:
+            message = f"Batch is {batch_result['status']}"
+        else:
+            message = f"Collected {len(batch_result['results'])} batch result(s)"
+        
+        return ExtractionResponse(
+            success=True,
+            data=batch_result,
+            message=message
+        )
+        
+    except ValueError as error:
+        # Batch id belongs to another kind
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error)
+        )
+    
+    except RuntimeError as error:
+        # Batch API error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(error)
+        )
+    
+    except Exception as error:
+        # Unexpected error
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Batch collection failed: {str(error)}"
+        )
@@ -20,13 +20,15 @@ Flow:
 User uploads file → This API → OCRService → Extract text → Return JSON
 """
 
+import asyncio
+
 from fastapi import APIRouter, UploadFile, File, HTTPException, status
 
 # Import response schema (defines JSON structure)
 from app.schemas.ocr import OCRResponse
 
 # Import OCR service (does the actual text extraction)
-from app.services.ocr import OCRService
+from app.services.ocr import ImageTooLargeError, get_ocr_service
 
 # Import OpenAI API key from config
 from app.config import OPENAI_API_KEY
@@ -72,6 +74,7 @@ async def extract_text_from_document(file: UploadFile = File(...)):
 
     Errors:
     - 400 Bad Request: File is missing or empty
+    - 413 Payload Too Large: Image exceeds the size or pixel limit
     - 500 Internal Server Error: OCR processing failed
     
     Called by:
@@ -104,10 +107,10 @@ async def extract_text_from_document(file: UploadFile = File(...)):
         )
 
     try:
-        # Step 4: Initialize the OCR service
+        # Step 4: Get the shared OCR service
         # Pass OpenAI API key so service can use Vision API
         # If OPENAI_API_KEY is None, service will only use Tesseract
-        ocr_service = OCRService(openai_api_key=OPENAI_API_KEY)
+        ocr_service = get_ocr_service(OPENAI_API_KEY)
 
         # Step 5: Extract text from the document
         # This calls the extract_text() method in OCRService
@@ -116,7 +119,10 @@ async def extract_text_from_document(file: UploadFile = File(...)):
         # - Use appropriate extraction method
         # - Try OpenAI Vision for handwritten text
         # - Fallback to Tesseract if needed
-        raw_text = ocr_service.extract_text(
+        # Runs in a worker thread: OCR is CPU-heavy and the Vision call
+        # blocks, and this route must not stall the event loop meanwhile
+        raw_text = await asyncio.to_thread(
+            ocr_service.extract_text,
             file_bytes=file_bytes,  # File content as bytes
             filename=file.filename  # Original filename
         )
@@ -126,6 +132,13 @@ async def extract_text_from_document(file: UploadFile = File(...)):
         # It will automatically convert to JSON format
         return OCRResponse(raw_text=raw_text)
 
+    except ImageTooLargeError as error:
+        # Image over the per-request memory budget
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(error)
+        )
+
     except ValueError as error:
         # ValueError is raised for known issues:
         # - Unsupported file type (not PDF/DOCX/Image)
@@ -6,6 +6,7 @@ This file defines all voice-related API endpoints.
 Current endpoints:
 - POST /voice/stt - Speech to Text
 - POST /voice/tts - Text to Speech
+- POST /voice/tts-stream - Text to Speech, streamed (Opus)
 
 This file does NOT:
 - Talk to the database
@@ -14,11 +15,11 @@ This file does NOT:
 """
 
 from fastapi import APIRouter, UploadFile, File, HTTPException, status
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
 
 from app.schemas.voice import STTResponse, TTSRequest
-from app.services.stt import SpeechToTextService
-from app.services.tts import TextToSpeechService
+from app.services.stt import get_stt_service
+from app.services.tts import get_tts_service
 from app.config import OPENAI_API_KEY
 
 # Create a router object for all voice-related endpoints
@@ -78,11 +79,12 @@ async def speech_to_text(file: UploadFile = File(...)):
         )
 
     try:
-        # Step 5: Initialize the Speech-to-Text service
-        stt_service = SpeechToTextService(api_key=OPENAI_API_KEY)
+        # Step 5: Get shared Speech-to-Text service
+        stt_service = get_stt_service(OPENAI_API_KEY)
 
         # Step 6: Perform speech-to-text conversion
-        text, language = stt_service.transcribe_audio(
+        # (async SDK call, the event loop stays free meanwhile)
+        text, language = await stt_service.transcribe_audio(
             audio_bytes=audio_bytes,
             filename=file.filename
         )
@@ -132,7 +134,7 @@ async def text_to_speech(request: TTSRequest):
     Step-by-step process:
     1. Receive text from request
     2. Validate text is not empty
-    3. Initialize TTS service
+    3. Get shared TTS service
     4. Generate audio
     5. Return audio as MP3 file
     
@@ -172,12 +174,12 @@ async def text_to_speech(request: TTSRequest):
         )
     
     try:
-        # Step 4: Initialize the Text-to-Speech service
-        tts_service = TextToSpeechService(api_key=OPENAI_API_KEY)
+        # Step 4: Get shared Text-to-Speech service
+        tts_service = get_tts_service(OPENAI_API_KEY)
         
         # Step 5: Generate audio
         # Pass voice and speed from request, or use defaults
-        audio_bytes = tts_service.generate_speech(
+        audio_bytes = await tts_service.generate_speech(
             text=request.text,
             voice=request.voice if request.voice else "nova",
             speed=request.speed if request.speed else 1.0
@@ -213,4 +215,95 @@ async def text_to_speech(request: TTSRequest):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to generate speech: {str(error)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post(
+    "/tts-stream",
+    status_code=status.HTTP_200_OK,
+    summary="Convert text to speech (streamed)",
+    description=(
+        "Send text and receive Opus audio as it is generated. "
+        "Playback can start before the whole reminder is synthesized."
+    ),
+    responses={
+        200: {
+            "description": "Audio stream",
+            "content": {
+                "audio/ogg": {
+                    "schema": {
+                        "type": "string",
+                        "format": "binary"
+                    }
+                }
+            }
+        }
+    }
+)
+async def text_to_speech_stream(request: TTSRequest):
+    """
+    Streaming Text-to-Speech endpoint.
+    
+    Same input as /voice/tts, but the audio (Opus in an Ogg container)
+    is relayed chunk by chunk while OpenAI generates it, instead of
+    after the full MP3 is ready.
+    
+    Step-by-step process:
+    1. Validate text
+    2. Get shared TTS service
+    3. Start the audio stream (validation errors are raised here)
+    4. Return it as a streaming response
+    
+    Parameters:
+    - request: TTSRequest (text, voice, speed)
+    
+    Returns:
+    - Streamed audio (audio/ogg, Opus)
+    
+    Called by:
+    - Mobile app (reminders read aloud with low time-to-first-audio)
+    """
+    
+    # Step 1: Validate that text is provided
+    if not request.text or not request.text.strip():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Text cannot be empty"
+        )
+    
+    if len(request.text) > 4000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Text is too long (maximum 4000 characters)"
+        )
+    
+    if not OPENAI_API_KEY:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="OpenAI API key is not configured"
+        )
+    
+    # Step 2: Get shared Text-to-Speech service
+    tts_service = get_tts_service(OPENAI_API_KEY)
+    
+    try:
+        # Step 3: Create the chunk iterator (the API call starts on first read)
+        audio_chunks = tts_service.stream_speech(
+            text=request.text,
+            voice=request.voice if request.voice else "nova",
+            speed=request.speed if request.speed else 1.0
+        )
+    except ValueError as error:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error)
+        )
+    
+    # Step 4: Stream it
+    return StreamingResponse(
+        audio_chunks,
+        media_type="audio/ogg",
+        headers={
+            "Content-Disposition": "inline; filename=speech.ogg"
+        }
+    )
@@ -13,3 +13,16 @@ load_dotenv()
 # Read OpenAI API key once
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DJANGO_ACCESS_TOKEN = os.getenv("DJANGO_ACCESS_TOKEN")
+
+# OpenAI client-side limits (per process)
+# OPENAI_CONCURRENCY: max requests in flight at once
+# OPENAI_REQUESTS_PER_MINUTE / OPENAI_TOKENS_PER_MINUTE: 0 = no client-side limit
+# OPENAI_MAX_RETRIES: SDK retries for 429/5xx (exponential backoff, honours Retry-After)
+OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "8"))
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "0"))
+OPENAI_TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TOKENS_PER_MINUTE", "0"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+
+# Lab reports whose (compressed, clipped) text is at most this many characters
+# are extracted with gpt-4o-mini instead of gpt-4o. 0 = always gpt-4o (default).
+LAB_REPORT_SMALL_MODEL_MAX_CHARS = int(os.getenv("LAB_REPORT_SMALL_MODEL_MAX_CHARS", "0"))
@@ -12,7 +12,7 @@ These schemas define:
 """
 
 from pydantic import BaseModel, Field, field_validator, model_validator
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 
 class ExtractionRequest(BaseModel):
@@ -47,6 +47,13 @@ class ExtractionRequest(BaseModel):
         examples=["en"]
     )
     
+    # Prescription only: return just these top-level fields
+    fields: Optional[List[str]] = Field(
+        default=None,
+        description="Prescription fields to extract (optional, default all)",
+        examples=[["medicines"]]
+    )
+    
     @model_validator(mode='after')
     def validate_text_present(self):
         """
@@ -18,12 +18,24 @@ UPDATES:
 """
 
 import re
+import functools
 from typing import Dict, Any, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+# Regex patterns compiled once per process and shared by all converters
+_NUM_RE = re.compile(r'(\d+)')  # First standalone number
+_TIMES_RE = re.compile(r'(\d+)\s*(?:x|times)\b')  # "3x a day", "3 times daily"
+_QUANTITY_RE = re.compile(r'#(\d+)')  # "#60", "#300"
+_DOSE_SPLIT_RE = re.compile(r'&|and')  # "after breakfast & after dinner"
+
+# Days per duration unit, checked in this order anywhere in the text
+# ("1-2 weeks", "7 (seven) days"); None means no unit was found (assume days)
+_DAYS_PER_UNIT = {"week": 7, "month": 30, None: 1}
+
+
 class DataConverterService:
     """
     DataConverterService converts AI extraction output
@@ -44,6 +56,7 @@ class DataConverterService:
         
         What happens here:
         - Create frequency mapping dictionary
+        - Compile the frequency phrase pattern from the map
         - Set up logging
         """
         
@@ -81,6 +94,20 @@ class DataConverterService:
             "every 12 hours": 2
         }
         
+        # Single-pass scan for any frequency phrase embedded in longer text
+        # ("take twice daily after food"). Longest phrases first so
+        # "twice daily" wins over "daily".
+        frequency_phrases = sorted(self.frequency_map, key=len, reverse=True)
+        self._frequency_re = re.compile(
+            r'\b(' + '|'.join(re.escape(p) for p in frequency_phrases) + r')\b'
+        )
+        
+        # Per-instance memoization of the pure text parsers.
+        # Prescriptions repeat phrases like "twice daily" and "7 days",
+        # so repeated calls become a single dict lookup.
+        self._parse_frequency_text = functools.lru_cache(maxsize=2048)(self._parse_frequency_text)
+        self._parse_duration_text = functools.lru_cache(maxsize=2048)(self._parse_duration_text)
+        
         logger.info("Data converter initialized")
     
     def parse_frequency(self, frequency_text: str) -> int:
@@ -93,8 +120,10 @@ class DataConverterService:
         1. Check for multiple doses with "&" or "and"
         2. Normalize text to lowercase
         3. Check against frequency map
-        4. Try to extract number from text (e.g., "3x a day")
-        5. Return default if cannot parse
+        4. Try to extract a count from text (e.g., "3x a day", "3 times daily")
+        5. Scan for a known frequency phrase inside longer text
+        6. Fall back to the first standalone number
+        7. Return default if cannot parse
         
         Parameters:
         - frequency_text: Text like "twice daily", "3 times a day", "after breakfast & after dinner"
@@ -110,6 +139,8 @@ class DataConverterService:
         "3 times daily" becomes 3
         "after breakfast & after dinner" becomes 2
         "every 8 hours" becomes 3
+        "take twice daily after food" becomes 2
+        "1 tab every 8 hours" becomes 3
         """
         
         # Step 1: Check if text is empty
@@ -117,42 +148,58 @@ class DataConverterService:
             logger.warning("Empty frequency text, defaulting to 1")
             return 1
         
-        # Step 2: Normalize text to lowercase
-        text = frequency_text.lower().strip()
+        # Step 2: Normalize text to lowercase and parse (memoized)
+        return self._parse_frequency_text(frequency_text.lower().strip())
+    
+    def _parse_frequency_text(self, text: str) -> int:
+        """
+        Parse normalized (lowercase, stripped) frequency text.
+        
+        Memoized per instance in __init__, see parse_frequency().
+        """
         
         # Step 3: NEW - Check for multiple doses pattern with "&" or "and"
         # Example: "after breakfast & after dinner" = 2 doses
         if "&" in text or " and " in text:
-            parts = re.split(r'&|and', text)
+            parts = _DOSE_SPLIT_RE.split(text)
             count = len([p for p in parts if p.strip()])
             if count > 1:
-                logger.info(f"Detected {count} doses from multiple pattern in '{frequency_text}'")
+                logger.info("Detected %d doses from multiple pattern in '%s'", count, text)
                 return count
         
         # Step 4: Check direct mapping
         if text in self.frequency_map:
             result = self.frequency_map[text]
-            logger.info(f"Frequency '{frequency_text}' converted to {result}")
+            logger.info("Frequency '%s' converted to %d", text, result)
             return result
         
-        # Step 5: Try to extract number from text with "x" pattern
-        # Pattern: "3x a day" or "2x daily"
-        numbers = re.findall(r'(\d+)\s*x', text)
-        if numbers:
-            result = int(numbers[0])
-            logger.info(f"Extracted frequency from '{frequency_text}' is {result}")
+        # Step 5: Try to extract a count with "x" or "times"
+        # Pattern: "3x a day", "2x daily" or "3 times daily"
+        match = _TIMES_RE.search(text)
+        if match:
+            result = int(match.group(1))
+            logger.info("Extracted frequency from '%s' is %d", text, result)
             return result
         
-        # Step 6: Try to extract standalone number
-        # Pattern: "3 times daily" or "take 2 times"
-        numbers = re.findall(r'\d+', text)
-        if numbers:
-            result = int(numbers[0])
-            logger.info(f"Extracted frequency from '{frequency_text}' is {result}")
+        # Step 6: Look for a known frequency phrase anywhere in the text,
+        # before any bare number ("1 tab twice daily", "every 8 hours after food")
+        # (bare "daily" says nothing about the count, so "take 2 daily" stays 2)
+        match = self._frequency_re.search(text)
+        if match and not (match.group(1) == "daily" and _NUM_RE.search(text)):
+            result = self.frequency_map[match.group(1)]
+            logger.info("Matched frequency phrase '%s' in '%s' is %d", match.group(1), text, result)
             return result
         
-        # Step 7: Default to 1 if cannot parse
-        logger.warning(f"Could not parse frequency '{frequency_text}', defaulting to 1")
+        # Step 7: Try to extract standalone number
+        # Pattern: "take 2 daily"
+        match = _NUM_RE.search(text)
+        if match:
+            result = int(match.group(1))
+            logger.info("Extracted frequency from '%s' is %d", text, result)
+            return result
+        
+        # Step 8: Default to 1 if cannot parse
+        logger.warning("Could not parse frequency '%s', defaulting to 1", text)
         return 1
     
     def parse_duration(
@@ -169,7 +216,7 @@ class DataConverterService:
         What happens here:
         1. If #number is provided (e.g., #60, #300), calculate: duration = #number / how_many_time
         2. Otherwise, normalize text
-        3. Extract number
+        3. Extract number and unit
         4. Convert weeks or months to days
         5. Return days as integer
         
@@ -197,7 +244,10 @@ class DataConverterService:
         # This gives most accurate duration
         if quantity_number and quantity_number > 0 and how_many_time > 0:
             calculated_days = quantity_number // how_many_time
-            logger.info(f"Calculated duration from #number: #{quantity_number} ÷ {how_many_time}/day = {calculated_days} days")
+            logger.info(
+                "Calculated duration from #number: #%s ÷ %s/day = %s days",
+                quantity_number, how_many_time, calculated_days
+            )
             return calculated_days
         
         # Step 2: Check if text is empty
@@ -205,31 +255,31 @@ class DataConverterService:
             logger.warning("Empty duration text, defaulting to 30 days")
             return 30
         
-        # Step 3: Normalize text to lowercase
-        text = duration_text.lower().strip()
+        # Step 3: Normalize text to lowercase and parse (memoized)
+        return self._parse_duration_text(duration_text.lower().strip())
+    
+    def _parse_duration_text(self, text: str) -> int:
+        """
+        Parse normalized (lowercase, stripped) duration text to days.
+        
+        Memoized per instance in __init__, see parse_duration().
+        """
         
         # Step 4: Extract number from text
-        numbers = re.findall(r'\d+', text)
-        if not numbers:
-            logger.warning(f"No number in duration '{duration_text}', defaulting to 30 days")
+        match = _NUM_RE.search(text)
+        if not match:
+            logger.warning("No number in duration '%s', defaulting to 30 days", text)
             return 30
         
-        number = int(numbers[0])
+        number = int(match.group(1))
         
-        # Step 5: Convert based on unit (weeks or months)
-        if "week" in text:
-            result = number * 7
-            logger.info(f"Duration '{duration_text}' converted to {result} days")
-            return result
-        
-        elif "month" in text:
-            result = number * 30
-            logger.info(f"Duration '{duration_text}' converted to {result} days")
-            return result
+        # The unit need not follow the number directly
+        unit = next((name for name in ("week", "month") if name in text), None)
         
-        else:  # Assume days if no unit specified
-            logger.info(f"Duration '{duration_text}' is {number} days")
-            return number
+        # Step 5: Convert based on unit (assume days if no unit specified)
+        result = number * _DAYS_PER_UNIT[unit]
+        logger.info("Duration '%s' converted to %d days", text, result)
+        return result
     
     def parse_meal_timing(self, instructions: str) -> Dict[str, bool]:
         """
@@ -268,19 +318,21 @@ class DataConverterService:
         text = instructions.lower()
         
         # Step 3: Check for "before" keywords
-        before_keywords = ["before", "empty stomach", "before food", "before eating"]
-        before_meal = any(keyword in text for keyword in before_keywords)
-        
-        # Step 4: NEW - Enhanced "after" keywords (including meal times and bedtime)
-        after_keywords = [
-            "after", "with food", "with meal", "with meals",
-            "after food", "after eating",
-            "after breakfast", "after lunch", "after dinner",
-            "at bedtime", "bedtime"  # Bedtime often taken with or after food
-        ]
-        after_meal = any(keyword in text for keyword in after_keywords)
-        
-        logger.info(f"Meal timing from '{instructions}' is before: {before_meal}, after: {after_meal}")
+        # "before food", "before eating" are covered by "before"
+        before_meal = "before" in text or "empty stomach" in text
+        
+        # Step 4: Check for "after" keywords (including meal times and bedtime)
+        # "after food", "after dinner" etc. are covered by "after",
+        # "with meals" by "with meal", "at bedtime" by "bedtime".
+        # Bedtime is often taken with or after food
+        after_meal = (
+            "after" in text
+            or "with food" in text
+            or "with meal" in text
+            or "bedtime" in text
+        )
+        
+        logger.info("Meal timing from '%s' is before: %s, after: %s", instructions, before_meal, after_meal)
         
         return {
             "before_meal": before_meal,
@@ -315,18 +367,18 @@ class DataConverterService:
         # Check quantity field for #number
         quantity = medicine.get("quantity", "")
         if isinstance(quantity, str) and "#" in quantity:
-            numbers = re.findall(r'#(\d+)', quantity)
-            if numbers:
-                logger.info(f"Extracted quantity number: #{numbers[0]}")
-                return int(numbers[0])
+            match = _QUANTITY_RE.search(quantity)
+            if match:
+                logger.info("Extracted quantity number: #%s", match.group(1))
+                return int(match.group(1))
         
         # Check duration field for #number
         duration = medicine.get("duration", "")
         if isinstance(duration, str) and "#" in duration:
-            numbers = re.findall(r'#(\d+)', duration)
-            if numbers:
-                logger.info(f"Extracted quantity number from duration: #{numbers[0]}")
-                return int(numbers[0])
+            match = _QUANTITY_RE.search(duration)
+            if match:
+                logger.info("Extracted quantity number from duration: #%s", match.group(1))
+                return int(match.group(1))
         
         return None
     
@@ -398,7 +450,10 @@ class DataConverterService:
         # Step 6: Parse meal timing from instructions
         meal_timing = self.parse_meal_timing(instructions)
         
-        logger.info(f"Converted medicine: {name} is {how_many_time} times per day for {how_many_day} days equals {stock} total")
+        logger.info(
+            "Converted medicine: %s is %s times per day for %s days equals %s total",
+            name, how_many_time, how_many_day, stock
+        )
         
         # Step 7: Return backend format
         def build_slot(enabled: bool):
@@ -443,6 +498,67 @@ class DataConverterService:
 
        
     
+    def convert_medicines_batch(
+        self,
+        medicines: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Convert a list of medicines from AI format to backend format.
+        
+        What happens here:
+        1. Walk the list once, converting each medicine
+        2. Reuse the result for repeated rows (same name, frequency,
+           duration, quantity and instructions)
+        3. Skip (and log) any medicine that fails to convert
+        4. Return converted medicines in the original order
+        
+        Repeated frequency/duration phrases across the list hit the
+        memoized parsers, so each distinct phrase is parsed only once.
+        Repeated rows share one converted dict (callers only serialize it).
+        
+        Parameters:
+        - medicines: List of AI extraction medicine objects
+        
+        Returns:
+        - List of backend medicine objects
+        
+        Called by:
+        - convert_prescription_to_backend() method
+        """
+        
+        backend_medicines = []
+        append = backend_medicines.append
+        convert = self.convert_medicine
+        converted_rows = {}
+        
+        for med in medicines:
+            try:
+                # Every field convert_medicine() reads is part of the key
+                key = (
+                    med.get("name"),
+                    med.get("frequency"),
+                    med.get("duration"),
+                    med.get("quantity"),
+                    med.get("instructions"),
+                )
+                try:
+                    converted = converted_rows.get(key)
+                except TypeError:
+                    # Unhashable field value, convert without deduplication
+                    key = None
+                    converted = None
+                
+                if converted is None:
+                    converted = convert(med)
+                    if key is not None:
+                        converted_rows[key] = converted
+                append(converted)
+            except Exception as e:
+                # Log error but continue with other medicines
+                logger.error("Failed to convert medicine %s: %s", med.get('name'), e)
+        
+        return backend_medicines
+    
     def convert_prescription_to_backend(
         self, 
         ai_output: Dict[str, Any],
@@ -467,7 +583,8 @@ class DataConverterService:
         2. Convert all medicines to backend format
         3. Extract medical tests if any
         4. Extract next appointment date
-        5. Build final structure matching backend database
+        5. Build final structure matching backend database (same key
+           order as the API response, so callers return it as-is)
         6. Return complete backend-ready format
         
         Parameters:
@@ -502,28 +619,19 @@ class DataConverterService:
             }
         
         # Step 3: Convert all medicines from AI format to backend format
-        ai_medicines = ai_output.get("medicines", [])
-        backend_medicines = []
-        
-        for med in ai_medicines:
-            try:
-                # Convert each medicine
-                converted = self.convert_medicine(med)
-                backend_medicines.append(converted)
-            except Exception as e:
-                # Log error but continue with other medicines
-                logger.error(f"Failed to convert medicine {med.get('name')}: {e}")
-                continue
+        # Fast path: GPT may return an empty list (or null) when no drugs were readable
+        ai_medicines = ai_output.get("medicines") or []
+        backend_medicines = self.convert_medicines_batch(ai_medicines) if ai_medicines else []
         
         # Step 4: Extract medical tests (currently not extracted by AI)
         medical_tests = []
         
         # Step 5: NEW - Extract next appointment date from AI output
-        next_appointment_raw = ai_output.get("next_appointment")
-        next_appointment_date = next_appointment_raw if next_appointment_raw else None
+        next_appointment_date = ai_output.get("next_appointment") or None
         
         # Step 6: Build final backend format
         backend_format = {
+            "id": None,  # DB will assign
             "users": user_id,  # Can be None
             "doctor": doctor_id,  # Can be None
             "prescription_image": prescription_image_url,  # Can be None
@@ -533,8 +641,8 @@ class DataConverterService:
             "medical_tests": medical_tests
         }
         
-        logger.info(f"Conversion complete: {len(backend_medicines)} medicines converted")
-        logger.info(f"Patient sex: {patient_sex}, Next appointment: {next_appointment_date}")
+        logger.info("Conversion complete: %d medicines converted", len(backend_medicines))
+        logger.debug("Patient sex: %s, Next appointment: %s", patient_sex, next_appointment_date)
         
         return backend_format
     
@@ -603,4 +711,9 @@ class DataConverterService:
         }
         
         # Step 4: Convert to backend format using convert_medicine()
-        return self.convert_medicine(medicine)
\ No newline at end of file
+        return self.convert_medicine(medicine)
+
+
+# Process-wide converter shared by all AIExtractorService instances,
+# so the memoized frequency/duration parsers stay warm across requests
+default_converter = DataConverterService()
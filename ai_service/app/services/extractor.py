@@ -20,58 +20,1311 @@ UPDATES:
 - IMPROVED VOICE INTENT: Now returns database-actionable responses
 """
 
-from openai import OpenAI
-from typing import Dict, Any, Optional
-import json
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+import orjson
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import contextlib
+import functools
+import hashlib
+import httpx
 import logging
+import re
+import time
 
 # Import converter service
-from app.services.converter import DataConverterService
+from app.services.converter import default_converter
+from app.config import (
+    LAB_REPORT_SMALL_MODEL_MAX_CHARS,
+    OPENAI_CONCURRENCY,
+    OPENAI_MAX_RETRIES,
+    OPENAI_REQUESTS_PER_MINUTE,
+    OPENAI_TOKENS_PER_MINUTE,
+)
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
 
+# Content-addressed cache of parsed GPT output.
+# Module level so it is shared by every AIExtractorService instance
+# (routes create a new extractor per request). Re-uploads of the same
+# document produce identical OCR text and skip the GPT round trip.
+# Entries are stored as orjson bytes: decoding gives every caller a fresh
+# object and is much faster than copy.deepcopy on nested results.
+# Entries expire after EXTRACTION_CACHE_TTL_SECONDS (re-scans/retries happen
+# within minutes; older entries are unlikely to be hit again).
+EXTRACTION_CACHE_SIZE = 2048
+EXTRACTION_CACHE_TTL_SECONDS = 600
+_extraction_cache: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+# Per-key locks so concurrent identical requests share one GPT call
+_inflight_locks: Dict[str, asyncio.Lock] = {}
+_inflight_waiters: Dict[str, int] = {}
+
+# Parse failures are sent back to the model with the error and retried
+EXTRACTION_MAX_ATTEMPTS = 3
+EXTRACTION_RETRY_BACKOFF_SECONDS = 1.0
+
+
+class _TruncatedResponse(ValueError):
+    """The model hit max_tokens before closing the JSON object."""
+
+# Bump whenever a prompt or request setting changes,
+# so results produced by the old prompt are never served again.
+PROMPT_VERSION = "v5"
+
+# Light shape check for cache hits: key -> expected type per extraction kind
+_CACHE_SHAPES = {
+    "prescription": ("medicines", list),
+    "lab_report": ("tests", list),
+    "voice_intent": ("intent", str),
+    "combined": ("prescription", (dict, type(None))),
+}
+
+
+def _cache_key(kind: str, model: str, raw_text: str) -> str:
+    """Build cache key from kind, model, prompt version and sha256 of the input text."""
+    digest = hashlib.sha256(raw_text.encode('utf-8')).hexdigest()
+    return f"{kind}:{model}:{PROMPT_VERSION}:{digest}"
+
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """Return a copy of the cached result (or None) and mark it recently used."""
+    entry = _extraction_cache.get(key)
+    if entry is None:
+        return None
+    
+    expires_at, cached_bytes = entry
+    if expires_at < time.monotonic():
+        del _extraction_cache[key]
+        return None
+    cached = orjson.loads(cached_bytes)
+    
+    # Drop entries that do not have the expected shape
+    field, expected_type = _CACHE_SHAPES.get(key.split(":", 1)[0], (None, None))
+    if not isinstance(cached, dict) or (field and not isinstance(cached.get(field), expected_type)):
+        logger.warning("Discarding malformed cache entry %s", key)
+        del _extraction_cache[key]
+        return None
+    
+    _extraction_cache.move_to_end(key)
+    return cached
+
+
+def _cache_put(key: str, value: Dict[str, Any]) -> None:
+    """Store a copy of the result, evicting the least recently used entry."""
+    _extraction_cache[key] = (time.monotonic() + EXTRACTION_CACHE_TTL_SECONDS, orjson.dumps(value))
+    _extraction_cache.move_to_end(key)
+    if len(_extraction_cache) > EXTRACTION_CACHE_SIZE:
+        _extraction_cache.popitem(last=False)
+
+
+# Identity of a repeated line in GPT output (OCR often duplicates lines).
+# Only exact repeats are dropped: the same medicine at another time of day
+# or the same test with another value is kept.
+_MEDICINE_KEY_FIELDS = ("name", "dosage", "frequency", "instructions")
+_TEST_KEY_FIELDS = ("test_name", "value", "unit")
+
+
+def _dedupe_items(items: List[Dict[str, Any]], key_fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Drop repeated items (case/whitespace-insensitive on key_fields), keeping the first."""
+    unique: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+    for item in items:
+        key = tuple(str(item.get(field) or "").strip().lower() for field in key_fields)
+        unique.setdefault(key, item)
+    
+    if len(unique) < len(items):
+        logger.info("Dropped %d duplicate item(s)", len(items) - len(unique))
+    return list(unique.values())
+
+
+def _dedupe_extraction(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Remove duplicate medicines and lab tests from an extraction result (in place).
+    
+    Handles prescription, lab report and combined shapes;
+    other results (voice intent) pass through unchanged.
+    """
+    
+    if isinstance(data.get("medicines"), list):
+        data["medicines"] = _dedupe_items(data["medicines"], _MEDICINE_KEY_FIELDS)
+    if isinstance(data.get("tests"), list):
+        data["tests"] = _dedupe_items(data["tests"], _TEST_KEY_FIELDS)
+    
+    for part in ("prescription", "lab_report"):
+        if isinstance(data.get(part), dict):
+            _dedupe_extraction(data[part])
+    
+    return data
+
+
+async def _cached_extraction(
+    key: str,
+    label: str,
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Dict[str, Any]:
+    """
+    Return the cached result for key, or compute and cache it.
+    
+    Single-flight: while one request computes a key, identical requests
+    wait for it and then read the cache instead of calling GPT again
+    (e.g. a double-tapped upload button).
+    
+    Fresh results are de-duplicated before they are cached.
+    
+    Parameters:
+    - key: Cache key from _cache_key()
+    - label: Name for the cache_hit log line
+    - compute: Coroutine function producing the result on a miss
+    """
+    
+    cached = _cache_get(key)
+    if cached is not None:
+        logger.info("%s cache_hit=True", label)
+        return cached
+    
+    lock = _inflight_locks.setdefault(key, asyncio.Lock())
+    _inflight_waiters[key] = _inflight_waiters.get(key, 0) + 1
+    try:
+        async with lock:
+            # Another request may have filled the cache while we waited
+            cached = _cache_get(key)
+            if cached is not None:
+                logger.info("%s cache_hit=True (coalesced)", label)
+                return cached
+            
+            logger.info("%s cache_hit=False", label)
+            result = _dedupe_extraction(await compute())
+            _cache_put(key, result)
+            return result
+    finally:
+        _inflight_waiters[key] -= 1
+        if not _inflight_waiters[key]:
+            del _inflight_waiters[key]
+            del _inflight_locks[key]
+
+
+# Input budget for document text sent to GPT.
+# ~4 characters per token for English OCR text, so 24000 chars ≈ 6000 tokens.
+# Real prescriptions and lab reports are far below this; only runaway
+# OCR dumps (multi-page PDFs, noise) get clipped.
+MAX_INPUT_CHARS = 24000
+
+
+# Page headers/footers (lab name, address, "Page x of y" banners) are only
+# dropped when a document is over MAX_INPUT_CHARS, and only at page edges:
+# a line of at least REPEATED_LINE_MIN_CHARS that sits in the first or last
+# PAGE_EDGE_LINES lines of at least half the pages (and of two or more).
+# Repeats inside a page ("Reference range: 70 - 110 mg/dL" under several
+# tests) are always kept. OCR joins pages with a blank line.
+REPEATED_LINE_MIN_CHARS = 20
+PAGE_EDGE_LINES = 2
+
+_INLINE_WHITESPACE_RE = re.compile(r"[ \t\f\v]+")
+_PAGE_BREAK_RE = re.compile(r"\n\s*\n")
+
+
+def _normalize_lines(text: str) -> List[str]:
+    """Non-blank lines with runs of spaces/tabs collapsed."""
+    lines = (_INLINE_WHITESPACE_RE.sub(" ", line).strip() for line in text.splitlines())
+    return [line for line in lines if line]
+
+
+def _compress_input(text: str) -> str:
+    """
+    Shrink OCR text before it is sent to GPT (input tokens are billed and prefilled).
+    
+    - Collapse runs of spaces/tabs inside a line
+    - Drop blank lines
+    
+    Line breaks are kept so table rows stay separate.
+    """
+    
+    return "\n".join(_normalize_lines(text))
+
+
+def _strip_page_headers(text: str) -> str:
+    """
+    Compress text like _compress_input() and also drop repeated page headers/footers.
+    
+    Only lines at the edges of pages count (see PAGE_EDGE_LINES); the first
+    page keeps its copy, later pages lose theirs. Lines in a page body are kept.
+    """
+    
+    pages = [_normalize_lines(page) for page in _PAGE_BREAK_RE.split(text)]
+    pages = [page for page in pages if page]
+    
+    # Count on how many pages each long line sits at an edge
+    edge_pages: Dict[str, int] = {}
+    for page in pages:
+        edges = set(page[:PAGE_EDGE_LINES]) | set(page[-PAGE_EDGE_LINES:])
+        for line in edges:
+            if len(line) >= REPEATED_LINE_MIN_CHARS:
+                edge_pages[line] = edge_pages.get(line, 0) + 1
+    
+    min_pages = max(2, (len(pages) + 1) // 2)
+    repeated = {line for line, count in edge_pages.items() if count >= min_pages}
+    
+    seen = set()
+    lines = []
+    for page in pages:
+        for position, line in enumerate(page):
+            at_edge = position < PAGE_EDGE_LINES or position >= len(page) - PAGE_EDGE_LINES
+            if at_edge and line in repeated:
+                if line in seen:
+                    continue
+                seen.add(line)
+            lines.append(line)
+    
+    return "\n".join(lines)
+
+
+def _clip_input(text: str, kind: str) -> str:
+    """
+    Compress document text and clip it to MAX_INPUT_CHARS, logging when that happens.
+    
+    Over budget, repeated page headers/footers go first; clipping then
+    keeps the head and the tail (patient details at the top, signatures
+    and follow-up at the bottom) and drops the middle.
+    """
+    
+    compressed = _compress_input(text)
+    if len(compressed) < len(text):
+        logger.debug("%s input compressed from %d to %d characters", kind, len(text), len(compressed))
+    
+    if len(compressed) <= MAX_INPUT_CHARS:
+        return compressed
+    
+    stripped = _strip_page_headers(text)
+    if len(stripped) < len(compressed):
+        logger.info("%s page headers/footers removed: %d to %d characters", kind, len(compressed), len(stripped))
+        compressed = stripped
+        if len(compressed) <= MAX_INPUT_CHARS:
+            return compressed
+    
+    logger.warning("%s input truncated from %d to %d characters", kind, len(compressed), MAX_INPUT_CHARS)
+    half = MAX_INPUT_CHARS // 2
+    return compressed[:half] + "\n…\n" + compressed[-half:]
+
+
+# OCR output too short or too noisy to hold a document (blank page, smudge).
+# Kept low on purpose: a one-line prescription ("Tab Napa 500mg 1+0+1")
+# is only ~20 characters.
+MIN_DOCUMENT_CHARS = 20
+MIN_ALNUM_RATIO = 0.3
+
+
+def _unusable_text_reason(text: str) -> Optional[str]:
+    """Return why OCR text is not worth a GPT call, or None if it looks like a document."""
+    text = text.strip()
+    if len(text) < MIN_DOCUMENT_CHARS:
+        return "ocr_too_short"
+    if sum(char.isalnum() for char in text) / len(text) < MIN_ALNUM_RATIO:
+        return "ocr_noise"
+    return None
+
+
+# Output budgets (max_tokens). Realtime calls start from a budget sized to
+# the input, since a short prescription needs a few hundred tokens and the
+# budget counts against the TPM limit; a truncated answer is retried once
+# with the full ceiling. Batch requests (no retry) always use the ceiling.
+PRESCRIPTION_MAX_OUTPUT_TOKENS = 4096
+LAB_REPORT_MAX_OUTPUT_TOKENS = 3000
+COMBINED_MAX_OUTPUT_TOKENS = 4000  # Room for both documents
+VOICE_INTENT_OUTPUT_TOKENS = 400  # Intent JSON fits easily in this budget
+VOICE_INTENT_MAX_OUTPUT_TOKENS = 1000  # Long post_data / query_filters
+
+
+def _output_token_budget(text: str, floor: int, output_per_input_token: float, ceiling: int) -> int:
+    """max_tokens for a document: floor + output_per_input_token per input token, capped at ceiling."""
+    input_tokens = len(text) // 4
+    return min(ceiling, floor + int(input_tokens * output_per_input_token))
+
+
+# Packed extraction (many short prescriptions per GPT call).
+# Output is the binding limit: gpt-4o returns at most 16k tokens and one
+# prescription is ~500-1000 output tokens, so cap documents per call too.
+PACKED_MAX_DOCS_PER_CALL = 12
+PACKED_MAX_INPUT_CHARS = 200000  # ≈ 50k input tokens, well inside 128k context
+PACKED_MAX_OUTPUT_TOKENS = 16000
+PACKED_OUTPUT_TOKENS_PER_DOC = 1000
+
+
+# System prompts, static per task.
+# Kept as constants so every request sends a byte-identical prefix.
+
+PRESCRIPTION_SYSTEM_PROMPT = (
+    "You are a medical data extraction expert. Extract ALL information accurately "
+    "including sex, next appointment, and #quantity numbers. Always respond in English. "
+    "Return only valid JSON."
+)
+
+VOICE_INTENT_SYSTEM_PROMPT = (
+    "You are a professional deterministic intent classifier for a medical system voice assistant for a health system. "
+    "ALWAYS generate responses in English only. "
+    "Do NOT switch language even if the user speaks another language. "
+    "Return only valid JSON with database-actionable responses."
+)
+
+LAB_REPORT_SYSTEM_PROMPT = "You are a lab report analyzer. Return only JSON."
+
+GENERAL_RESPONSE_FALLBACK = "I'm here to help. Could you please clarify your question?"
+
+GENERAL_RESPONSE_SYSTEM_PROMPT = (
+    "You are a professional AI assistant. "
+    "ALWAYS respond in English only. "
+    "Do NOT switch to any other language even if the user speaks another language. "
+    "If the user asks medical database related questions, "
+    "tell them to use the health features. "
+    "Otherwise answer naturally and helpfully."
+)
+
+
+# Prompt instructions, identical on every call.
+# They are sent before the document, and the document goes last in its own
+# user message, so the shared prefix (system prompt + instructions) is
+# reused by OpenAI's automatic prompt caching.
+
+PRESCRIPTION_INSTRUCTIONS = """You are a medical prescription parser. Extract ALL information accurately from the prescription in the next message.
+
+Extract and return ONLY valid JSON:
+{
+    "patient_name": "full name (if mentioned)",
+    "patient_age": age as number (if mentioned),
+    "patient_sex": "Male/Female/male/female/M/F (extract from text, look for Male, Female, M, F keywords)",
+    "prescription_date": "YYYY-MM-DD format (convert dates like 19-Aug-2021 or 6/8/23)",
+    "doctor_name": "doctor name if mentioned",
+    "next_appointment": "extract follow-up date or duration like 'after 1 month', '2 weeks', null if not mentioned",
+    "medicines": [
+        {
+            "name": "medicine name (clean, no Tab./Cap. prefix)",
+            "type": "Tablet/Capsule/Syrup/Injection",
+            "dosage": "full dosage like '10mg', '5mg', '500mg'",
+            "quantity": "quantity like '1/2 tab', '1 tab', '2 tabs' - KEEP FRACTIONS AS IS, also extract #number like #60, #300",
+            "frequency": "EXTRACT EXACTLY: 'once daily', 'twice daily', '3x a day', '2x a day', 'daily at bedtime', 'after breakfast & after dinner'",
+            "duration": "EXTRACT FROM #NUMBER: if #60 and frequency is once daily = 60 days, if #300 and 3x daily = 100 days",
+            "instructions": "FULL INSTRUCTIONS: 'at bedtime', 'after breakfast', 'after dinner', 'for muscle spasms', etc",
+            "refill_needed": true/false
+        }
+    ],
+    "diagnosis": "diagnosis if mentioned",
+    "advice": "doctor's advice"
+}
+
+CRITICAL RULES:
+1. Sex/Gender: Look for "Male", "Female", "M", "F", "male", "female" in text - IMPORTANT!
+2. Next Appointment: Extract "follow up", "next visit", "after X days/weeks/months"
+3. Quantity: MUST include #number format (like #60, #300) AND fractional doses (like 1/2 tab)
+4. Frequency: Extract EXACTLY as written: "3x a day", "2x a day", "once daily", "daily at bedtime", "after breakfast & after dinner"
+5. Duration: Calculate from #number. Example: #60 with once daily = 60 days, #300 with 3x daily = 100 days
+6. Instructions: Include ALL timing info: "at bedtime", "after breakfast", "after dinner", "before meals"
+7. Clean medicine names: Remove "Tab.", "Cap.", "Inj." prefixes
+8. Return ONLY JSON, no explanation text
+"""
+
+VOICE_INTENT_INSTRUCTIONS = """You are a professional voice assistant for a health management system.
+The user's words are in the next message.
+
+Return DATABASE-ACTIONABLE JSON:
+
+{
+    "intent":  "intent": "check_reminder|add_medicine|view_prescription|schedule_appointment|refill_medicine|ask_question|unclear",
+    "confidence": 0.0-1.0,
+    
+    "database_action": {
+        "api_endpoint": "GET /prescriptions/my_prescriptions/",
+        "method": "GET|POST|PATCH",
+        "query_filters": {
+            "today": true,
+            "medicine_name": "name or null",
+            "date_range": "today|week|month|null",
+            "time_of_day": "morning|afternoon|evening|night|null"
+        },
+        "post_data": {} or null
+    },
+    
+    "extracted_data": {
+        "medicine_name": "name or null",
+        "dosage": "dosage or null",
+        "frequency": "frequency or null",
+        "duration": "duration or null",
+        "instructions": "instructions or null",
+        "query": "user's question"
+    },
+    
+    "ui_action": "show_medicine_list|show_prescription_details|show_add_form|show_calendar|show_error",
+    "confirmation_needed": true/false,
+    "user_response": "Simple confirmation message"
+}
+
+IMPORTANT:
+
+1. ALWAYS respond in English only.
+2. If user mentions morning/afternoon/evening/night → set time_of_day properly.
+3. If user asks for today's medicines → set today=true.
+4. If request is unclear → set intent="unclear".
+5. Return ONLY JSON. No explanations.
+
+Return ONLY JSON.":
+{
+    "intent": "check_reminder",
+    "confidence": 0.9,
+    "database_action": {
+        "api_endpoint": "GET /prescriptions/my_prescriptions/",
+        "method": "GET",
+        "query_filters": {"today": true}
+    },
+    "extracted_data": {"query": "today's medicine"},
+    "ui_action": "show_medicine_list",
+    "confirmation_needed": false,
+    "user_response": "Here are today's medicines"
+}
+
+"Add Paracetamol 500mg twice daily":
+{
+    "intent": "add_medicine",
+    "confidence": 0.9,
+    "database_action": {
+        "api_endpoint": "POST /prescriptions/{prescription_id}/medicines/",
+        "method": "POST",
+        "post_data": {"medicine_name": "Paracetamol", "dosage": "500mg", "frequency": "twice daily"}
+    },
+    "extracted_data": {
+        "medicine_name": "Paracetamol",
+        "dosage": "500mg",
+        "frequency": "twice daily"
+    },
+    "ui_action": "show_add_form",
+    "confirmation_needed": true,
+    "user_response": "Adding Paracetamol 500mg twice daily. Please confirm duration and meal timing"
+}
+
+"Show my prescriptions":
+{
+    "intent": "view_prescription",
+    "confidence": 0.95,
+    "database_action": {
+        "api_endpoint": "GET /prescriptions/my_prescriptions/",
+        "method": "GET"
+    },
+    "ui_action": "show_prescription_details",
+    "confirmation_needed": false,
+    "user_response": "Showing your prescriptions"
+}
+
+"I want to refill the medicine":
+{
+    "intent": "refill_medicine",
+    "confidence": 0.85,
+    "database_action": {
+        "api_endpoint": "GET /prescriptions/my_prescriptions/",
+        "method": "GET",
+        "query_filters": {"low_stock": true}
+    },
+    "extracted_data": {
+        "medicine_name": null,
+        "action": "refill"
+    },
+    "ui_action": "show_refill_list",
+    "confirmation_needed": true,
+    "user_response": "Which medicine would you like to refill? Here are your medicines with low stock"
+}
+
+"Refill Paracetamol":
+{
+    "intent": "refill_medicine",
+    "confidence": 0.9,
+    "database_action": {
+        "api_endpoint": "PATCH /prescriptions/{prescription_id}/medicines/{medicine_id}/",
+        "method": "PATCH",
+        "post_data": {"action": "refill"}
+    },
+    "extracted_data": {
+        "medicine_name": "Paracetamol",
+        "action": "refill"
+    },
+    "ui_action": "show_refill_confirmation",
+    "confirmation_needed": true,
+    "user_response": "Refilling Paracetamol. How many days supply do you need?"
+}
+
+Return ONLY JSON.
+"""
+
+LAB_REPORT_INSTRUCTIONS = """You are a medical lab report parser. Parse the lab report in the next message.
+
+Extract and return ONLY valid JSON:
+{
+    "patient_name": "name or null",
+    "report_date": "YYYY-MM-DD or null",
+    "lab_name": "laboratory name or null",
+    "tests": [
+        {
+            "test_name": "test name",
+            "value": "numeric value as string",
+            "unit": "unit (mg/dL, g/dL, etc.)",
+            "normal_range": "range or null",
+            "status": "normal|high|low or null"
+        }
+    ],
+    "significant_findings": ["list of abnormal results"],
+    "doctor_comments": "comments if any or null"
+}
+
+Rules:
+1. Extract ALL tests mentioned
+2. Determine status by comparing value with normal range
+3. Flag significant findings (high/low values)
+4. Return ONLY JSON
+"""
+
+PACKED_PRESCRIPTION_INSTRUCTIONS = """You are a medical prescription parser. The next message contains several separate prescriptions, each starting with a "### doc-N" header.
+Extract each prescription independently - never mix medicines or patients between documents.
+
+Return ONLY valid JSON: {"results": [{"id": "doc-0", ...prescription fields}, {"id": "doc-1", ...}]}
+with exactly one result per document, using the document header as "id".
+
+Prescription fields: patient_name, patient_age, patient_sex, prescription_date (YYYY-MM-DD),
+doctor_name, next_appointment, medicines (name, type, dosage, quantity, frequency, duration,
+instructions, refill_needed), diagnosis, advice.
+
+CRITICAL RULES:
+1. Sex/Gender: Look for "Male", "Female", "M", "F", "male", "female" in text
+2. Quantity: MUST include #number format (like #60, #300) AND fractional doses (like 1/2 tab)
+3. Frequency: Extract EXACTLY as written: "3x a day", "once daily", "after breakfast & after dinner"
+4. Duration: Calculate from #number. Example: #60 with once daily = 60 days
+5. Instructions: Include ALL timing info: "at bedtime", "after breakfast", "before meals"
+6. Clean medicine names: Remove "Tab.", "Cap.", "Inj." prefixes
+7. Return ONLY JSON, no explanation text
+"""
+
+COMBINED_INSTRUCTIONS = """You are a medical document parser. The document in the next message may contain a prescription, a lab report, or BOTH (e.g. a discharge summary).
+
+Extract and return ONLY valid JSON with two top-level keys:
+{
+    "prescription": prescription object, or null if the document has no prescribed medicines,
+    "lab_report": lab report object, or null if the document has no lab test results
+}
+
+Prescription object: patient_name, patient_age, patient_sex, prescription_date (YYYY-MM-DD),
+doctor_name, next_appointment, medicines (name, type, dosage, quantity, frequency, duration,
+instructions, refill_needed), diagnosis, advice.
+
+Lab report object: patient_name, report_date (YYYY-MM-DD), lab_name, tests (test_name, value,
+unit, normal_range, status normal|high|low), significant_findings, doctor_comments.
+
+CRITICAL RULES:
+1. Sex/Gender: Look for "Male", "Female", "M", "F", "male", "female" in text
+2. Quantity: MUST include #number format (like #60, #300) AND fractional doses (like 1/2 tab)
+3. Frequency: Extract EXACTLY as written: "3x a day", "once daily", "after breakfast & after dinner"
+4. Duration: Calculate from #number. Example: #60 with once daily = 60 days
+5. Instructions: Include ALL timing info: "at bedtime", "after breakfast", "before meals"
+6. Clean medicine names: Remove "Tab.", "Cap.", "Inj." prefixes
+7. Lab tests: Extract ALL tests, set status by comparing value with normal range
+8. Return ONLY JSON, no explanation text
+"""
+
+
+# JSON schemas for structured outputs (strict mode).
+# The API enforces these, so responses always parse and always carry
+# every key (null when not present in the document).
+# Strict mode requires every property listed in "required" and
+# additionalProperties=false on every object.
+
+def _nullable(json_type: str) -> Dict[str, Any]:
+    """Schema for a value of json_type that may also be null."""
+    return {"type": [json_type, "null"]}
+
+
+PRESCRIPTION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "patient_name": _nullable("string"),
+        "patient_age": _nullable("integer"),
+        "patient_sex": _nullable("string"),
+        "prescription_date": _nullable("string"),
+        "doctor_name": _nullable("string"),
+        "next_appointment": _nullable("string"),
+        "medicines": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "type": _nullable("string"),
+                    "dosage": _nullable("string"),
+                    "quantity": _nullable("string"),
+                    "frequency": _nullable("string"),
+                    "duration": _nullable("string"),
+                    "instructions": _nullable("string"),
+                    "refill_needed": {"type": "boolean"}
+                },
+                "required": [
+                    "name", "type", "dosage", "quantity", "frequency",
+                    "duration", "instructions", "refill_needed"
+                ],
+                "additionalProperties": False
+            }
+        },
+        "diagnosis": _nullable("string"),
+        "advice": _nullable("string")
+    },
+    "required": [
+        "patient_name", "patient_age", "patient_sex", "prescription_date",
+        "doctor_name", "next_appointment", "medicines", "diagnosis", "advice"
+    ],
+    "additionalProperties": False
+}
+
+LAB_REPORT_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "patient_name": _nullable("string"),
+        "report_date": _nullable("string"),
+        "lab_name": _nullable("string"),
+        "tests": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "test_name": {"type": "string"},
+                    "value": _nullable("string"),
+                    "unit": _nullable("string"),
+                    "normal_range": _nullable("string"),
+                    "status": {"type": ["string", "null"], "enum": ["normal", "high", "low", None]}
+                },
+                "required": ["test_name", "value", "unit", "normal_range", "status"],
+                "additionalProperties": False
+            }
+        },
+        "significant_findings": {"type": "array", "items": {"type": "string"}},
+        "doctor_comments": _nullable("string")
+    },
+    "required": [
+        "patient_name", "report_date", "lab_name", "tests",
+        "significant_findings", "doctor_comments"
+    ],
+    "additionalProperties": False
+}
+
+PACKED_PRESCRIPTION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "items": {
+                **PRESCRIPTION_SCHEMA,
+                "properties": {"id": {"type": "string"}, **PRESCRIPTION_SCHEMA["properties"]},
+                "required": ["id", *PRESCRIPTION_SCHEMA["required"]]
+            }
+        }
+    },
+    "required": ["results"],
+    "additionalProperties": False
+}
+
+COMBINED_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "prescription": {"anyOf": [PRESCRIPTION_SCHEMA, {"type": "null"}]},
+        "lab_report": {"anyOf": [LAB_REPORT_SCHEMA, {"type": "null"}]}
+    },
+    "required": ["prescription", "lab_report"],
+    "additionalProperties": False
+}
+
+
+def _empty_extraction(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Result with every schema key present: [] for arrays, None otherwise."""
+    return {
+        name: [] if "array" in (spec.get("type") or ()) else None
+        for name, spec in schema["properties"].items()
+    }
+
+
+# Batch API kinds: custom_id prefix and request builder method
+BATCH_KINDS = {
+    "prescription": ("rx", "_prescription_request"),
+    "lab_report": ("lab", "_lab_report_request"),
+}
+
+# Voice intent stays on json_object mode (open-ended post_data/query_filters),
+# so its few fixed fields are checked locally before the result is used.
+VOICE_INTENTS = frozenset({
+    "check_reminder", "add_medicine", "view_prescription",
+    "schedule_appointment", "refill_medicine", "ask_question", "unclear"
+})
+
+
+def _validate_voice_intent(data: Dict[str, Any]) -> None:
+    """Raise ValueError if the voice intent JSON has the wrong shape."""
+    if data.get("intent") not in VOICE_INTENTS:
+        raise ValueError(f"intent must be one of {sorted(VOICE_INTENTS)}")
+    confidence = data.get("confidence")
+    if isinstance(confidence, bool) or not isinstance(confidence, (int, float)) or not 0 <= confidence <= 1:
+        raise ValueError("confidence must be a number between 0 and 1")
+    if not isinstance(data.get("database_action"), (dict, type(None))):
+        raise ValueError("database_action must be an object or null")
+
+
+# Local classifier for the most common, fully fixed voice phrases.
+# Only whole-utterance matches are resolved locally (no medicine names or
+# dates to extract); anything else still goes to GPT.
+_TIME_OF_DAY = r"(?:(?P<time_of_day>morning|afternoon|evening|night)\s+)?"
+_INTENT_RULES = [
+    (
+        re.compile(
+            r"(?:what are |show (?:me )?|give me |tell me |i want to (?:know|see) )?(?:my )?today'?s?\s+"
+            + _TIME_OF_DAY + r"medicines?(?: list)?(?: for today)?"
+        ),
+        "check_reminder"
+    ),
+    (
+        re.compile(r"(?:show|view|open|see)(?: me)? (?:all )?my prescriptions?"),
+        "view_prescription"
+    ),
+    (
+        re.compile(r"(?:i want to |i need to |please )?refill (?:the |my )?medicines?"),
+        "refill_medicine"
+    ),
+]
+_UTTERANCE_STRIP_RE = re.compile(r"[^\w\s']+")
+
+# Hit-rate counters for the local classifier (per process)
+_intent_rule_stats = {"hits": 0, "total": 0}
+
+# Model cascade: voice intents go to the small model first and are only
+# re-asked on the strong model when the small one is unsure or malformed
+VOICE_ESCALATION_CONFIDENCE = 0.7
+_cascade_stats = {"escalated": 0, "total": 0}
+
+
+def _match_intent_rule(transcribed_text: str) -> Optional[Dict[str, Any]]:
+    """
+    Resolve a fixed voice phrase without GPT.
+    
+    Returns the same JSON shape as the GPT intent response,
+    or None if no rule matches the whole utterance.
+    """
+    
+    utterance = " ".join(_UTTERANCE_STRIP_RE.sub(" ", transcribed_text.lower()).split())
+    
+    _intent_rule_stats["total"] += 1
+    
+    for pattern, intent in _INTENT_RULES:
+        match = pattern.fullmatch(utterance)
+        if not match:
+            continue
+        
+        _intent_rule_stats["hits"] += 1
+        logger.info(
+            "Voice intent resolved locally (classifier_hit_rate=%.2f)",
+            _intent_rule_stats["hits"] / _intent_rule_stats["total"]
+        )
+        
+        if intent == "check_reminder":
+            time_of_day = match.group("time_of_day")
+            query_filters = {"today": True}
+            if time_of_day:
+                query_filters["time_of_day"] = time_of_day
+            return {
+                "intent": "check_reminder",
+                "confidence": 0.95,
+                "database_action": {
+                    "api_endpoint": "GET /prescriptions/my_prescriptions/",
+                    "method": "GET",
+                    "query_filters": query_filters
+                },
+                "extracted_data": {"query": transcribed_text},
+                "ui_action": "show_medicine_list",
+                "confirmation_needed": False,
+                "user_response": "Here are today's medicines"
+            }
+        
+        if intent == "view_prescription":
+            return {
+                "intent": "view_prescription",
+                "confidence": 0.95,
+                "database_action": {
+                    "api_endpoint": "GET /prescriptions/my_prescriptions/",
+                    "method": "GET"
+                },
+                "extracted_data": {"query": transcribed_text},
+                "ui_action": "show_prescription_details",
+                "confirmation_needed": False,
+                "user_response": "Showing your prescriptions"
+            }
+        
+        return {
+            "intent": "refill_medicine",
+            "confidence": 0.9,
+            "database_action": {
+                "api_endpoint": "GET /prescriptions/my_prescriptions/",
+                "method": "GET",
+                "query_filters": {"low_stock": True}
+            },
+            "extracted_data": {"medicine_name": None, "action": "refill"},
+            "ui_action": "show_refill_list",
+            "confirmation_needed": True,
+            "user_response": "Which medicine would you like to refill? Here are your medicines with low stock"
+        }
+    
+    return None
+
+
+def _voice_escalation_reason(extracted_intent: Dict[str, Any]) -> Optional[str]:
+    """Return why a small-model intent needs the strong model, or None if it is good enough."""
+    if extracted_intent["confidence"] < VOICE_ESCALATION_CONFIDENCE:
+        return f"confidence {extracted_intent['confidence']}"
+    if extracted_intent["intent"] == "unclear":
+        return "intent unclear"
+    return None
+
+
+def _apply_voice_overrides(transcribed_text: str, extracted_intent: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply the fixed safety overrides to a GPT intent (in place) and return it."""
+    
+    #  SAFETY OVERRIDE FOR MEDICINE QUERY
+    lower_text = transcribed_text.lower()
+    if "today" in lower_text and "medicine" in lower_text:
+        extracted_intent["intent"] = "check_reminder"
+        extracted_intent["confidence"] = 0.95
+    
+    return extracted_intent
+
+
+def _voice_intent_fallback(transcribed_text: str) -> Dict[str, Any]:
+    """Safe response when the intent cannot be extracted."""
+    return {
+        "intent": "unclear",
+        "confidence": 0.0,
+        "database_action": None,
+        "extracted_data": {"query": transcribed_text},
+        "ui_action": "show_error",
+        "confirmation_needed": True,
+        "user_response": f"I'm not sure what you would like to do. Could you please clarify?"
+    }
+
+
+# Leading voice intent fields, read from the partial stream before the JSON closes
+_STREAM_INTENT_RE = re.compile(r'"intent"\s*:\s*"([a-z_]+)"')
+_STREAM_CONFIDENCE_RE = re.compile(r'"confidence"\s*:\s*([0-9.]+)\s*[,}\n]')
+
+
+def _schema_response_format(name: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Build response_format for strict structured outputs."""
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": name, "schema": schema, "strict": True}
+    }
+
+
+def _extraction_messages(system_prompt: str, instructions: str, document: str) -> List[Dict[str, str]]:
+    """
+    Build the chat messages for one extraction call.
+    
+    The static system prompt and instructions come first and the
+    per-request document last, so every call shares the same prefix.
+    """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": instructions},
+        {"role": "user", "content": document}
+    ]
+
+
+class RateLimiter:
+    """
+    Client-side requests-per-minute / tokens-per-minute limiter.
+    
+    Same idea as the OpenAI cookbook parallel processor: two buckets
+    refill continuously at their per-minute rate; a request waits until
+    both have enough capacity, so bursts never trip the provider's 429s.
+    A limit of 0 disables that bucket.
+    """
+    
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._available_requests = float(requests_per_minute)
+        self._available_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self) -> None:
+        """Add capacity for the time passed since the last refill."""
+        now = time.monotonic()
+        elapsed_minutes = (now - self._last_refill) / 60
+        self._last_refill = now
+        self._available_requests = min(
+            self.requests_per_minute,
+            self._available_requests + elapsed_minutes * self.requests_per_minute
+        )
+        self._available_tokens = min(
+            self.tokens_per_minute,
+            self._available_tokens + elapsed_minutes * self.tokens_per_minute
+        )
+    
+    async def acquire(self, tokens: int) -> None:
+        """Wait until one request and `tokens` tokens are available, then take them."""
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return
+        
+        # A single request larger than the whole budget would wait forever
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+        
+        # Lock keeps waiters in arrival order
+        async with self._lock:
+            while True:
+                self._refill()
+                
+                missing_requests = (1 - self._available_requests) if self.requests_per_minute else 0
+                missing_tokens = tokens - self._available_tokens if self.tokens_per_minute else 0
+                
+                if missing_requests <= 0 and missing_tokens <= 0:
+                    if self.requests_per_minute:
+                        self._available_requests -= 1
+                    if self.tokens_per_minute:
+                        self._available_tokens -= tokens
+                    return
+                
+                # Sleep just long enough for the scarcer bucket to refill
+                wait_minutes = max(
+                    missing_requests / self.requests_per_minute if missing_requests > 0 else 0,
+                    missing_tokens / self.tokens_per_minute if missing_tokens > 0 else 0
+                )
+                await asyncio.sleep(wait_minutes * 60)
+
+
 class AIExtractorService:
     """
     AIExtractorService extracts structured data from unstructured text.
     
-    This is the brain of CareAgent AI - it understands:
-    - Medical terminology
-    - Date and time expressions
-    - Dosage formats (including fractional like 1/2 tab)
-    - Appointment context
-    - Patient demographics (including sex/gender)
-    - Quantity formats (#60, #300, etc.)
-    """
+    This is the brain of CareAgent AI - it understands:
+    - Medical terminology
+    - Date and time expressions
+    - Dosage formats (including fractional like 1/2 tab)
+    - Appointment context
+    - Patient demographics (including sex/gender)
+    - Quantity formats (#60, #300, etc.)
+    """
+    
+    def __init__(self, api_key: str):
+        """
+        Initialize AI Extractor service.
+        
+        What happens here:
+        - Create async OpenAI client with provided API key
+        - Attach the shared data converter service
+        - Create the concurrency and rate limits for OpenAI requests
+        - Set up logging
+        
+        Parameters:
+        - api_key: OpenAI API key for GPT access
+        
+        Called by:
+        - get_extractor() (routes should use that, not this directly)
+        """
+        
+        logger.info("Initializing AI Extractor service...")
+        
+        # Step 1: Create async OpenAI client
+        # Extraction is I/O-bound, so awaiting the network call lets the
+        # FastAPI worker serve other requests in the meantime
+        # Keep-alive pool so repeated calls reuse the TLS connection
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            max_retries=OPENAI_MAX_RETRIES,  # 429/5xx retried with exponential backoff
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=60
+                )
+            )
+        )
+        
+        # Step 2: Use the process-wide converter (shared parse caches)
+        self.converter = default_converter
+        
+        # Step 3: Cap concurrent OpenAI requests and RPM/TPM (rate limits
+        # are per key, and the service is shared via get_extractor())
+        self._request_slots = asyncio.Semaphore(OPENAI_CONCURRENCY)
+        self._rate_limiter = RateLimiter(OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE)
+        
+        # Step 4: Models for the cheap-first cascade (voice intent, short lab reports)
+        self.cheap_model = "gpt-4o-mini"
+        self.strong_model = "gpt-4o"
+        
+        logger.info("AI Extractor initialized")
+    
+    @contextlib.asynccontextmanager
+    async def _openai_slot(self, messages: List[Dict[str, Any]], max_tokens: int):
+        """
+        Hold one OpenAI request slot (rate limit + concurrency cap).
+        
+        Token cost is estimated like the cookbook processor:
+        prompt characters / 4 plus the max_tokens completion budget.
+        
+        Called by:
+        - Every chat.completions.create call in this service
+        """
+        
+        prompt_chars = sum(len(message.get("content") or "") for message in messages)
+        await self._rate_limiter.acquire(prompt_chars // 4 + max_tokens)
+        
+        async with self._request_slots:
+            yield
     
-    def __init__(self, api_key: str):
+    async def _stream_json_object(self, **request_kwargs) -> str:
         """
-        Initialize AI Extractor service.
+        Stream a chat completion and return the first complete JSON object.
         
         What happens here:
-        - Create OpenAI client with provided API key
-        - Initialize data converter service
-        - Set up logging
+        1. Call chat.completions.create with stream=True
+        2. Accumulate content deltas as they arrive
+        3. Track top-level brace depth (ignoring braces inside strings)
+        4. Stop reading as soon as the top-level object closes
+        
+        In JSON mode the model can keep emitting trailing whitespace until
+        max_tokens; returning at the closing brace avoids waiting for it.
+        If the stream stops at max_tokens before the object closes,
+        ValueError is raised so the caller's retry loop handles it.
         
         Parameters:
-        - api_key: OpenAI API key for GPT access
+        - request_kwargs: Arguments for chat.completions.create (model, messages, ...)
+        
+        Returns:
+        - Response text up to and including the closing brace
         
         Called by:
-        - API routes when extraction is needed
+        - _request_json_with_retry()
         """
         
-        logger.info("Initializing AI Extractor service...")
+        # Counts as one in-flight OpenAI request until the stream is closed
+        async with self._openai_slot(request_kwargs["messages"], request_kwargs.get("max_tokens", 0)):
+            stream = await self.client.chat.completions.create(stream=True, **request_kwargs)
         
-        # Step 1: Create OpenAI client
-        self.client = OpenAI(api_key=api_key)
+            parts = []
+            depth = 0
+            in_string = False
+            escaped = False
+            finish_reason = None
         
-        # Step 2: Create converter instance
-        self.converter = DataConverterService()
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                
+                    for index, char in enumerate(delta):
+                        if in_string:
+                            if escaped:
+                                escaped = False
+                            elif char == "\\":
+                                escaped = True
+                            elif char == '"':
+                                in_string = False
+                        elif char == '"':
+                            in_string = True
+                        elif char == "{":
+                            depth += 1
+                        elif char == "}":
+                            depth -= 1
+                            if depth == 0:
+                                # Top-level object complete, stop streaming
+                                parts.append(delta[:index + 1])
+                                return "".join(parts)
+                
+                    parts.append(delta)
+            finally:
+                await stream.close()
         
-        logger.info("AI Extractor initialized")
+            # Stream ended without a closed object
+            if finish_reason == "length":
+                raise _TruncatedResponse("response truncated at max_tokens, return a more compact JSON")
+            
+            # Otherwise let orjson.loads report what is wrong
+            return "".join(parts)
+    
+    async def _request_json_with_retry(
+        self,
+        stream: bool = True,
+        validate: Optional[Callable[[Dict[str, Any]], None]] = None,
+        max_tokens_ceiling: Optional[int] = None,
+        **request_kwargs
+    ) -> Dict[str, Any]:
+        """
+        Request a JSON object, feeding parse errors back to the model.
+        
+        What happens here:
+        1. Call GPT (streamed or plain)
+        2. Parse the response as a JSON object (and validate it, if given)
+        3. On failure, append the bad answer and the error to the
+           conversation and retry with linear backoff
+        4. Raise the last error after EXTRACTION_MAX_ATTEMPTS
+        
+        Parameters:
+        - stream: Use _stream_json_object() (True) or a plain create call (False)
+        - validate: Optional check that raises ValueError on a bad shape
+        - max_tokens_ceiling: Budget to retry with after a truncated response
+        - request_kwargs: Arguments for chat.completions.create (model, messages, ...)
+        
+        Returns:
+        - Parsed JSON object
+        
+        Raises:
+        - ValueError (orjson.JSONDecodeError) if every attempt fails to parse or validate
+        
+        Called by:
+        - extract_prescription_data(), extract_voice_intent(), extract_lab_report_data()
+        """
+        
+        messages = list(request_kwargs.pop("messages"))
+        
+        for attempt in range(EXTRACTION_MAX_ATTEMPTS):
+            result_text = ""
+            
+            try:
+                # Step 1: Call GPT (truncation at max_tokens raises ValueError)
+                if stream:
+                    result_text = await self._stream_json_object(messages=messages, **request_kwargs)
+                else:
+                    async with self._openai_slot(messages, request_kwargs.get("max_tokens", 0)):
+                        response = await self.client.chat.completions.create(messages=messages, **request_kwargs)
+                    result_text = response.choices[0].message.content or ""
+                    if response.usage and response.usage.prompt_tokens_details:
+                        logger.info(
+                            "Prompt tokens: %d (cached_tokens=%d)",
+                            response.usage.prompt_tokens,
+                            response.usage.prompt_tokens_details.cached_tokens or 0
+                        )
+                    if response.choices[0].finish_reason == "length":
+                        raise _TruncatedResponse("response truncated at max_tokens, return a more compact JSON")
+                
+                # Step 2: Parse JSON object
+                parsed = orjson.loads(result_text)
+                if not isinstance(parsed, dict):
+                    raise ValueError("expected a JSON object")
+                if validate is not None:
+                    validate(parsed)
+                return parsed
+            
+            except ValueError as e:
+                logger.warning("Invalid response on attempt %d/%d: %s", attempt + 1, EXTRACTION_MAX_ATTEMPTS, e)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Response was: %s", result_text[:500])
+                
+                # Step 4: Give up after the last attempt
+                if attempt == EXTRACTION_MAX_ATTEMPTS - 1:
+                    raise
+                
+                # Step 3: Show the model its mistake and retry
+                # (with the full output budget if it ran out of tokens)
+                if isinstance(e, _TruncatedResponse) and max_tokens_ceiling:
+                    request_kwargs["max_tokens"] = max(request_kwargs.get("max_tokens", 0), max_tokens_ceiling)
+                if result_text:
+                    messages.append({"role": "assistant", "content": result_text})
+                messages.append(
+                    {"role": "user", "content": f"Your output had error: {e}. Fix and return only valid JSON."}
+                )
+                await asyncio.sleep(EXTRACTION_RETRY_BACKOFF_SECONDS * (attempt + 1))
+    
+    def _prescription_request(self, raw_text: str, fit_output: bool = True) -> Dict[str, Any]:
+        """
+        Build chat.completions arguments for prescription extraction.
+        
+        Shared by the realtime path (extract_prescription_data) and the
+        Batch API path (submit_batch) so both send the
+        exact same model, prompt and settings.
+        
+        fit_output=True sizes max_tokens to the input (realtime calls retry
+        a truncated answer with PRESCRIPTION_MAX_OUTPUT_TOKENS).
+        """
+        
+        # IMPROVED PROMPT with better extraction instructions
+        document = f"Prescription Text:\n{_clip_input(raw_text, 'Prescription')}"
+        
+        return {
+            "model": "gpt-4o",
+            "messages": _extraction_messages(PRESCRIPTION_SYSTEM_PROMPT, PRESCRIPTION_INSTRUCTIONS, document),
+            "temperature": 0.05,  # Very low temperature for maximum accuracy
+            "max_tokens": (
+                _output_token_budget(raw_text, 600, 1.5, PRESCRIPTION_MAX_OUTPUT_TOKENS)
+                if fit_output else PRESCRIPTION_MAX_OUTPUT_TOKENS
+            ),
+            # API enforces the schema, no markdown fences to strip
+            "response_format": _schema_response_format("Prescription", PRESCRIPTION_SCHEMA)
+        }
+    
+    def _lab_report_request(self, raw_text: str, fit_output: bool = True) -> Dict[str, Any]:
+        """
+        Build chat.completions arguments for lab report extraction.
+        
+        Uses the strong model, or the small one for short reports when
+        LAB_REPORT_SMALL_MODEL_MAX_CHARS is set (off by default).
+        fit_output=True sizes max_tokens to the input (many test rows
+        produce more output per input token than a prescription).
+        
+        Shared by extract_lab_report_data() and the Batch API path.
+        """
+        
+        clipped_text = _clip_input(raw_text, 'Lab report')
+        document = f"Lab Report Text:\n{clipped_text}"
+        
+        # Measured on the text actually sent, not the raw OCR dump
+        if LAB_REPORT_SMALL_MODEL_MAX_CHARS and len(clipped_text) <= LAB_REPORT_SMALL_MODEL_MAX_CHARS:
+            model = self.cheap_model
+        else:
+            model = self.strong_model
+        
+        return {
+            "model": model,
+            "messages": _extraction_messages(LAB_REPORT_SYSTEM_PROMPT, LAB_REPORT_INSTRUCTIONS, document),
+            "temperature": 0.1,  # Low temperature for accuracy
+            "max_tokens": (
+                _output_token_budget(raw_text, 800, 2.0, LAB_REPORT_MAX_OUTPUT_TOKENS)
+                if fit_output else LAB_REPORT_MAX_OUTPUT_TOKENS
+            ),
+            "response_format": _schema_response_format("LabReport", LAB_REPORT_SCHEMA)  # API enforces the schema
+        }
+    
+    def _to_backend_format(
+        self,
+        extracted_data: Dict[str, Any],
+        user_id: Optional[int] = None,
+        doctor_id: Optional[int] = None,
+        prescription_image_url: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Convert AI-format prescription data to the backend list format.
+        
+        Called by:
+        - extract_prescription_data() when return_backend_format=True
+        - collect_batch() when return_backend_format=True
+        """
+        
+        logger.info("Converting to backend format...")
+        
+        # UPDATED: No validation - just pass whatever we have
+        # user_id, doctor_id, prescription_image_url can all be None
+        # Converter already returns the final record shape (incl. "id"),
+        # so it is wrapped as-is instead of being copied key by key
+        return [
+            self.converter.convert_prescription_to_backend(
+                ai_output=extracted_data,
+                user_id=user_id,  # Can be None
+                doctor_id=doctor_id,  # Can be None
+                prescription_image_url=prescription_image_url  # Can be None
+            )
+        ]
     
-    def extract_prescription_data(
+    async def extract_prescription_data(
         self, 
         raw_text: str,
         return_backend_format: bool = False,
@@ -119,13 +1372,13 @@ class AIExtractorService:
         
         Examples:
         Without backend format:
-        extract_prescription_data(raw_text="Name: John...")
+        await extract_prescription_data(raw_text="Name: John...")
         
         With backend format but no user/doctor:
-        extract_prescription_data(raw_text="Name: John...", return_backend_format=True)
+        await extract_prescription_data(raw_text="Name: John...", return_backend_format=True)
         
         With backend format and all fields:
-        extract_prescription_data(
+        await extract_prescription_data(
             raw_text="Name: John...",
             return_backend_format=True,
             user_id=1,
@@ -135,132 +1388,488 @@ class AIExtractorService:
         """
         
         logger.info("Extracting prescription data...")
-        logger.info(f"Input length: {len(raw_text)} characters")
-        logger.info(f"Backend format: {return_backend_format}")
+        logger.info("Input length: %d characters", len(raw_text))
+        logger.info("Backend format: %s", return_backend_format)
         
-        # IMPROVED PROMPT with better extraction instructions
-        prompt = f"""You are a medical prescription parser. Extract ALL information accurately from this prescription.
-
-Prescription Text:
-{raw_text}
-
-Extract and return ONLY valid JSON:
-{{
-    "patient_name": "full name (if mentioned)",
-    "patient_age": age as number (if mentioned),
-    "patient_sex": "Male/Female/male/female/M/F (extract from text, look for Male, Female, M, F keywords)",
-    "prescription_date": "YYYY-MM-DD format (convert dates like 19-Aug-2021 or 6/8/23)",
-    "doctor_name": "doctor name if mentioned",
-    "next_appointment": "extract follow-up date or duration like 'after 1 month', '2 weeks', null if not mentioned",
-    "medicines": [
-        {{
-            "name": "medicine name (clean, no Tab./Cap. prefix)",
-            "type": "Tablet/Capsule/Syrup/Injection",
-            "dosage": "full dosage like '10mg', '5mg', '500mg'",
-            "quantity": "quantity like '1/2 tab', '1 tab', '2 tabs' - KEEP FRACTIONS AS IS, also extract #number like #60, #300",
-            "frequency": "EXTRACT EXACTLY: 'once daily', 'twice daily', '3x a day', '2x a day', 'daily at bedtime', 'after breakfast & after dinner'",
-            "duration": "EXTRACT FROM #NUMBER: if #60 and frequency is once daily = 60 days, if #300 and 3x daily = 100 days",
-            "instructions": "FULL INSTRUCTIONS: 'at bedtime', 'after breakfast', 'after dinner', 'for muscle spasms', etc",
-            "refill_needed": true/false
-        }}
-    ],
-    "diagnosis": "diagnosis if mentioned",
-    "advice": "doctor's advice"
-}}
-
-CRITICAL RULES:
-1. Sex/Gender: Look for "Male", "Female", "M", "F", "male", "female" in text - IMPORTANT!
-2. Next Appointment: Extract "follow up", "next visit", "after X days/weeks/months"
-3. Quantity: MUST include #number format (like #60, #300) AND fractional doses (like 1/2 tab)
-4. Frequency: Extract EXACTLY as written: "3x a day", "2x a day", "once daily", "daily at bedtime", "after breakfast & after dinner"
-5. Duration: Calculate from #number. Example: #60 with once daily = 60 days, #300 with 3x daily = 100 days
-6. Instructions: Include ALL timing info: "at bedtime", "after breakfast", "after dinner", "before meals"
-7. Clean medicine names: Remove "Tab.", "Cap.", "Inj." prefixes
-8. Return ONLY JSON, no explanation text
-"""
+        # Identical OCR text (e.g. a retried upload) reuses the earlier result
+        cache_key = _cache_key("prescription", "gpt-4o", raw_text)
+        
+        # OCR failures (blank page, noise) get an empty result without a GPT call
+        skipped_reason = _unusable_text_reason(raw_text)
         
         try:
-            # Step 1: Call GPT to extract structured data with improved prompt
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a medical data extraction expert. Extract ALL information accurately including sex, next appointment, and #quantity numbers. Always respond in English. Return only valid JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.05,  # Very low temperature for maximum accuracy
-                max_tokens=3000  # Increased for longer prescriptions
+            # Step 1-2: Stream GPT response and parse it (retries on invalid JSON)
+            if skipped_reason is not None:
+                logger.info("Prescription extraction skipped_reason=%s", skipped_reason)
+                extracted_data = _empty_extraction(PRESCRIPTION_SCHEMA)
+            else:
+                extracted_data = await _cached_extraction(
+                    cache_key,
+                    "Prescription extraction",
+                    lambda: self._request_json_with_retry(
+                        max_tokens_ceiling=PRESCRIPTION_MAX_OUTPUT_TOKENS,
+                        **self._prescription_request(raw_text)
+                    )
+                )
+            
+            # Read each field once for logging
+            medicines = extracted_data.get("medicines") or []
+            next_appointment = extracted_data.get("next_appointment")
+            logger.info("Extracted %d medicines, next appointment: %s", len(medicines), next_appointment)
+            
+            # Patient details are PHI, keep them out of production logs
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Patient: %s, Sex: %s",
+                    extracted_data.get("patient_name"),
+                    extracted_data.get("patient_sex")
+                )
+            
+            # Step 3: Convert to backend format if requested
+            if return_backend_format:
+                return self._to_backend_format(
+                    extracted_data,
+                    user_id=user_id,
+                    doctor_id=doctor_id,
+                    prescription_image_url=prescription_image_url
+                )
+            
+            # Step 4: Return AI format (if backend format not requested)
+            return extracted_data
+            
+        except ValueError as e:
+            # Failed to parse JSON from GPT response after all retries
+            logger.error("Failed to parse JSON: %s", e)
+            raise RuntimeError("Failed to extract structured data from prescription")
+        
+        except Exception as e:
+            # Any other error during extraction
+            logger.error("Extraction failed: %s", e)
+            raise RuntimeError(f"Failed to extract prescription data: {str(e)}")
+    
+    async def extract_prescription_data_many(
+        self,
+        raw_texts: List[str],
+        return_backend_format: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Extract many prescriptions concurrently (one GPT call each).
+        
+        All documents are started together; the shared concurrency cap and
+        rate limiter decide how many actually run at once, so wall time is
+        ~ceil(K / OPENAI_CONCURRENCY) round trips instead of K.
+        
+        Parameters:
+        - raw_texts: List of OCR texts
+        - return_backend_format: If True, each result is in backend format
+        
+        Returns:
+        - List (input order) of {"index", "data", "error"}; one failed
+          document does not fail the others
+        
+        Called by:
+        - POST /extract/prescription-many
+        """
+        
+        logger.info("Concurrent extraction of %d prescriptions...", len(raw_texts))
+        
+        outcomes = await asyncio.gather(
+            *(
+                self.extract_prescription_data(raw_text, return_backend_format=return_backend_format)
+                for raw_text in raw_texts
+            ),
+            return_exceptions=True
+        )
+        
+        results = []
+        for index, outcome in enumerate(outcomes):
+            if isinstance(outcome, Exception):
+                results.append({"index": index, "data": None, "error": str(outcome)})
+            else:
+                data = outcome[0] if return_backend_format else outcome
+                results.append({"index": index, "data": data, "error": None})
+        
+        return results
+    
+    async def extract_prescription_fields(self, raw_text: str, fields: List[str]) -> Dict[str, Any]:
+        """
+        Extract only selected top-level prescription fields.
+        
+        The response schema is narrowed to the requested keys, so GPT
+        generates (and we parse) only those - e.g. fields=["medicines"]
+        skips patient, diagnosis and advice output tokens entirely.
+        
+        What happens here:
+        1. Validate requested field names
+        2. Reuse a cached full extraction if there is one
+        3. Otherwise request the narrowed schema from GPT
+        4. Return dict with exactly the requested fields
+        
+        Parameters:
+        - raw_text: Unstructured OCR text
+        - fields: Top-level keys of the prescription output (e.g. ["medicines", "patient_name"])
+        
+        Returns:
+        - Dict restricted to the requested fields (AI format)
+        
+        Raises:
+        - ValueError: Unknown field name
+        - RuntimeError: Extraction failed
+        
+        Called by:
+        - POST /extract/prescription when "fields" is given
+        """
+        
+        # Step 1: Validate requested fields (kept in schema order)
+        all_fields = PRESCRIPTION_SCHEMA["properties"]
+        unknown = set(fields) - all_fields.keys()
+        if unknown:
+            raise ValueError(f"Unknown prescription field(s): {', '.join(sorted(unknown))}")
+        selected = [field for field in all_fields if field in fields]
+        
+        logger.info("Extracting prescription fields: %s", selected)
+        
+        # Step 2: A cached full extraction already has every field
+        full_data = _cache_get(_cache_key("prescription", "gpt-4o", raw_text))
+        if full_data is not None:
+            logger.info("Prescription fields served from cached full extraction")
+            return {field: full_data.get(field) for field in selected}
+        
+        cache_key = _cache_key(f"prescription[{','.join(selected)}]", "gpt-4o", raw_text)
+        
+        # Step 3: Narrowed schema, only the requested keys are generated
+        schema = {
+            "type": "object",
+            "properties": {field: all_fields[field] for field in selected},
+            "required": selected,
+            "additionalProperties": False
+        }
+        request_kwargs = self._prescription_request(raw_text)
+        request_kwargs["messages"][-1]["content"] += f"\nReturn ONLY these keys: {', '.join(selected)}"
+        request_kwargs["response_format"] = _schema_response_format("PrescriptionFields", schema)
+        
+        # OCR failures (blank page, noise) get an empty result without a GPT call
+        skipped_reason = _unusable_text_reason(raw_text)
+        if skipped_reason is not None:
+            logger.info("Prescription fields skipped_reason=%s", skipped_reason)
+            return _empty_extraction(schema)
+        
+        try:
+            extracted_data = await _cached_extraction(
+                cache_key,
+                "Prescription fields",
+                lambda: self._request_json_with_retry(
+                    max_tokens_ceiling=PRESCRIPTION_MAX_OUTPUT_TOKENS,
+                    **request_kwargs
+                )
             )
             
-            # Step 2: Get response text from GPT
-            result_text = response.choices[0].message.content.strip()
+            # Step 4: Return requested fields
+            return extracted_data
             
-            # Step 3: Remove markdown code blocks if present
-            # Step 3: Robust JSON cleaning
-            if "```" in result_text:
-                parts = result_text.split("```")
-                if len(parts) >= 2:
-                    result_text = parts[1].strip()
-
-            # Extract only JSON block
-            start = result_text.find("{")
-            end = result_text.rfind("}")
-            if start != -1 and end != -1:
-                result_text = result_text[start:end+1]
+        except Exception as e:
+            logger.error("Field extraction failed: %s", e)
+            raise RuntimeError(f"Failed to extract prescription data: {str(e)}")
+    
+    async def extract_prescription_data_packed(self, raw_texts: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Extract many short prescriptions with as few GPT calls as possible.
+        
+        Realtime alternative to the Batch API for a clinic uploading a
+        folder: documents are greedily packed into one prompt (separated by
+        "### doc-N" headers) so the system prompt and round trip are paid
+        once per pack instead of once per document. Packs run concurrently.
+        
+        What happens here:
+        1. Greedily pack documents (input char budget + docs per call);
+           blank or noise-only OCR text gets an empty result, not a slot
+        2. Send every pack concurrently with the packed schema
+           (output budget scaled by the number of documents)
+        3. Collect results keyed by document id (only ids sent in that pack,
+           each at most once)
+        4. Extract documents the model skipped (or whose pack failed)
+           one by one with extract_prescription_data()
+        
+        Parameters:
+        - raw_texts: List of OCR texts, one per prescription
+        
+        Returns:
+        - Dict {"doc-0": {...}, "doc-1": {...}} in AI format.
+          A document is missing only if its single extraction also failed.
+        
+        Called by:
+        - POST /extract/prescription-packed
+        """
+        
+        logger.info("Packed extraction of %d prescriptions...", len(raw_texts))
+        
+        # Step 1: Greedy packing
+        results: Dict[str, Dict[str, Any]] = {}
+        # Each pack maps document id to its "### doc-N" block
+        packs: List[Dict[str, str]] = []
+        current: Dict[str, str] = {}
+        current_chars = 0
+        for index, raw_text in enumerate(raw_texts):
+            # OCR failures (blank page, noise) are not sent to GPT
+            skipped_reason = _unusable_text_reason(raw_text)
+            if skipped_reason is not None:
+                logger.info("Packed doc-%d skipped_reason=%s", index, skipped_reason)
+                results[f"doc-{index}"] = _empty_extraction(PRESCRIPTION_SCHEMA)
+                continue
+            
+            block = f"### doc-{index}\n{_clip_input(raw_text, 'Prescription')}"
+            if current and (
+                len(current) >= PACKED_MAX_DOCS_PER_CALL
+                or current_chars + len(block) > PACKED_MAX_INPUT_CHARS
+            ):
+                packs.append(current)
+                current, current_chars = {}, 0
+            current[f"doc-{index}"] = block
+            current_chars += len(block)
+        if current:
+            packs.append(current)
+        
+        logger.info("Packed into %d call(s)", len(packs))
+        
+        async def extract_pack(blocks: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+            documents = f"{len(blocks)} prescriptions:\n\n" + "\n\n".join(blocks.values())
+            try:
+                parsed = await self._request_json_with_retry(
+                    max_tokens_ceiling=PACKED_MAX_OUTPUT_TOKENS,
+                    model="gpt-4o",
+                    messages=_extraction_messages(
+                        PRESCRIPTION_SYSTEM_PROMPT, PACKED_PRESCRIPTION_INSTRUCTIONS, documents
+                    ),
+                    temperature=0.05,
+                    max_tokens=min(PACKED_MAX_OUTPUT_TOKENS, PACKED_OUTPUT_TOKENS_PER_DOC * len(blocks)),
+                    response_format=_schema_response_format("PrescriptionList", PACKED_PRESCRIPTION_SCHEMA)
+                )
+            except Exception as e:
+                # Malformed after every retry or an API error/timeout:
+                # the documents fall back to single calls
+                logger.warning("Pack of %d documents failed: %s", len(blocks), e)
+                return {}
+            
+            # Trust only ids from this pack, each once; an unknown or repeated
+            # id could file one patient's data under another document, so
+            # those documents are left missing and go to the single-call fallback
+            pack_results: Dict[str, Dict[str, Any]] = {}
+            repeated = set()
+            for result in parsed.get("results", []):
+                doc_id = result.pop("id", None)
+                if doc_id not in blocks:
+                    logger.warning("Pack returned unexpected document id %r, ignored", doc_id)
+                elif doc_id in pack_results:
+                    repeated.add(doc_id)
+                else:
+                    pack_results[doc_id] = result
+            for doc_id in repeated:
+                logger.warning("Pack returned %s more than once, extracting it singly", doc_id)
+                del pack_results[doc_id]
+            return pack_results
+        
+        try:
+            # Step 2: All packs concurrently
+            pack_results = await asyncio.gather(*(extract_pack(blocks) for blocks in packs))
+            
+            # Step 3: Key results by document id
+            for pack in pack_results:
+                for doc_id, result in pack.items():
+                    results[doc_id] = _dedupe_extraction(result)
+            
+            # Step 4: Skipped documents get their own call
+            missing = [index for index in range(len(raw_texts)) if f"doc-{index}" not in results]
+            if missing:
+                logger.warning("Packed extraction missed %d document(s), extracting them singly", len(missing))
+                singles = await asyncio.gather(
+                    *(self.extract_prescription_data(raw_texts[index]) for index in missing),
+                    return_exceptions=True
+                )
+                for index, single in zip(missing, singles):
+                    if isinstance(single, Exception):
+                        logger.error("Single extraction of doc-%d failed: %s", index, single)
+                    else:
+                        results[f"doc-{index}"] = single
+            
+            logger.info("Extracted %d/%d prescriptions", len(results), len(raw_texts))
+            
+            return results
+            
+        except Exception as e:
+            logger.error("Packed extraction failed: %s", e)
+            raise RuntimeError(f"Failed to extract prescriptions: {str(e)}")
+    
+    async def submit_batch(self, raw_texts: List[str], kind: str = "prescription") -> Dict[str, Any]:
+        """
+        Submit many documents to the OpenAI Batch API.
+        
+        For bulk, non-interactive work (backfills, nightly re-extraction).
+        Batch requests cost 50% less than realtime calls and do not count
+        against the realtime rate limits; results arrive within 24h.
+        Interactive paths (voice intent, single uploads) stay realtime.
+        
+        What happens here:
+        1. Build one JSONL line per document (custom_id = "<prefix>-<index>")
+        2. Upload the JSONL file with purpose="batch"
+        3. Create the batch job on /v1/chat/completions (kind in metadata)
+        4. Return the batch id and status
+        
+        Parameters:
+        - raw_texts: List of OCR texts, one per document
+        - kind: "prescription" or "lab_report"
+        
+        Returns:
+        - Dict with batch_id, kind, status and request count
+        
+        Raises:
+        - ValueError: Unknown kind
+        - RuntimeError: Batch API error
+        
+        Called by:
+        - POST /extract/prescription-batch
+        - POST /extract/lab-report-batch
+        """
+        
+        if kind not in BATCH_KINDS:
+            raise ValueError(f"Unknown batch kind: {kind}")
+        
+        prefix, builder_name = BATCH_KINDS[kind]
+        build_request = getattr(self, builder_name)
+        
+        logger.info("Submitting %s batch of %d documents...", kind, len(raw_texts))
+        
+        try:
+            # Step 1: One chat.completions request per line, same body as realtime
+            lines = [
+                orjson.dumps({
+                    "custom_id": f"{prefix}-{index}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": build_request(raw_text, fit_output=False)  # no truncation retry in batch
+                })
+                for index, raw_text in enumerate(raw_texts)
+            ]
+            
+            # Step 2: Upload JSONL input file
+            batch_file = await self.client.files.create(
+                file=(f"{kind}.jsonl", b"\n".join(lines)),
+                purpose="batch"
+            )
+            
+            # Step 3: Create batch job
+            batch = await self.client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+                metadata={"kind": kind}
+            )
+            
+            logger.info("Batch created: %s", batch.id)
+            
+            return {
+                "batch_id": batch.id,
+                "kind": kind,
+                "status": batch.status,
+                "request_count": len(raw_texts)
+            }
+            
+        except Exception as e:
+            logger.error("Batch submission failed: %s", e)
+            raise RuntimeError(f"Failed to submit {kind} batch: {str(e)}")
+    
+    async def collect_batch(
+        self,
+        batch_id: str,
+        kind: str = "prescription",
+        return_backend_format: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Fetch results of a batch created by submit_batch().
+        
+        What happens here:
+        1. Retrieve batch status (and check it is the expected kind)
+        2. If not completed yet, return status only
+        3. Download the output JSONL file
+        4. Parse each response (same parsing as the realtime path)
+        5. Optionally convert each prescription to backend format
+        
+        Parameters:
+        - batch_id: Id returned by submit_batch()
+        - kind: Expected batch kind ("prescription" or "lab_report")
+        - return_backend_format: If True, convert each prescription to backend DB format
+        
+        Returns:
+        - Dict with batch_id, kind, status and results (ordered by input index).
+          Each result has index, data and error (one of them is None).
+        
+        Raises:
+        - ValueError: Batch was submitted as a different kind
+        - RuntimeError: Batch API error
+        
+        Called by:
+        - GET /extract/prescription-batch/{batch_id}
+        - GET /extract/lab-report-batch/{batch_id}
+        """
+        
+        logger.info("Collecting %s batch %s...", kind, batch_id)
+        
+        try:
+            # Step 1: Check batch status
+            batch = await self.client.batches.retrieve(batch_id)
+        except Exception as e:
+            logger.error("Batch collection failed: %s", e)
+            raise RuntimeError(f"Failed to collect {kind} batch: {str(e)}")
+        
+        batch_kind = (batch.metadata or {}).get("kind", "prescription")
+        if batch_kind != kind:
+            raise ValueError(f"Batch {batch_id} is a {batch_kind} batch, not {kind}")
+        
+        try:
+            # Step 2: Nothing to download until the batch has finished
+            if batch.status != "completed" or not batch.output_file_id:
+                return {"batch_id": batch_id, "kind": kind, "status": batch.status, "results": None}
+            
+            # Step 3: Download output JSONL
+            output = await self.client.files.content(batch.output_file_id)
+            
+            # Step 4: Parse each line (output order is not guaranteed)
+            results = []
+            for line in output.text.splitlines():
+                if not line.strip():
+                    continue
+                
+                item = orjson.loads(line)
+                index = int(item["custom_id"].split("-", 1)[1])
+                response = item.get("response") or {}
+                
+                if item.get("error") or response.get("status_code") != 200:
+                    results.append({"index": index, "data": None, "error": item.get("error") or response.get("body")})
+                    continue
+                
+                try:
+                    content = response["body"]["choices"][0]["message"]["content"]
+                    extracted_data = _dedupe_extraction(orjson.loads(content))
+                except (KeyError, IndexError, orjson.JSONDecodeError) as e:
+                    results.append({"index": index, "data": None, "error": f"Invalid response: {str(e)}"})
+                    continue
+                
+                # Step 5: Convert to backend format if requested
+                if return_backend_format and kind == "prescription":
+                    extracted_data = self._to_backend_format(extracted_data)[0]
+                
+                results.append({"index": index, "data": extracted_data, "error": None})
             
-            # Step 4: Parse JSON response
-            extracted_data = json.loads(result_text)
+            results.sort(key=lambda result: result["index"])
             
-            logger.info(f"Extracted {len(extracted_data.get('medicines', []))} medicines")
-            logger.info(f"Patient: {extracted_data.get('patient_name', 'Unknown')}, Sex: {extracted_data.get('patient_sex', 'Not extracted')}")
-            logger.info(f"Next appointment: {extracted_data.get('next_appointment', 'None')}")
+            logger.info("Collected %d batch results", len(results))
             
-            # Step 5: Convert to backend format if requested
-            if return_backend_format:
-                logger.info("Converting to backend format...")
-                
-                # UPDATED: No validation - just pass whatever we have
-                # user_id, doctor_id, prescription_image_url can all be None
-                backend_data = self.converter.convert_prescription_to_backend(
-                    ai_output=extracted_data,
-                    user_id=user_id,  # Can be None
-                    doctor_id=doctor_id,  # Can be None
-                    prescription_image_url=prescription_image_url  # Can be None
-                )
-                
-                return [
-                    {
-                        "id": None,  # DB will assign
-                        "users": backend_data.get("users"),
-                        "doctor": backend_data.get("doctor"),
-                        "prescription_image": backend_data.get("prescription_image"),
-                        "next_appointment_date": backend_data.get("next_appointment_date"),
-                        "patient": backend_data.get("patient"),
-                        "medicines": backend_data.get("medicines", []),
-                        "medical_tests": backend_data.get("medical_tests", [])   
-                    }
-                ]
-            
-            # Step 6: Return AI format (if backend format not requested)
-            return extracted_data
+            return {"batch_id": batch_id, "kind": kind, "status": batch.status, "results": results}
             
-        except json.JSONDecodeError as e:
-            # Failed to parse JSON from GPT response
-            logger.error(f"Failed to parse JSON: {e}")
-            logger.error(f"Response was: {result_text[:500]}")
-            raise RuntimeError("Failed to extract structured data from prescription")
-        
         except Exception as e:
-            # Any other error during extraction
-            logger.error(f"Extraction failed: {str(e)}")
-            raise RuntimeError(f"Failed to extract prescription data: {str(e)}")
+            logger.error("Batch collection failed: %s", e)
+            raise RuntimeError(f"Failed to collect {kind} batch: {str(e)}")
     
-    def extract_voice_intent(self, transcribed_text: str) -> Dict[str, Any]:
+    async def extract_voice_intent(self, transcribed_text: str) -> Dict[str, Any]:
         """
         Extract intent and data from voice input.
         
@@ -273,7 +1882,7 @@ CRITICAL RULES:
         - Ask question
         
         What happens here:
-        1. Analyze voice transcription
+        1. Analyze voice transcription (gpt-4o-mini first, gpt-4o if it is unsure)
         2. Determine user intent (what they want to do)
         3. Extract relevant data based on intent
         4. Provide database API endpoint and query details
@@ -307,210 +1916,192 @@ CRITICAL RULES:
         """
         
         logger.info("Extracting intent from voice...")
-        logger.info(f"Input: {transcribed_text}")
+        logger.debug("Input: %s", transcribed_text)  # User speech may contain PHI
         
-        prompt = f"""You are a professional voice assistant for a health management system.
-
-User: "{transcribed_text}"
-
-Return DATABASE-ACTIONABLE JSON:
-
-{{
-    "intent":  "intent": "check_reminder|add_medicine|view_prescription|schedule_appointment|refill_medicine|ask_question|unclear",
-    "confidence": 0.0-1.0,
-    
-    "database_action": {{
-        "api_endpoint": "GET /prescriptions/my_prescriptions/",
-        "method": "GET|POST|PATCH",
-        "query_filters": {{
-            "today": true,
-            "medicine_name": "name or null",
-            "date_range": "today|week|month|null",
-            "time_of_day": "morning|afternoon|evening|night|null"
-        }},
-        "post_data": {{}} or null
-    }},
-    
-    "extracted_data": {{
-        "medicine_name": "name or null",
-        "dosage": "dosage or null",
-        "frequency": "frequency or null",
-        "duration": "duration or null",
-        "instructions": "instructions or null",
-        "query": "user's question"
-    }},
-    
-    "ui_action": "show_medicine_list|show_prescription_details|show_add_form|show_calendar|show_error",
-    "confirmation_needed": true/false,
-    "user_response": "Simple confirmation message"
-}}
-
-IMPORTANT:
-
-1. ALWAYS respond in English only.
-2. If user mentions morning/afternoon/evening/night → set time_of_day properly.
-3. If user asks for today's medicines → set today=true.
-4. If request is unclear → set intent="unclear".
-5. Return ONLY JSON. No explanations.
-
-Return ONLY JSON.":
-{{
-    "intent": "check_reminder",
-    "confidence": 0.9,
-    "database_action": {{
-        "api_endpoint": "GET /prescriptions/my_prescriptions/",
-        "method": "GET",
-        "query_filters": {{"today": true}}
-    }},
-    "extracted_data": {{"query": "today's medicine"}},
-    "ui_action": "show_medicine_list",
-    "confirmation_needed": false,
-    "user_response": "Here are today's medicines"
-}}
-
-"Add Paracetamol 500mg twice daily":
-{{
-    "intent": "add_medicine",
-    "confidence": 0.9,
-    "database_action": {{
-        "api_endpoint": "POST /prescriptions/{{prescription_id}}/medicines/",
-        "method": "POST",
-        "post_data": {{"medicine_name": "Paracetamol", "dosage": "500mg", "frequency": "twice daily"}}
-    }},
-    "extracted_data": {{
-        "medicine_name": "Paracetamol",
-        "dosage": "500mg",
-        "frequency": "twice daily"
-    }},
-    "ui_action": "show_add_form",
-    "confirmation_needed": true,
-    "user_response": "Adding Paracetamol 500mg twice daily. Please confirm duration and meal timing"
-}}
-
-"Show my prescriptions":
-{{
-    "intent": "view_prescription",
-    "confidence": 0.95,
-    "database_action": {{
-        "api_endpoint": "GET /prescriptions/my_prescriptions/",
-        "method": "GET"
-    }},
-    "ui_action": "show_prescription_details",
-    "confirmation_needed": false,
-    "user_response": "Showing your prescriptions"
-}}
-
-"I want to refill the medicine":
-{{
-    "intent": "refill_medicine",
-    "confidence": 0.85,
-    "database_action": {{
-        "api_endpoint": "GET /prescriptions/my_prescriptions/",
-        "method": "GET",
-        "query_filters": {{"low_stock": true}}
-    }},
-    "extracted_data": {{
-        "medicine_name": null,
-        "action": "refill"
-    }},
-    "ui_action": "show_refill_list",
-    "confirmation_needed": true,
-    "user_response": "Which medicine would you like to refill? Here are your medicines with low stock"
-}}
-
-"Refill Paracetamol":
-{{
-    "intent": "refill_medicine",
-    "confidence": 0.9,
-    "database_action": {{
-        "api_endpoint": "PATCH /prescriptions/{{prescription_id}}/medicines/{{medicine_id}}/",
-        "method": "PATCH",
-        "post_data": {{"action": "refill"}}
-    }},
-    "extracted_data": {{
-        "medicine_name": "Paracetamol",
-        "action": "refill"
-    }},
-    "ui_action": "show_refill_confirmation",
-    "confirmation_needed": true,
-    "user_response": "Refilling Paracetamol. How many days supply do you need?"
-}}
-
-Return ONLY JSON.
-"""
+        # Fixed phrases ("show my prescriptions") need no GPT call
+        local_intent = _match_intent_rule(transcribed_text)
+        if local_intent is not None:
+            return local_intent
         
-        try:
-            # Step 1: Call GPT to extract intent
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content":(
-                            "You are a professional deterministic intent classifier for a medical system voice assistant for a health system. "
-                            "ALWAYS generate responses in English only. "
-                            "Do NOT switch language even if the user speaks another language. "
-                            "Return only valid JSON with database-actionable responses."
-                        ) 
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.0,  # deterministic intent detection
-                max_tokens=1000
-            )
-            
-            # Step 2: Get response text
-            result_text = response.choices[0].message.content.strip()
+        # Repeated voice phrases ("what are today's medicines") reuse the earlier result
+        cache_key = self._voice_intent_cache_key(transcribed_text)
+        
+        async def classify() -> Dict[str, Any]:
+            _cascade_stats["total"] += 1
             
-            # Step 3: Clean markdown code blocks
+            # Step 1: Small intent + slot-fill task, try the faster and cheaper model
+            try:
+                extracted_intent = await self._request_json_with_retry(
+                    stream=False,
+                    validate=_validate_voice_intent,
+                    max_tokens_ceiling=VOICE_INTENT_MAX_OUTPUT_TOKENS,
+                    **self._voice_intent_request(transcribed_text, self.cheap_model)
+                )
+                escalation_reason = _voice_escalation_reason(extracted_intent)
+            except ValueError as e:
+                escalation_reason = f"invalid response ({e})"
             
-            #  ROBUST JSON CLEANING
-            if "```" in result_text:
-                parts = result_text.split("```")
-                if len(parts) >= 2:
-                    result_text = parts[1].strip()
-
-            start = result_text.find("{")
-            end = result_text.rfind("}")
-            if start != -1 and end != -1:
-                result_text = result_text[start:end+1]
+            # Step 2-3: Re-ask the strong model only when the small one was unsure
+            if escalation_reason is not None:
+                extracted_intent = await self._escalate_voice_intent(transcribed_text, escalation_reason)
             
-            # Step 4: Parse JSON
-            extracted_intent = json.loads(result_text)
-
-            #  SAFETY OVERRIDE FOR MEDICINE QUERY
-            lower_text = transcribed_text.lower()
-            if "today" in lower_text and "medicine" in lower_text:
-                extracted_intent["intent"] = "check_reminder"
-                extracted_intent["confidence"] = 0.95
-
+            return _apply_voice_overrides(transcribed_text, extracted_intent)
+        
+        try:
+            extracted_intent = await _cached_extraction(cache_key, "Voice intent", classify)
             
-            logger.info(f"Intent: {extracted_intent.get('intent')}")
-            logger.info(f"Confidence: {extracted_intent.get('confidence')}")
-            logger.info(f"Database Action: {extracted_intent.get('database_action', {}).get('api_endpoint')}")
+            logger.info("Intent: %s", extracted_intent.get('intent'))
+            logger.info("Confidence: %s", extracted_intent.get('confidence'))
+            logger.info("Database Action: %s", (extracted_intent.get('database_action') or {}).get('api_endpoint'))
             
-            # Step 5: Return extracted intent
+            # Step 4: Return extracted intent
             return extracted_intent
             
         except Exception as e:
-            # If extraction fails, return fallback response
-            logger.error(f"Intent extraction failed: {str(e)}")
+            # If extraction still fails after retries, return fallback response
+            logger.error("Intent extraction failed: %s", e)
             
             # Return safe fallback response
-            return {
-                "intent": "unclear",
-                "confidence": 0.0,
-                "database_action": None,
-                "extracted_data": {"query": transcribed_text},
-                "ui_action": "show_error",
-                "confirmation_needed": True,
-                "user_response": f"I'm not sure what you would like to do. Could you please clarify?"
-            }
+            return _voice_intent_fallback(transcribed_text)
+    
+    async def extract_voice_intent_stream(self, transcribed_text: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Extract voice intent, yielding the intent before the full JSON is done.
+        
+        What happens here:
+        1. Fixed phrases and cached utterances are yielded at once (single item)
+        2. Otherwise stream the small model's JSON response
+        3. As soon as "intent" and "confidence" have arrived, yield
+           {"intent", "confidence", "partial": True} so the caller can
+           start TTS or the database lookup early
+        4. Parse the complete JSON, escalate to the strong model if unsure
+           (same cascade as extract_voice_intent) and yield the full result
+        
+        The partial item may be skipped (e.g. cache hit) and, after an
+        escalation, the final intent can differ from the partial one.
+        
+        Parameters:
+        - transcribed_text: Text from speech-to-text service
+        
+        Yields:
+        - Optional partial dict, then the same dict extract_voice_intent() returns
+        
+        Called by:
+        - POST /extract/voice-intent-stream
+        """
+        
+        logger.info("Streaming intent from voice...")
+        logger.debug("Input: %s", transcribed_text)  # User speech may contain PHI
+        
+        # Step 1: Fixed phrases and repeated utterances need no GPT call
+        local_intent = _match_intent_rule(transcribed_text)
+        if local_intent is not None:
+            yield local_intent
+            return
+        
+        cache_key = self._voice_intent_cache_key(transcribed_text)
+        cached = _cache_get(cache_key)
+        if cached is not None:
+            logger.info("Voice intent cache_hit=True")
+            yield cached
+            return
+        
+        logger.info("Voice intent cache_hit=False")
+        _cascade_stats["total"] += 1
+        
+        try:
+            # Step 2: Stream the small model's answer
+            request_kwargs = self._voice_intent_request(transcribed_text, self.cheap_model)
+            parts = []
+            partial_sent = False
+            
+            async with self._openai_slot(request_kwargs["messages"], request_kwargs["max_tokens"]):
+                stream = await self.client.chat.completions.create(stream=True, **request_kwargs)
+                try:
+                    async for chunk in stream:
+                        if not chunk.choices or not chunk.choices[0].delta.content:
+                            continue
+                        parts.append(chunk.choices[0].delta.content)
+                        
+                        # Step 3: Yield intent + confidence once both are complete
+                        if not partial_sent:
+                            text = "".join(parts)
+                            intent_match = _STREAM_INTENT_RE.search(text)
+                            confidence_match = _STREAM_CONFIDENCE_RE.search(text)
+                            if intent_match and confidence_match and intent_match.group(1) in VOICE_INTENTS:
+                                partial_sent = True
+                                partial = _apply_voice_overrides(transcribed_text, {
+                                    "intent": intent_match.group(1),
+                                    "confidence": float(confidence_match.group(1))
+                                })
+                                partial["partial"] = True
+                                yield partial
+                finally:
+                    await stream.close()
+            
+            # Step 4: Parse the full answer, escalate if the small model was unsure
+            try:
+                extracted_intent = orjson.loads("".join(parts))
+                if not isinstance(extracted_intent, dict):
+                    raise ValueError("expected a JSON object")
+                _validate_voice_intent(extracted_intent)
+                escalation_reason = _voice_escalation_reason(extracted_intent)
+            except ValueError as e:
+                escalation_reason = f"invalid response ({e})"
+            
+            if escalation_reason is not None:
+                extracted_intent = await self._escalate_voice_intent(transcribed_text, escalation_reason)
+            
+            extracted_intent = _apply_voice_overrides(transcribed_text, extracted_intent)
+            _cache_put(cache_key, extracted_intent)
+            
+            logger.info("Intent: %s", extracted_intent.get('intent'))
+            yield extracted_intent
+            
+        except Exception as e:
+            logger.error("Intent extraction failed: %s", e)
+            yield _voice_intent_fallback(transcribed_text)
+    
+    def _voice_intent_cache_key(self, transcribed_text: str) -> str:
+        """Cache key for a voice intent produced by the cheap -> strong cascade."""
+        return _cache_key("voice_intent", f"{self.cheap_model}>{self.strong_model}", transcribed_text)
+    
+    def _voice_intent_request(self, transcribed_text: str, model: str) -> Dict[str, Any]:
+        """
+        Build chat.completions arguments for voice intent classification.
+        
+        Shared by extract_voice_intent() and extract_voice_intent_stream().
+        """
+        
+        utterance = f'User: "{_clip_input(transcribed_text, "Voice intent")}"'
+        
+        return {
+            "model": model,
+            "messages": _extraction_messages(VOICE_INTENT_SYSTEM_PROMPT, VOICE_INTENT_INSTRUCTIONS, utterance),
+            "temperature": 0.0,  # deterministic intent detection
+            "max_tokens": VOICE_INTENT_OUTPUT_TOKENS,
+            "response_format": {"type": "json_object"}  # API guarantees a JSON object
+        }
+    
+    async def _escalate_voice_intent(self, transcribed_text: str, reason: str) -> Dict[str, Any]:
+        """Re-ask the strong model after the small model was unsure or malformed."""
+        
+        _cascade_stats["escalated"] += 1
+        logger.info(
+            "Voice intent escalated to %s: %s (escalation_rate=%.2f)",
+            self.strong_model,
+            reason,
+            _cascade_stats["escalated"] / _cascade_stats["total"]
+        )
+        
+        return await self._request_json_with_retry(
+            stream=False,
+            validate=_validate_voice_intent,
+            max_tokens_ceiling=VOICE_INTENT_MAX_OUTPUT_TOKENS,
+            **self._voice_intent_request(transcribed_text, self.strong_model)
+        )
     
-    def extract_lab_report_data(self, raw_text: str) -> Dict[str, Any]:
+    async def extract_lab_report_data(self, raw_text: str) -> Dict[str, Any]:
         """
         Extract structured lab report data.
         
@@ -557,108 +2148,233 @@ Return ONLY JSON.
         
         logger.info("Extracting lab report data...")
         
-        prompt = f"""You are a medical lab report parser.
-
-Lab Report Text:
-{raw_text}
-
-Extract and return ONLY valid JSON:
-{{
-    "patient_name": "name or null",
-    "report_date": "YYYY-MM-DD or null",
-    "lab_name": "laboratory name or null",
-    "tests": [
-        {{
-            "test_name": "test name",
-            "value": "numeric value as string",
-            "unit": "unit (mg/dL, g/dL, etc.)",
-            "normal_range": "range or null",
-            "status": "normal|high|low or null"
-        }}
-    ],
-    "significant_findings": ["list of abnormal results"],
-    "doctor_comments": "comments if any or null"
-}}
+        # Identical OCR text (e.g. a retried upload) reuses the earlier result
+        request = self._lab_report_request(raw_text)
+        cache_key = _cache_key("lab_report", request["model"], raw_text)
+        
+        # OCR failures (blank page, noise) get an empty result without a GPT call
+        skipped_reason = _unusable_text_reason(raw_text)
+        
+        try:
+            # Step 1-2: Stream GPT response and parse it (retries on invalid JSON)
+            if skipped_reason is not None:
+                logger.info("Lab report extraction skipped_reason=%s", skipped_reason)
+                extracted_data = _empty_extraction(LAB_REPORT_SCHEMA)
+            else:
+                extracted_data = await _cached_extraction(
+                    cache_key,
+                    "Lab report extraction",
+                    lambda: self._request_json_with_retry(
+                        max_tokens_ceiling=LAB_REPORT_MAX_OUTPUT_TOKENS,
+                        **request
+                    )
+                )
+            
+            logger.info("Extracted %d lab tests", len(extracted_data.get('tests', [])))
+            
+            # Step 3: Return structured lab data
+            return extracted_data
+            
+        except Exception as e:
+            # Log error and raise
+            logger.error("Lab data extraction failed: %s", e)
+            raise RuntimeError(f"Failed to extract lab report data: {str(e)}")
 
-Rules:
-1. Extract ALL tests mentioned
-2. Determine status by comparing value with normal range
-3. Flag significant findings (high/low values)
-4. Return ONLY JSON
-"""
+    async def extract_combined(
+        self,
+        raw_text: str,
+        return_backend_format: bool = False,
+        user_id: Optional[int] = None,
+        doctor_id: Optional[int] = None,
+        prescription_image_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Extract prescription AND lab report data in one GPT call.
+        
+        For documents that mix both (discharge summaries, clinic sheets).
+        One round trip instead of calling extract_prescription_data()
+        and extract_lab_report_data() one after the other.
+        Documents known to contain only one kind should keep using the
+        dedicated method (smaller prompt, smaller output).
+        
+        What happens here:
+        1. Check cache
+        2. Send document text with the combined schema to GPT
+        3. Parse JSON (prescription and lab_report, each may be null)
+        4. Convert prescription part to backend format if requested
+        
+        Parameters:
+        - raw_text: Unstructured OCR text
+        - return_backend_format: If True, prescription part is converted to backend format
+        - user_id, doctor_id, prescription_image_url: Passed to backend conversion (OPTIONAL)
+        
+        Returns:
+        - Dict {"prescription": {...} or None, "lab_report": {...} or None}
+        
+        Called by:
+        - POST /extract/combined
+        """
+        
+        logger.info("Extracting combined prescription + lab report data...")
+        
+        # Step 1: Identical OCR text reuses the earlier result
+        cache_key = _cache_key("combined", "gpt-4o", raw_text)
+        
+        document = f"Document Text:\n{_clip_input(raw_text, 'Combined')}"
+        
+        # OCR failures (blank page, noise) get an empty result without a GPT call
+        skipped_reason = _unusable_text_reason(raw_text)
+        if skipped_reason is not None:
+            logger.info("Combined extraction skipped_reason=%s", skipped_reason)
+            return {"prescription": None, "lab_report": None}
         
         try:
-            # Step 1: Call GPT to extract lab data
-            response = self.client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a lab report analyzer. Return only JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=0.1,  # Low temperature for accuracy
-                max_tokens=2000
+            # Step 2-3: Stream GPT response and parse it (retries on invalid JSON;
+            # output budget sized to the input, full ceiling on a truncation retry)
+            extracted_data = await _cached_extraction(
+                cache_key,
+                "Combined extraction",
+                lambda: self._request_json_with_retry(
+                    max_tokens_ceiling=COMBINED_MAX_OUTPUT_TOKENS,
+                    model="gpt-4o",
+                    messages=_extraction_messages(PRESCRIPTION_SYSTEM_PROMPT, COMBINED_INSTRUCTIONS, document),
+                    temperature=0.05,  # Very low temperature for maximum accuracy
+                    max_tokens=_output_token_budget(raw_text, 1000, 2.0, COMBINED_MAX_OUTPUT_TOKENS),
+                    response_format=_schema_response_format("MedicalDocument", COMBINED_SCHEMA)
+                )
             )
             
-            # Step 2: Get response text
-            result_text = response.choices[0].message.content.strip()
+            prescription = extracted_data.get("prescription")
+            lab_report = extracted_data.get("lab_report")
             
-            # Step 3: Clean markdown code blocks
-            if "```json" in result_text:
-                result_text = result_text.split("```json")[1].split("```")[0].strip()
+            logger.info("Prescription found: %s, lab report found: %s", prescription is not None, lab_report is not None)
             
-            # Step 4: Parse JSON
-            extracted_data = json.loads(result_text)
+            # Step 4: Convert prescription part to backend format if requested
+            if return_backend_format and prescription is not None:
+                prescription = self._to_backend_format(
+                    prescription,
+                    user_id=user_id,
+                    doctor_id=doctor_id,
+                    prescription_image_url=prescription_image_url
+                )[0]
             
-            logger.info(f"Extracted {len(extracted_data.get('tests', []))} lab tests")
-            
-            # Step 5: Return structured lab data
-            return extracted_data
+            return {"prescription": prescription, "lab_report": lab_report}
             
         except Exception as e:
-            # Log error and raise
-            logger.error(f"Lab data extraction failed: {str(e)}")
-            raise RuntimeError(f"Failed to extract lab report data: {str(e)}")
+            logger.error("Combined extraction failed: %s", e)
+            raise RuntimeError(f"Failed to extract document data: {str(e)}")
 
-    def generate_general_response(self, user_text: str) -> str:
+    async def extract_all(self, raw_text: str) -> Dict[str, Any]:
         """
-        Handle non-medical / general conversation safely.
-        Production-safe general AI fallback.
+        Run prescription and lab report extraction concurrently.
+        
+        Both extractions read the same text and are independent, so
+        they are awaited together instead of one after the other.
+        Each keeps its own dedicated prompt and schema (compare
+        extract_combined(), which uses one call with a merged schema).
+        
+        Parameters:
+        - raw_text: Unstructured OCR text
+        
+        Returns:
+        - Dict {"prescription": {...}, "lab": {...}} in AI format
+        
+        Raises:
+        - RuntimeError: Either extraction failed
+        
+        Called by:
+        - POST /extract/all
+        """
+        
+        logger.info("Extracting prescription and lab report concurrently...")
+        
+        prescription, lab = await asyncio.gather(
+            self.extract_prescription_data(raw_text),
+            self.extract_lab_report_data(raw_text)
+        )
+        
+        return {"prescription": prescription, "lab": lab}
+
+    async def stream_general_response(self, user_text: str) -> AsyncIterator[str]:
+        """
+        Stream a general (non-medical) answer token by token.
+        
+        The caller sees the first words after ~100ms instead of waiting
+        for the whole completion. Errors are raised to the caller.
+        
+        Parameters:
+        - user_text: User message
+        
+        Yields:
+        - Text deltas as they arrive from GPT
+        
+        Called by:
+        - generate_general_response() (joins the deltas)
+        - POST /ai/chat/stream in app/api/chat.py
         """
 
-        logger.info("Generating general AI response...")
+        logger.info("Streaming general AI response...")
 
-        try:
-            response = self.client.chat.completions.create(
+        messages = [
+            {
+                "role": "system",
+                "content": GENERAL_RESPONSE_SYSTEM_PROMPT
+            },
+            {
+                "role": "user",
+                "content": user_text
+            }
+        ]
+
+        async with self._openai_slot(messages, 800):
+            stream = await self.client.chat.completions.create(
                 model="gpt-4o",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a professional AI assistant. "
-                            "ALWAYS respond in English only. "
-                            "Do NOT switch to any other language even if the user speaks another language. "
-                            "If the user asks medical database related questions, "
-                            "tell them to use the health features. "
-                            "Otherwise answer naturally and helpfully."
-                        )
-                    },
-                    {
-                        "role": "user",
-                        "content": user_text
-                    }
-                ],
+                messages=messages,
                 temperature=0.6,
-                max_tokens=800
+                max_tokens=800,
+                stream=True
             )
 
-            return response.choices[0].message.content.strip()
+            try:
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        yield delta
+            finally:
+                await stream.close()
+
+    async def generate_general_response(self, user_text: str) -> str:
+        """
+        Handle non-medical / general conversation safely.
+        Production-safe general AI fallback.
+        
+        Non-streaming wrapper around stream_general_response()
+        for callers that need the full string.
+        """
+
+        logger.info("Generating general AI response...")
+
+        try:
+            parts = [delta async for delta in self.stream_general_response(user_text)]
+            return "".join(parts).strip()
 
         except Exception as e:
-            logger.error(f"General AI response failed: {str(e)}")
-            return "I'm here to help. Could you please clarify your question?"
+            logger.error("General AI response failed: %s", e)
+            return GENERAL_RESPONSE_FALLBACK
+
+
+@functools.lru_cache(maxsize=1)
+def get_extractor(api_key: str) -> AIExtractorService:
+    """
+    Return the process-wide AIExtractorService for this API key.
+    
+    Building the service per request threw away the OpenAI client's
+    connection pool, so every call paid a new TLS handshake.
+    One instance is created on first use and reused afterwards.
+    
+    Called by:
+    - API routes in app/api/extract.py and app/api/chat.py
+    """
+    return AIExtractorService(api_key=api_key)
@@ -11,30 +11,232 @@ Supported file types:
 
 Uses multiple extraction methods:
 1. OpenAI Vision API (best for handwritten prescriptions)
-2. Tesseract OCR (fallback for printed text)
+2. Tesseract OCR (fallback for printed text; runs in-process
+   through tesserocr when it is installed, else via pytesseract)
 
 This file:
 - Only returns extracted text
 - Does NOT save files anywhere
 - Does NOT contain FastAPI routes
 - Does NOT talk to the database or backend
+
+Tesseract is limited to one OpenMP thread per process (OMP_THREAD_LIMIT=1,
+unless already set). Pages and requests are OCR'd in parallel already,
+and each Tesseract process spawning a thread per core makes them fight
+for the same cores.
 """
 
 import io
+import os
 import base64
-from typing import List, Optional
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+# Must be set before Tesseract runs; each tesseract subprocess inherits it
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 
-import cv2
 import numpy as np
 from openai import OpenAI
 
-import fitz  # Used to read PDF files (PyMuPDF)
-from docx import Document  # Used to read Word (DOCX) files
-from PIL import Image  # Used for image handling
-import pytesseract  # OCR engine to read text from images
+from PIL import Image, ImageOps  # Used for image handling
+
+from app.services.openai_client import get_openai_client
+
+# Heavy OCR libraries are imported where they are used, not here:
+# every route imports this module, and most requests never OCR anything.
+# - cv2 (OpenCV): image preprocessing
+# - fitz (PyMuPDF): PDF files
+# - docx (python-docx): Word files
+# - pytesseract / tesserocr: Tesseract OCR (see _load_pytesseract / _load_tesserocr)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_pytesseract():
+    """Import and configure pytesseract on first use (OCR engine to read text from images)."""
+    import pytesseract
+    
+    # Set Tesseract executable path for Windows
+    pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+    
+    # Resolve the Tesseract binary once (pytesseract caches the version)
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        print(f"Tesseract not available: {str(e)}")
+    
+    return pytesseract
+
+
+@functools.lru_cache(maxsize=1)
+def _load_tesserocr():
+    """Import the optional in-process Tesseract engine (no subprocess + temp file per call), or None."""
+    try:
+        import tesserocr
+    except ImportError:
+        return None
+    return tesserocr
+
+# Scanned PDF pages are OCR'd in parallel by this many worker threads.
+# Threads are enough: Tesseract runs as a separate process and the
+# Vision API call is network I/O, so neither holds the GIL.
+OCR_PAGE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Vision calls are pure network wait (~3s each), so pages go to the API
+# with more concurrency than the CPU-bound Tesseract path allows
+VISION_PAGE_CONCURRENCY = 10
+
+# Tesseract runs (CPU-bound) across all threads stay capped at OCR_PAGE_WORKERS,
+# also when a Vision page thread falls back to Tesseract, and for image uploads
+_tesseract_slots = threading.BoundedSemaphore(OCR_PAGE_WORKERS)
+
+# Worker threads live for the whole process, not one request, so each
+# thread's tesserocr engine (see _get_tess_api) is loaded once and reused.
+# Every Tesseract run goes through _tesseract_executor, so at most
+# OCR_PAGE_WORKERS engines ever exist.
+_tesseract_worker = threading.local()
+
 
-# Set Tesseract executable path for Windows
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+def _mark_tesseract_worker() -> None:
+    """Executor initializer: flag this thread as a Tesseract worker."""
+    _tesseract_worker.active = True
+
+
+def _on_tesseract_worker(fn: Callable, *args):
+    """Run fn(*args) on a Tesseract worker thread (directly if already on one) and return its result."""
+    if getattr(_tesseract_worker, "active", False):
+        return fn(*args)
+    return _tesseract_executor.submit(fn, *args).result()
+
+
+_tesseract_executor = ThreadPoolExecutor(
+    max_workers=OCR_PAGE_WORKERS,
+    thread_name_prefix="ocr-tesseract",
+    initializer=_mark_tesseract_worker
+)
+_vision_page_executor = ThreadPoolExecutor(
+    max_workers=VISION_PAGE_CONCURRENCY, thread_name_prefix="ocr-vision"
+)
+
+# Rasterized pages held in memory at once per worker (a page image is
+# several MB), so a 500-page scan never has every page image in memory together
+OCR_PAGE_WINDOW_PER_WORKER = 2
+
+# Preprocessing constants, built once instead of per image
+_MORPH_KERNEL = np.ones((2, 2), np.uint8)
+
+# Deskew angle is measured on a copy at most this wide, from at most
+# this many sampled text pixels
+DESKEW_MAX_WIDTH = 800
+DESKEW_MAX_POINTS = 10000
+
+# CLAHE objects keep scratch buffers between apply() calls, so each
+# worker thread gets its own instead of sharing one across threads
+_clahe_cache = threading.local()
+
+
+def _get_clahe(clip_limit: float) -> "cv2.CLAHE":
+    """Return this thread's CLAHE object for clip_limit (8x8 tiles), creating it once."""
+    import cv2
+    
+    cache = _clahe_cache.__dict__
+    if clip_limit not in cache:
+        cache[clip_limit] = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=(8, 8))
+    return cache[clip_limit]
+
+
+# A tesserocr engine is not thread-safe, so each Tesseract worker thread keeps
+# its own (loaded once, then reused for every image that thread OCRs)
+_tess_api_cache = threading.local()
+
+
+def _get_tess_api() -> Optional["tesserocr.PyTessBaseAPI"]:
+    """Return this thread's tesserocr engine, or None to use the pytesseract subprocess."""
+    tesserocr = _load_tesserocr()
+    # Engines live only on _tesseract_executor threads (never on request threads)
+    if tesserocr is None or not getattr(_tesseract_worker, "active", False):
+        return None
+    if not hasattr(_tess_api_cache, "api"):
+        try:
+            _tess_api_cache.api = tesserocr.PyTessBaseAPI(lang="eng", oem=tesserocr.OEM.DEFAULT)
+        except Exception as e:
+            # e.g. tessdata not found; fall back to the tesseract binary
+            print(f"tesserocr unavailable, using pytesseract: {str(e)}")
+            _tess_api_cache.api = None
+    return _tess_api_cache.api
+
+
+# Born-digital detection: if most of the first few pages have a text
+# layer, the PDF was generated (not scanned) and OCR is skipped entirely
+BORN_DIGITAL_PROBE_PAGES = 5
+BORN_DIGITAL_TEXT_RATIO = 0.8
+
+# Scanned pages are rasterized in grayscale without alpha:
+# a third of the RGB bytes, and OCR only needs the text strokes.
+# 200 DPI suits Tesseract's LSTM engine; raise it only for very small print.
+OCR_PAGE_DPI = 200
+
+# Vision reads pages well at ~1 MP, so pages bound for the API are
+# rasterized smaller (a page that falls back to Tesseract is scaled
+# back up to OCR_PAGE_DPI first)
+VISION_PAGE_DPI = 150
+
+# Vision API input cap. The API itself scales images to fit 2048x2048
+# (detail="high"), so anything larger only costs upload bytes and latency.
+VISION_MAX_DIMENSION = 2048
+VISION_JPEG_QUALITY = 85
+
+# Per-request memory budget for uploaded images. A 20 MP photo decodes
+# to ~60 MB RGB, and every concurrent OCR request holds its own copy.
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+MAX_IMAGE_PIXELS = 40_000_000
+
+# JPEGs larger than this are decoded at reduced scale (libjpeg 1/2, 1/4, 1/8)
+OCR_DECODE_MAX_DIMENSION = 2048
+
+# Extracted text keyed by a hash of the file bytes. Retries and previews
+# re-upload the same prescription, and each Vision call costs a round
+# trip and money. Shared by all worker threads, hence the lock.
+OCR_CACHE_SIZE = 512
+OCR_CACHE_TTL_SECONDS = 600
+_ocr_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_ocr_cache_lock = threading.Lock()
+
+
+def _ocr_cache_key(kind: str, file_bytes: bytes) -> str:
+    """Build cache key from the extraction kind and a blake2b digest of the file."""
+    return f"{kind}:{hashlib.blake2b(file_bytes, digest_size=16).hexdigest()}"
+
+
+def _ocr_cache_get(key: str) -> Optional[str]:
+    """Return the cached text (or None) and mark it recently used."""
+    with _ocr_cache_lock:
+        entry = _ocr_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, text = entry
+        if expires_at < time.monotonic():
+            del _ocr_cache[key]
+            return None
+        _ocr_cache.move_to_end(key)
+        return text
+
+
+def _ocr_cache_put(key: str, text: str) -> None:
+    """Store extracted text, evicting the least recently used entry."""
+    with _ocr_cache_lock:
+        _ocr_cache[key] = (time.monotonic() + OCR_CACHE_TTL_SECONDS, text)
+        _ocr_cache.move_to_end(key)
+        if len(_ocr_cache) > OCR_CACHE_SIZE:
+            _ocr_cache.popitem(last=False)
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an uploaded image exceeds MAX_IMAGE_BYTES or MAX_IMAGE_PIXELS."""
 
 
 class OCRService:
@@ -47,24 +249,28 @@ class OCRService:
     2. Tesseract OCR - for printed text (free, offline)
     """
     
-    def __init__(self, openai_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        openai_api_key: Optional[str] = None,
+        client: Optional[OpenAI] = None
+    ):
         """
         Initialize OCR service.
         
         What happens here:
-        - Store OpenAI API key if provided
-        - Create OpenAI client for Vision API calls
+        - Use the injected OpenAI client, or the shared one for this key
         
         Parameters:
         - openai_api_key: Optional OpenAI API key for Vision API
+        - client: Optional OpenAI client to use instead of the shared one
         """
         
-        # Store OpenAI client (will be None if no key provided)
-        self.openai_client = None
+        # Store OpenAI client (will be None if no key or client provided)
+        self.openai_client = client
         
-        # If API key is provided, create OpenAI client
-        if openai_api_key:
-            self.openai_client = OpenAI(api_key=openai_api_key)
+        # If API key is provided, reuse the process-wide OpenAI client
+        if self.openai_client is None and openai_api_key:
+            self.openai_client = get_openai_client(openai_api_key)
 
     def extract_text(self, file_bytes: bytes, filename: str) -> str:
         """
@@ -75,8 +281,9 @@ class OCRService:
 
         What happens here:
         1. Check file extension
-        2. Call appropriate extraction method
-        3. Return extracted text
+        2. Return cached text for a recently seen PDF/DOCX
+        3. Otherwise call appropriate extraction method
+        4. Return extracted text
 
         Parameters:
         - file_bytes: uploaded file data (kept in memory)
@@ -92,15 +299,24 @@ class OCRService:
         # Make filename lowercase to avoid case issues
         filename = filename.lower()
 
-        # If the file is a PDF, extract text from PDF
-        if filename.endswith(".pdf"):
-            # Call PDF extraction method below
-            return self._extract_from_pdf(file_bytes)
-
-        # If the file is a DOCX, extract text from DOCX
-        if filename.endswith(".docx"):
-            # Call DOCX extraction method below
-            return self._extract_from_docx(file_bytes)
+        # If the file is a PDF or DOCX, reuse the text of an identical
+        # recent upload (images are cached at the Vision call instead)
+        if filename.endswith((".pdf", ".docx")):
+            kind = filename.rsplit(".", 1)[-1]
+            cache_key = _ocr_cache_key(kind, file_bytes)
+            cached_text = _ocr_cache_get(cache_key)
+            if cached_text is not None:
+                return cached_text
+            
+            if kind == "pdf":
+                # Call PDF extraction method below
+                text = self._extract_from_pdf(file_bytes)
+            else:
+                # Call DOCX extraction method below
+                text = self._extract_from_docx(file_bytes)
+            
+            _ocr_cache_put(cache_key, text)
+            return text
 
         # If the file is an image, extract text using OCR
         if filename.endswith((".png", ".jpg", ".jpeg")):
@@ -112,14 +328,79 @@ class OCRService:
             "Unsupported file type. Only PDF, DOCX, PNG, JPG, and JPEG are allowed."
         )
 
-    def _extract_with_openai_vision(self, file_bytes: bytes) -> Optional[str]:
+    def _prepare_vision_payload(self, file_bytes: bytes) -> str:
+        """
+        Build the image data URL sent to the Vision API.
+        
+        What happens here:
+        1. Detect the real image format (not the file extension)
+        2. Shrink images over VISION_MAX_DIMENSION and encode as JPEG
+           (phone photos are often 10+ MP; the API downsizes them anyway),
+           applying the EXIF orientation first since re-encoding drops it
+        3. Send JPEG and WebP as they are (already compressed)
+        4. Transcode other formats (PNG, TIFF, ...) to JPEG once, unless
+           they are palette or black-and-white images, which stay PNG
+        5. Label the data URL with the MIME type actually sent
+        
+        Parameters:
+        - file_bytes: image file data
+        
+        Returns:
+        - data URL ("data:image/<type>;base64,...")
+        
+        Called by:
+        - _extract_with_openai_vision() method
+        """
+        
+        # Step 1: Image.open() only reads the header here
+        image = Image.open(io.BytesIO(file_bytes))
+        source_format = (image.format or "").upper()
+        
+        # Step 2: Resize large images with high-quality LANCZOS interpolation
+        # (rotated upright first: phone photos are stored sideways plus an
+        # EXIF orientation tag, which the re-encoded JPEG would not carry)
+        scale = VISION_MAX_DIMENSION / max(image.size)
+        if scale < 1:
+            image = ImageOps.exif_transpose(image)
+            image = image.resize(
+                (int(image.width * scale), int(image.height * scale)),
+                Image.LANCZOS
+            )
+        
+        # Step 3: Already compressed formats go as-is
+        elif source_format in ("JPEG", "WEBP"):
+            return self._data_url(source_format.lower(), file_bytes)
+        
+        # Step 4: Keep line art / bilevel scans lossless (PNG beats JPEG there)
+        elif image.mode in ("1", "P"):
+            if source_format == "PNG":
+                return self._data_url("png", file_bytes)
+            output = io.BytesIO()
+            image.save(output, format="PNG")
+            return self._data_url("png", output.getvalue())
+        
+        # Re-encode as JPEG (no alpha channel in JPEG, no EXIF orientation kept)
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=VISION_JPEG_QUALITY)
+        
+        # Step 5: Data URL with the matching MIME type
+        return self._data_url("jpeg", output.getvalue())
+
+    def _data_url(self, image_type: str, image_bytes: bytes) -> str:
+        """Return a base64 data URL for image bytes of the given type (jpeg, png, webp)."""
+        return f"data:image/{image_type};base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+
+    def _extract_with_openai_vision(self, file_bytes: bytes, detail: str = "high") -> Optional[str]:
         """
         Extract text using OpenAI Vision API.
         
         This is the BEST method for handwritten prescriptions.
         
         What happens here:
-        1. Convert image to base64 format
+        1. Downscale / transcode the image, convert to a base64 data URL
         2. Send to OpenAI Vision API
         3. Get extracted text back
         4. Return the text
@@ -131,23 +412,31 @@ class OCRService:
         
         Parameters:
         - file_bytes: image file data
+        - detail: Vision detail level, "high" for handwriting (fine strokes),
+          "low" is enough for clean printed documents
         
         Returns:
         - extracted text or None if API call fails
         
         Called by:
         - _extract_from_image() method
-        - _extract_from_pdf() method (for scanned PDFs)
+        - _ocr_page_image() method (for scanned PDF pages)
         """
         
         # If no OpenAI client, return None
         if not self.openai_client:
             return None
         
+        # Same image seen recently: reuse its text, skip the API call
+        cache_key = _ocr_cache_key(f"vision-{detail}", file_bytes)
+        cached_text = _ocr_cache_get(cache_key)
+        if cached_text is not None:
+            return cached_text
+        
         try:
-            # Step 1: Convert image bytes to base64 string
+            # Step 1: Convert image bytes to a base64 data URL
             # OpenAI API needs base64 format
-            base64_image = base64.b64encode(file_bytes).decode('utf-8')
+            image_url = self._prepare_vision_payload(file_bytes)
             
             # Step 2: Call OpenAI Vision API
             # Model: gpt-4o (latest vision model)
@@ -176,7 +465,8 @@ class OCRService:
                                 "type": "image_url",
                                 "image_url": {
                                     # Send base64 image to API
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
+                                    "url": image_url,
+                                    "detail": detail
                                 }
                             }
                         ]
@@ -188,8 +478,10 @@ class OCRService:
             # Step 3: Extract text from API response
             extracted_text = response.choices[0].message.content
             
-            # Step 4: Return cleaned text
-            return extracted_text.strip()
+            # Step 4: Return cleaned text (cached for repeat uploads)
+            extracted_text = extracted_text.strip()
+            _ocr_cache_put(cache_key, extracted_text)
+            return extracted_text
             
         except Exception as e:
             # If API call fails, print error and return None
@@ -222,6 +514,8 @@ class OCRService:
         - _extract_from_image() method
         """
         
+        import cv2
+        
         # Step 1: Convert PIL Image to numpy array for OpenCV
         img_array = np.array(image)
         
@@ -253,12 +547,12 @@ class OCRService:
         # Step 4: Enhance contrast using CLAHE
         # CLAHE = Contrast Limited Adaptive Histogram Equalization
         # Makes dark text darker and light background lighter
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-        enhanced = clahe.apply(gray)
+        enhanced = _get_clahe(3.0).apply(gray)
         
         # Step 5: Gentle denoising that preserves handwriting strokes
-        # h=10 is gentle denoising strength
-        denoised = cv2.fastNlMeansDenoising(enhanced, h=10)
+        # Bilateral filter smooths paper noise but keeps stroke edges,
+        # at a fraction of the cost of non-local means denoising
+        denoised = cv2.bilateralFilter(enhanced, d=7, sigmaColor=50, sigmaSpace=50)
         
         # Step 6: Otsu's automatic thresholding
         # Automatically finds best threshold to separate text from background
@@ -278,7 +572,7 @@ class OCRService:
         # Step 8: Convert back to PIL Image format
         return Image.fromarray(binary)
 
-    def _preprocess_image(self, image: Image.Image) -> Image.Image:
+    def _preprocess_image(self, image: Image.Image, preserve_edges: bool = False) -> Image.Image:
         """
         Standard preprocessing for printed text.
         
@@ -293,21 +587,40 @@ class OCRService:
         5. Remove noise
         6. Apply thresholding
         7. Morphological operations
-        8. Sharpen text
         
         Parameters:
         - image: PIL Image object
+        - preserve_edges: denoise with the (much slower) edge-preserving
+          bilateral filter instead of a light Gaussian blur; for noisy
+          smartphone photos of printed text
         
         Returns:
         - processed PIL Image ready for OCR
         
         Called by:
         - _extract_from_image() method
-        - _extract_from_pdf() method
         """
         
         # Step 1: Convert PIL Image to numpy array
-        img_array = np.array(image)
+        return self._preprocess_image_np(np.array(image), preserve_edges)
+
+    def _preprocess_image_np(self, img_array: np.ndarray, preserve_edges: bool = False) -> Image.Image:
+        """
+        Standard preprocessing on a numpy image (steps 2-9 of _preprocess_image).
+        
+        Parameters:
+        - img_array: grayscale (H, W) or RGB (H, W, 3) uint8 array
+        - preserve_edges: bilateral instead of Gaussian denoising
+        
+        Returns:
+        - processed PIL Image ready for OCR
+        
+        Called by:
+        - _preprocess_image() method
+        - _ocr_page_image() method (raw PDF page pixels, no PNG decode)
+        """
+        
+        import cv2
         
         # Step 2: Resize if image is too small
         height, width = img_array.shape[:2]
@@ -331,19 +644,32 @@ class OCRService:
             gray = img_array
         
         # Step 4: Automatic rotation correction (deskewing)
-        # Find all non-white pixels
-        coords = np.column_stack(np.where(gray > 0))
+        # Find the text pixels on a small copy: Otsu threshold, dark text -> 255
+        # (on the raw grayscale nearly every pixel is > 0, which measured
+        # the page rectangle instead of the text)
+        height, width = gray.shape[:2]
+        probe = gray
+        if width > DESKEW_MAX_WIDTH:
+            probe = cv2.resize(
+                gray,
+                (DESKEW_MAX_WIDTH, int(height * DESKEW_MAX_WIDTH / width)),
+                interpolation=cv2.INTER_AREA
+            )
+        _, text_mask = cv2.threshold(probe, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+        coords = np.column_stack(np.where(text_mask > 0))
+        
+        # minAreaRect only needs a sample of the points
+        if len(coords) > DESKEW_MAX_POINTS:
+            coords = coords[::len(coords) // DESKEW_MAX_POINTS]
         
         if len(coords) > 0:
             # Find minimum area rectangle containing all text
-            # This gives us the rotation angle
+            # This gives us the rotation angle (same on the small copy)
             angle = cv2.minAreaRect(coords)[-1]
             
-            # Adjust angle to correct range
-            if angle < -45:
-                angle = -(90 + angle)
-            else:
-                angle = -angle
+            # Adjust angle to correct range (-45, 45],
+            # whichever range this OpenCV version reports
+            angle = -(((angle + 45) % 90) - 45)
             
             # Only rotate if angle is significant (> 0.5 degrees)
             if abs(angle) > 0.5:
@@ -362,12 +688,15 @@ class OCRService:
                 )
         
         # Step 5: Enhance contrast using CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        contrast_enhanced = clahe.apply(gray)
+        contrast_enhanced = _get_clahe(2.0).apply(gray)
         
-        # Step 6: Remove noise using bilateral filter
-        # This filter removes noise while preserving edges
-        denoised = cv2.bilateralFilter(contrast_enhanced, 9, 75, 75)
+        # Step 6: Remove noise
+        if preserve_edges:
+            # Bilateral filter removes noise while preserving edges (slow)
+            denoised = cv2.bilateralFilter(contrast_enhanced, 9, 75, 75)
+        else:
+            # Clean scans already have sharp edges after CLAHE; a light blur is enough
+            denoised = cv2.GaussianBlur(contrast_enhanced, (3, 3), 0)
         
         # Step 7: Apply adaptive thresholding
         # Makes text black and background white
@@ -381,24 +710,17 @@ class OCRService:
         )
         
         # Step 8: Morphological closing to fill small holes in text
-        kernel = np.ones((2, 2), np.uint8)
         morph = cv2.morphologyEx(
             thresh, 
             cv2.MORPH_CLOSE,  # Closing operation
-            kernel, 
+            _MORPH_KERNEL, 
             iterations=1
         )
         
-        # Step 9: Sharpen the text
-        kernel_sharpen = np.array([
-            [-1, -1, -1],
-            [-1,  9, -1],
-            [-1, -1, -1]
-        ])
-        sharpened = cv2.filter2D(morph, -1, kernel_sharpen)
+        # No sharpening here: on a binary image it only adds ringing at edges
         
-        # Step 10: Convert back to PIL Image
-        processed_image = Image.fromarray(sharpened)
+        # Step 9: Convert back to PIL Image
+        processed_image = Image.fromarray(morph)
         
         return processed_image
 
@@ -424,6 +746,8 @@ class OCRService:
         - extract_text() method when file is .docx
         """
 
+        from docx import Document  # Used to read Word (DOCX) files
+
         # Step 1: Load DOCX from memory (not from disk)
         document = Document(io.BytesIO(file_bytes))
 
@@ -442,19 +766,23 @@ class OCRService:
         # Step 4: Combine all paragraphs with newlines
         return "\n".join(paragraphs)
 
-    def _extract_from_pdf(self, file_bytes: bytes) -> str:
+    def _extract_from_pdf(self, file_bytes: bytes, dpi: Optional[int] = None) -> str:
         """
         Extract text from a PDF file.
 
         What happens here:
         1. Try to extract text directly (for normal PDFs)
         2. If no text found, it's a scanned PDF
-        3. Convert pages to images
-        4. Try OpenAI Vision API first
-        5. Fallback to Tesseract OCR if needed
+           (unless the PDF is born-digital, then the page is blank)
+        3. Convert pages to grayscale images
+        4. OCR scanned pages in parallel: OpenAI Vision API first
+           (VISION_PAGE_CONCURRENCY pages at a time), Tesseract OCR if
+           needed (OCR_PAGE_WORKERS at a time)
         
         Parameters:
         - file_bytes: PDF file data
+        - dpi: rasterization DPI for scanned pages (default VISION_PAGE_DPI
+          with Vision, else OCR_PAGE_DPI; raise for very small fonts)
         
         Returns:
         - extracted text from all pages
@@ -463,13 +791,45 @@ class OCRService:
         - extract_text() method when file is .pdf
         """
 
+        import fitz  # Used to read PDF files (PyMuPDF)
+
         # Step 1: Open PDF from memory
         pdf_document = fitz.open(stream=file_bytes, filetype="pdf")
         
-        # Step 2: Create list to store text from all pages
-        extracted_pages: List[str] = []
+        # Step 2: Generated PDFs need no OCR at all
+        born_digital = self._is_born_digital(pdf_document)
+        
+        # One slot per page, filled in page order
+        extracted_pages: List[str] = [""] * len(pdf_document)
+        
+        # Scanned pages waiting for OCR:
+        # (page_index, grayscale page pixels, Tesseract fallback scale)
+        pending: List[Tuple[int, np.ndarray, float]] = []
+
+        # Vision needs fewer pixels than Tesseract
+        if dpi is None:
+            dpi = VISION_PAGE_DPI if self.openai_client else OCR_PAGE_DPI
+
+        # Network-bound Vision calls can fan out wider than Tesseract
+        if self.openai_client:
+            executor, workers = _vision_page_executor, VISION_PAGE_CONCURRENCY
+        else:
+            executor, workers = _tesseract_executor, OCR_PAGE_WORKERS
+        page_window = workers * OCR_PAGE_WINDOW_PER_WORKER
 
+        def flush_pending() -> None:
+            # OCR the buffered page images concurrently
+            page_texts = executor.map(
+                self._ocr_page_image,
+                [image for _, image, _ in pending],
+                [fallback_scale for _, _, fallback_scale in pending]
+            )
+            for (page_index, _, _), page_text in zip(pending, page_texts):
+                extracted_pages[page_index] = page_text
+            pending.clear()
+        
         # Step 3: Process each page one by one
+        # (PyMuPDF is not thread-safe, so reading and rasterizing stay here)
         for page_index in range(len(pdf_document)):
             # Get current page
             page = pdf_document[page_index]
@@ -478,47 +838,147 @@ class OCRService:
             page_text = page.get_text().strip()
 
             # Step 5: If text exists, add it to results
-            if page_text:
-                extracted_pages.append(page_text)
+            # (in a born-digital PDF an empty page is simply blank)
+            if page_text or born_digital:
+                extracted_pages[page_index] = page_text
                 continue  # Move to next page
 
             # Step 6: No text found - this is a scanned PDF
-            # Convert page to image with high DPI for better quality
-            pixmap = page.get_pixmap(dpi=300)  # 300 DPI = high quality
-            image_bytes = pixmap.tobytes()
-            
-            # Step 7: Try OpenAI Vision first if available
-            if self.openai_client:
-                # Call OpenAI Vision API (defined above)
-                vision_text = self._extract_with_openai_vision(image_bytes)
-                
-                if vision_text:
-                    # Vision API succeeded, add text and move to next page
-                    extracted_pages.append(vision_text)
-                    continue
+            # Convert page to a grayscale image for OCR, keeping the raw
+            # pixel buffer (no PNG encode here and decode in the worker)
+            # (oversize pages are rendered at a lower DPI to stay in MAX_IMAGE_PIXELS)
+            page_inches = (page.rect.width / 72) * (page.rect.height / 72)
+            max_dpi = int((MAX_IMAGE_PIXELS / max(page_inches, 1)) ** 0.5)
+            page_dpi = min(dpi, max_dpi)
+            pixmap = page.get_pixmap(dpi=page_dpi, colorspace=fitz.csGRAY, alpha=False)
+            page_array = np.frombuffer(pixmap.samples, dtype=np.uint8).reshape(
+                pixmap.height, pixmap.stride
+            )[:, :pixmap.width]
+            # A page rendered below OCR_PAGE_DPI for Vision is scaled
+            # back up if it ends up on Tesseract
+            fallback_scale = max(1.0, min(OCR_PAGE_DPI, max_dpi) / page_dpi)
+            pending.append((page_index, page_array, fallback_scale))
             
-            # Step 8: OpenAI Vision failed or not available
-            # Fallback to Tesseract OCR
+            # Step 7-8: OCR a full window of scanned pages in parallel
+            if len(pending) >= page_window:
+                flush_pending()
+        
+        if pending:
+            flush_pending()
+
+        # Step 9: Combine all pages with double newlines
+        return "\n\n".join(page_text for page_text in extracted_pages if page_text)
+
+    def _is_born_digital(self, pdf_document) -> bool:
+        """
+        Check whether a PDF was generated rather than scanned.
+        
+        Probes the first BORN_DIGITAL_PROBE_PAGES pages; if at least
+        BORN_DIGITAL_TEXT_RATIO of them have a text layer, the whole
+        document is read from its text layer without rasterizing.
+        
+        Parameters:
+        - pdf_document: open fitz Document
+        
+        Returns:
+        - True if the PDF is born-digital
+        
+        Called by:
+        - _extract_from_pdf() method
+        """
+        
+        probe_count = min(BORN_DIGITAL_PROBE_PAGES, len(pdf_document))
+        if probe_count == 0:
+            return False
+        
+        pages_with_text = sum(
+            1 for page_index in range(probe_count)
+            if pdf_document[page_index].get_text("text").strip()
+        )
+        return pages_with_text / probe_count >= BORN_DIGITAL_TEXT_RATIO
+
+    def _ocr_page_image(self, page_array: np.ndarray, fallback_scale: float = 1.0) -> str:
+        """
+        OCR one rasterized PDF page.
+        
+        What happens here:
+        1. Try OpenAI Vision first if available (page sent as JPEG)
+        2. Fallback to Tesseract OCR with standard preprocessing, on the page
+           scaled back up to OCR_PAGE_DPI if it was rasterized for Vision
+        
+        Parameters:
+        - page_array: grayscale page pixels from get_pixmap()
+        - fallback_scale: upscale factor applied before Tesseract (1.0 = none)
+        
+        Returns:
+        - extracted page text (empty string if nothing was found)
+        
+        Called by:
+        - _extract_from_pdf() from its worker threads
+        """
+        
+        # Step 1: Try OpenAI Vision first if available
+        if self.openai_client:
+            import cv2
             
-            # Convert bytes to PIL Image
-            image = Image.open(io.BytesIO(image_bytes))
+            # Shrink to the Vision size limit and encode once as JPEG
+            # (much smaller than PNG for scans, so a smaller base64 payload)
+            height, width = page_array.shape[:2]
+            scale = VISION_MAX_DIMENSION / max(height, width)
+            vision_array = page_array
+            if scale < 1:
+                vision_array = cv2.resize(
+                    page_array,
+                    (int(width * scale), int(height * scale)),
+                    interpolation=cv2.INTER_AREA
+                )
+            _, jpeg = cv2.imencode('.jpg', vision_array, [cv2.IMWRITE_JPEG_QUALITY, VISION_JPEG_QUALITY])
             
-            # Preprocess image for better OCR
-            processed_image = self._preprocess_image(image)
+            # Call OpenAI Vision API (defined above)
+            vision_text = self._extract_with_openai_vision(jpeg.tobytes())
             
-            # Run Tesseract OCR with standard config
-            custom_config = r'--oem 3 --psm 6'
-            ocr_text = pytesseract.image_to_string(
-                processed_image, 
-                config=custom_config
-            ).strip()
-
-            # Add OCR result if not empty
-            if ocr_text:
-                extracted_pages.append(ocr_text)
+            if vision_text:
+                # Vision API succeeded
+                return vision_text
+        
+        # Step 2: OpenAI Vision failed or not available
+        # Fallback to Tesseract OCR (a Vision page thread hands it to a Tesseract worker)
+        return _on_tesseract_worker(self._tesseract_page, page_array, fallback_scale)
 
-        # Step 9: Combine all pages with double newlines
-        return "\n\n".join(extracted_pages)
+    def _tesseract_page(self, page_array: np.ndarray, fallback_scale: float) -> str:
+        """
+        Tesseract part of _ocr_page_image(), run on a Tesseract worker thread.
+        
+        Parameters:
+        - page_array: grayscale page pixels from get_pixmap()
+        - fallback_scale: upscale factor applied before Tesseract (1.0 = none)
+        
+        Returns:
+        - extracted page text
+        
+        Called by:
+        - _ocr_page_image() method
+        """
+        
+        # Only OCR_PAGE_WORKERS pages use the CPU at once
+        with _tesseract_slots:
+            # 150 DPI is enough for Vision but too coarse for Tesseract
+            if fallback_scale > 1:
+                import cv2
+                
+                height, width = page_array.shape[:2]
+                page_array = cv2.resize(
+                    page_array,
+                    (int(width * fallback_scale), int(height * fallback_scale)),
+                    interpolation=cv2.INTER_CUBIC
+                )
+            
+            # Preprocess the page pixels directly for better OCR
+            processed_image = self._preprocess_image_np(page_array)
+            
+            # Run Tesseract OCR with standard config (PSM 6)
+            text, _ = self._run_tesseract(processed_image, psm=6)
+            return text.strip()
 
     def _extract_from_image(self, file_bytes: bytes) -> str:
         """
@@ -546,6 +1006,15 @@ class OCRService:
         - extract_text() method when file is image
         """
         
+        # Reject oversize uploads before anything decodes them
+        # (byte size, then pixel count from the header; the Vision path
+        # below decodes the image at full resolution)
+        if len(file_bytes) > MAX_IMAGE_BYTES:
+            raise ImageTooLargeError(
+                f"Image is too large (maximum {MAX_IMAGE_BYTES // (1024 * 1024)} MB)"
+            )
+        self._check_image_pixels(Image.open(io.BytesIO(file_bytes)))
+        
         # Strategy 1: Try OpenAI Vision first (best for handwritten)
         if self.openai_client:
             # Call OpenAI Vision API (defined above)
@@ -557,46 +1026,110 @@ class OCRService:
         
         # Strategy 2: OpenAI failed or not available - use Tesseract
         
-        # Load image from memory
-        image = Image.open(io.BytesIO(file_bytes))
-        
-        # Create list to store different OCR attempts
-        results = []
-        
-        # Try 1: Standard preprocessing (for printed text)
-        try:
-            # Preprocess image (defined above)
-            processed_standard = self._preprocess_image(image)
-            
-            # Try multiple PSM modes (defined below)
-            text1 = self._ocr_with_multiple_psm(processed_standard)
-            
-            if text1.strip():
-                results.append(text1)
-        except:
-            # If preprocessing fails, continue to next method
-            pass
+        # Load image from memory (size-checked, decoded at reduced scale)
+        image = self._load_image_bounded(file_bytes)
+        
+        # Try both pipelines at the same time (independent and CPU-bound;
+        # OpenCV and Tesseract release the GIL):
+        # 1. Standard preprocessing (for printed text; uploads are usually
+        #    phone photos, so keep edge-preserving denoising)
+        # 2. Handwritten preprocessing (for handwritten text)
+        attempts = _tesseract_executor.map(
+            lambda preprocess: self._run_pipeline(image, preprocess),
+            [
+                functools.partial(self._preprocess_image, preserve_edges=True),
+                self._preprocess_for_handwritten
+            ]
+        )
         
-        # Try 2: Handwritten preprocessing (for handwritten text)
-        try:
-            # Preprocess for handwriting (defined above)
-            processed_handwritten = self._preprocess_for_handwritten(image)
-            
-            # Try multiple PSM modes
-            text2 = self._ocr_with_multiple_psm(processed_handwritten)
-            
-            if text2.strip():
-                results.append(text2)
-        except:
-            # If preprocessing fails, continue
-            pass
+        # Keep the attempts that produced text
+        results = [text for text in attempts if text.strip()]
         
         # Return the longest result (usually most accurate)
         if results:
             return max(results, key=len)
         
         # Last resort: direct OCR without any preprocessing
-        return pytesseract.image_to_string(image).strip()
+        text = _on_tesseract_worker(self._run_tesseract_slot, image, 3)
+        return text.strip()
+
+    def _run_tesseract_slot(self, image: Image.Image, psm: int) -> str:
+        """_run_tesseract() text under a Tesseract slot, for _on_tesseract_worker()."""
+        with _tesseract_slots:
+            text, _ = self._run_tesseract(image, psm)
+        return text
+
+    def _run_pipeline(
+        self,
+        image: Image.Image,
+        preprocess: Callable[[Image.Image], Image.Image]
+    ) -> str:
+        """
+        Preprocess an image one way, then OCR it with multiple PSM modes.
+        
+        Parameters:
+        - image: decoded PIL Image
+        - preprocess: _preprocess_image or _preprocess_for_handwritten
+        
+        Returns:
+        - extracted text (empty string if this pipeline failed)
+        
+        Called by:
+        - _extract_from_image() from its worker threads
+        """
+        
+        try:
+            # Counts against the same per-process cap as PDF pages
+            with _tesseract_slots:
+                # Preprocess image (defined above)
+                processed_image = preprocess(image)
+                
+                # Try multiple PSM modes (defined below)
+                return self._ocr_with_multiple_psm(processed_image)
+        except Exception:
+            # If preprocessing fails, the other pipeline may still work
+            return ""
+
+    def _load_image_bounded(self, file_bytes: bytes) -> Image.Image:
+        """
+        Decode an uploaded image within the per-request memory budget.
+        
+        What happens here:
+        1. Read only the header and reject images over MAX_IMAGE_PIXELS
+        2. Ask the JPEG decoder for grayscale at reduced scale (draft mode),
+           so large photos never materialize at full resolution
+        3. Decode
+        
+        Parameters:
+        - file_bytes: image file data
+        
+        Returns:
+        - decoded PIL Image
+        
+        Called by:
+        - _extract_from_image() method
+        """
+        
+        # Step 1: Image.open() only parses the header, nothing is decoded yet
+        image = Image.open(io.BytesIO(file_bytes))
+        self._check_image_pixels(image)
+        
+        # Step 2: Decode JPEGs straight to grayscale at up to 1/8 scale
+        # (no-op for PNG; OCR preprocessing converts to grayscale anyway)
+        image.draft("L", (OCR_DECODE_MAX_DIMENSION, OCR_DECODE_MAX_DIMENSION))
+        
+        # Step 3: Decode
+        image.load()
+        return image
+
+    def _check_image_pixels(self, image: Image.Image) -> None:
+        """Raise ImageTooLargeError if an opened (not yet decoded) image is over MAX_IMAGE_PIXELS."""
+        width, height = image.size
+        if width * height > MAX_IMAGE_PIXELS:
+            raise ImageTooLargeError(
+                f"Image is too large ({width}x{height} pixels, "
+                f"maximum {MAX_IMAGE_PIXELS // 1_000_000} MP)"
+            )
 
     def _ocr_with_multiple_psm(self, processed_image: Image.Image) -> str:
         """
@@ -609,8 +1142,9 @@ class OCRService:
         - PSM 4: Single column of text
         
         What happens here:
-        1. Try each PSM mode
-        2. Calculate confidence score for each
+        1. Try each PSM mode (one Tesseract run gives both the text
+           and its confidence)
+        2. Compare confidence scores
         3. Return result with highest confidence
         
         Parameters:
@@ -633,30 +1167,8 @@ class OCRService:
         # Try each PSM mode
         for psm in psm_modes:
             try:
-                # Create Tesseract config string
-                custom_config = f'--oem 3 --psm {psm}'
-                
-                # Run OCR
-                text = pytesseract.image_to_string(
-                    processed_image, 
-                    config=custom_config
-                )
-                
-                # Get detailed data including confidence scores
-                data = pytesseract.image_to_data(
-                    processed_image, 
-                    config=custom_config, 
-                    output_type=pytesseract.Output.DICT
-                )
-                
-                # Extract confidence values (filter out -1 which means no data)
-                confidences = [
-                    int(conf) for conf in data['conf'] 
-                    if conf != '-1'
-                ]
-                
-                # Calculate average confidence
-                avg_confidence = sum(confidences) / len(confidences) if confidences else 0
+                # Run OCR, getting text and average word confidence
+                text, avg_confidence = self._run_tesseract(processed_image, psm)
                 
                 # Keep result if it has better confidence
                 if avg_confidence > max_confidence and text.strip():
@@ -668,4 +1180,110 @@ class OCRService:
                 continue
         
         # Return best result
-        return best_text.strip()
\ No newline at end of file
+        return best_text.strip()
+
+    def _run_tesseract(self, image: Image.Image, psm: int) -> Tuple[str, float]:
+        """
+        Run Tesseract once on an image with the given PSM mode.
+        
+        What happens here:
+        1. With tesserocr installed: use this thread's in-process engine
+           (already loaded, so no subprocess, temp file or model load)
+        2. Otherwise: one pytesseract.image_to_data() subprocess call
+        
+        Parameters:
+        - image: PIL Image (usually preprocessed)
+        - psm: Tesseract page segmentation mode
+        
+        Returns:
+        - (text, average word confidence 0-100)
+        
+        Called by:
+        - _ocr_with_multiple_psm() method
+        - _ocr_page_image() method
+        - _extract_from_image() method (last resort)
+        """
+        
+        # Step 1: In-process engine
+        api = _get_tess_api()
+        if api is not None:
+            api.SetPageSegMode(psm)
+            api.SetImage(image)
+            return api.GetUTF8Text(), float(api.MeanTextConf())
+        
+        # Step 2: Tesseract binary via pytesseract
+        pytesseract = _load_pytesseract()
+        data = pytesseract.image_to_data(
+            image, 
+            config=f'--oem 3 --psm {psm}', 
+            output_type=pytesseract.Output.DICT
+        )
+        
+        # Confidence per entry as one array; -1 means a layout row, not a word
+        # (pytesseract returns str or number depending on version, float() takes both)
+        conf_arr = np.asarray(data['conf'], dtype=np.float32)
+        word_mask = conf_arr >= 0
+        
+        # Rebuild the page text from the recognized words
+        text = self._text_from_tesseract_data(data, word_mask)
+        
+        # Calculate average confidence
+        avg_confidence = float(conf_arr[word_mask].mean()) if word_mask.any() else 0.0
+        
+        return text, avg_confidence
+
+    def _text_from_tesseract_data(self, data: dict, word_mask: np.ndarray) -> str:
+        """
+        Rebuild page text from pytesseract.image_to_data() output.
+        
+        Words are joined with spaces per line, lines with newlines,
+        and blocks are separated by a blank line (like image_to_string).
+        
+        Parameters:
+        - data: image_to_data() result as Output.DICT
+        - word_mask: True for entries with a confidence (actual words)
+        
+        Returns:
+        - extracted text
+        
+        Called by:
+        - _run_tesseract() method
+        """
+        
+        blocks: List[List[str]] = []
+        current_line: List[str] = []
+        line_key = None
+        
+        for index in np.flatnonzero(word_mask):
+            # Skip empty words (layout rows are already masked out)
+            word = data['text'][index]
+            if not word.strip():
+                continue
+            
+            key = (data['block_num'][index], data['par_num'][index], data['line_num'][index])
+            if key != line_key:
+                # New line; a new block also starts a new paragraph group
+                if current_line:
+                    blocks[-1].append(" ".join(current_line))
+                if line_key is None or key[0] != line_key[0]:
+                    blocks.append([])
+                current_line = []
+                line_key = key
+            
+            current_line.append(word.strip())
+        
+        if current_line:
+            blocks[-1].append(" ".join(current_line))
+        
+        return "\n\n".join("\n".join(lines) for lines in blocks)
+
+
+@functools.lru_cache(maxsize=1)
+def get_ocr_service(openai_api_key: Optional[str] = None) -> OCRService:
+    """
+    Return the process-wide OCRService for this API key.
+    
+    Called by:
+    - API routes in app/api/ocr.py and app/api/chat.py
+    """
+    return OCRService(openai_api_key=openai_api_key)
@@ -0,0 +1,80 @@
+"""
+openai_client.py
+
+Process-wide OpenAI clients.
+
+Each client owns its own httpx connection pool, so building one per
+service (or per request) pays a fresh TCP + TLS handshake on the first
+call. This module keeps one client per API key that services share:
+- OpenAI (blocking): OCR Vision calls, which run in worker threads
+- AsyncOpenAI: Speech-to-Text and Text-to-Speech, awaited on the event loop
+
+The extractor (app/services/extractor.py) keeps its own AsyncOpenAI
+client with a tuned connection pool.
+"""
+
+import threading
+from typing import Dict
+
+from openai import AsyncOpenAI, OpenAI
+
+from app.config import OPENAI_MAX_RETRIES
+
+
+# One client per API key (normally exactly one)
+_clients: Dict[str, OpenAI] = {}
+_async_clients: Dict[str, AsyncOpenAI] = {}
+_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key: str) -> OpenAI:
+    """
+    Return the shared OpenAI client for this API key.
+
+    What happens here:
+    1. Return the existing client if one was already built
+    2. Otherwise build it under a lock so concurrent first requests
+       (worker threads from asyncio.to_thread) create only one
+
+    Parameters:
+    - api_key: OpenAI API key
+
+    Returns:
+    - OpenAI client (thread-safe, reused across requests)
+
+    Called by:
+    - OCRService
+    """
+
+    client = _clients.get(api_key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = OpenAI(api_key=api_key, max_retries=OPENAI_MAX_RETRIES)
+            _clients[api_key] = client
+        return client
+
+
+def get_async_openai_client(api_key: str) -> AsyncOpenAI:
+    """
+    Return the shared AsyncOpenAI client for this API key.
+
+    Parameters:
+    - api_key: OpenAI API key
+
+    Returns:
+    - AsyncOpenAI client (reused across requests)
+
+    Called by:
+    - SpeechToTextService, TextToSpeechService
+    """
+
+    with _clients_lock:
+        client = _async_clients.get(api_key)
+        if client is None:
+            client = AsyncOpenAI(api_key=api_key, max_retries=OPENAI_MAX_RETRIES)
+            _async_clients[api_key] = client
+        return client
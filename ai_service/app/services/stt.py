@@ -4,16 +4,27 @@ stt.py
 Speech-to-Text service with safe error handling.
 """
 
-from openai import OpenAI
-from typing import Tuple
+from openai import AsyncOpenAI
+from typing import Optional, Tuple
+import asyncio
+import functools
 import io
 
+from app.services.openai_client import get_async_openai_client
+
+# Whisper uploads in flight at once (per process), so a burst of voice
+# requests does not run into the API rate limit
+STT_CONCURRENCY = 10
+
 
 class SpeechToTextService:
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
+    def __init__(self, api_key: Optional[str] = None, client: Optional[AsyncOpenAI] = None):
+        # Use the injected client, or the process-wide one for this key
+        # (async: the event loop serves other requests during the upload)
+        self.client = client if client is not None else get_async_openai_client(api_key)
+        self._request_slots = asyncio.Semaphore(STT_CONCURRENCY)
 
-    def transcribe_audio(self, audio_bytes: bytes, filename: str) -> Tuple[str, str]:
+    async def transcribe_audio(self, audio_bytes: bytes, filename: str) -> Tuple[str, str]:
         """
         Convert audio bytes into text using OpenAI STT.
 
@@ -26,10 +37,11 @@ class SpeechToTextService:
             audio_file = io.BytesIO(audio_bytes)
             audio_file.name = filename
 
-            response = self.client.audio.transcriptions.create(
-                file=audio_file,
-                model="whisper-1"
-            )
+            async with self._request_slots:
+                response = await self.client.audio.transcriptions.create(
+                    file=audio_file,
+                    model="whisper-1"
+                )
 
             text = response.text.strip()
             language = getattr(response, "language", "unknown")
@@ -39,3 +51,17 @@ class SpeechToTextService:
         except Exception as e:
             # Re-raise exception so FastAPI shows proper error
             raise RuntimeError(f"Speech-to-Text failed: {str(e)}")
+
+
+@functools.lru_cache(maxsize=1)
+def get_stt_service(api_key: str) -> SpeechToTextService:
+    """
+    Return the process-wide SpeechToTextService for this API key.
+
+    The service uses the shared OpenAI client from
+    app/services/openai_client.py, so its connection pool stays warm.
+
+    Called by:
+    - API routes in app/api/voice.py and app/api/chat.py
+    """
+    return SpeechToTextService(api_key=api_key)
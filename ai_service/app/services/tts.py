@@ -15,13 +15,37 @@ This file:
 - Returns audio bytes
 """
 
-from openai import OpenAI
-from typing import Optional
+from openai import AsyncOpenAI
+from typing import AsyncIterator, Optional, Tuple
+from collections import OrderedDict
+import asyncio
+import functools
 import logging
+import threading
+import time
+
+from app.services.openai_client import get_async_openai_client
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
+# Generated audio keyed by (text, voice, speed). Reminders are read aloud
+# with the same wording again and again, so repeats skip the API call.
+TTS_CACHE_SIZE = 128
+TTS_CACHE_TTL_SECONDS = 3600
+
+# TTS requests in flight at once (per process), to stay under the rate limit
+TTS_CONCURRENCY = 10
+
+# Chunk size when relaying streamed audio to the client
+TTS_STREAM_CHUNK_BYTES = 4096
+
+# Streamed speech defaults to Opus: about a third of the MP3 size
+# at the same perceived quality
+TTS_STREAM_FORMAT = "opus"
+_tts_cache: "OrderedDict[Tuple[str, str, float], Tuple[float, bytes]]" = OrderedDict()
+_tts_cache_lock = threading.Lock()
+
 
 class TextToSpeechService:
     """
@@ -30,22 +54,26 @@ class TextToSpeechService:
     Uses OpenAI TTS API which supports multiple voices.
     """
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: Optional[str] = None, client: Optional[AsyncOpenAI] = None):
         """
         Initialize TTS service.
         
         What happens here:
-        - Create OpenAI client with API key
+        - Use the injected AsyncOpenAI client, or the shared one for this key
+        - Cap concurrent TTS requests
         - Set default voice
         
         Parameters:
         - api_key: OpenAI API key for TTS
+        - client: Optional AsyncOpenAI client to use instead of the shared one
         """
         
         logger.info("Initializing Text-to-Speech service...")
         
-        # Create OpenAI client
-        self.client = OpenAI(api_key=api_key)
+        # Reuse the process-wide async OpenAI client (warm connection pool;
+        # the event loop serves other requests while audio is generated)
+        self.client = client if client is not None else get_async_openai_client(api_key)
+        self._request_slots = asyncio.Semaphore(TTS_CONCURRENCY)
         
         # Default voice (can be changed)
         # Available voices: alloy, echo, fable, onyx, nova, shimmer
@@ -53,7 +81,7 @@ class TextToSpeechService:
         
         logger.info(f"TTS service initialized with voice: {self.default_voice}")
     
-    def generate_speech(
+    async def generate_speech(
         self, 
         text: str, 
         voice: Optional[str] = None,
@@ -80,24 +108,17 @@ class TextToSpeechService:
         - API route in app/api/voice.py (TTS endpoint)
         """
         
-        # Step 1: Validate input
-        if not text or not text.strip():
-            logger.error("Empty text provided for TTS")
-            raise ValueError("Text cannot be empty")
+        # Step 1-3: Validate text, voice and speed
+        selected_voice, speed = self._validate_request(text, voice, speed)
         
-        # Step 2: Use provided voice or default
-        selected_voice = voice if voice else self.default_voice
-        
-        # Validate voice option
-        valid_voices = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
-        if selected_voice not in valid_voices:
-            logger.warning(f"Invalid voice '{selected_voice}', using default")
-            selected_voice = self.default_voice
-        
-        # Step 3: Validate speed
-        if speed < 0.25 or speed > 4.0:
-            logger.warning(f"Invalid speed {speed}, using 1.0")
-            speed = 1.0
+        # Same text, voice and speed generated recently: reuse the audio
+        cache_key = (text, selected_voice, speed)
+        with _tts_cache_lock:
+            entry = _tts_cache.get(cache_key)
+            if entry is not None and entry[0] >= time.monotonic():
+                _tts_cache.move_to_end(cache_key)
+                logger.info(f"Speech served from cache: {len(entry[1])} bytes")
+                return entry[1]
         
         logger.info(f"Generating speech for: '{text[:50]}...'")
         logger.info(f"Voice: {selected_voice}, Speed: {speed}")
@@ -105,12 +126,13 @@ class TextToSpeechService:
         try:
             # Step 4: Call OpenAI TTS API
             # Model: tts-1 (faster, cheaper) or tts-1-hd (higher quality)
-            response = self.client.audio.speech.create(
-                model="tts-1",  # Use tts-1-hd for better quality
-                voice=selected_voice,
-                input=text,
-                speed=speed
-            )
+            async with self._request_slots:
+                response = await self.client.audio.speech.create(
+                    model="tts-1",  # Use tts-1-hd for better quality
+                    voice=selected_voice,
+                    input=text,
+                    speed=speed
+                )
             
             # Step 5: Get audio bytes
             # OpenAI returns audio in MP3 format
@@ -118,7 +140,13 @@ class TextToSpeechService:
             
             logger.info(f"Speech generated: {len(audio_bytes)} bytes")
             
-            # Step 6: Return audio bytes
+            # Step 6: Cache and return audio bytes
+            with _tts_cache_lock:
+                _tts_cache[cache_key] = (time.monotonic() + TTS_CACHE_TTL_SECONDS, audio_bytes)
+                _tts_cache.move_to_end(cache_key)
+                if len(_tts_cache) > TTS_CACHE_SIZE:
+                    _tts_cache.popitem(last=False)
+            
             return audio_bytes
             
         except Exception as e:
@@ -126,7 +154,105 @@ class TextToSpeechService:
             logger.error(f"TTS generation failed: {str(e)}")
             raise RuntimeError(f"Failed to generate speech: {str(e)}")
     
-    def generate_reminder_audio(
+    def stream_speech(
+        self, 
+        text: str, 
+        voice: Optional[str] = None,
+        speed: float = 1.0,
+        response_format: str = TTS_STREAM_FORMAT
+    ) -> AsyncIterator[bytes]:
+        """
+        Convert text to speech, yielding audio chunks as they arrive.
+        
+        Unlike generate_speech(), playback can start with the first
+        chunk instead of waiting for the whole file, and the full audio
+        is never held in memory. Not cached.
+        
+        What happens here:
+        1. Validate input now (so errors surface before streaming starts)
+        2. Return an iterator that opens a streaming TTS call and
+           relays its bytes in TTS_STREAM_CHUNK_BYTES chunks
+        
+        Parameters:
+        - text: Text to convert to speech
+        - voice: Voice name (alloy, echo, fable, onyx, nova, shimmer)
+        - speed: Speed of speech (0.25 to 4.0, default 1.0)
+        - response_format: Audio format ("opus" by default, or "mp3")
+        
+        Returns:
+        - Async iterator of audio byte chunks
+        
+        Called by:
+        - API route in app/api/voice.py (TTS streaming endpoint)
+        """
+        
+        # Step 1: Validate text, voice and speed
+        selected_voice, speed = self._validate_request(text, voice, speed)
+        
+        logger.info(f"Streaming speech for: '{text[:50]}...'")
+        
+        # Step 2: Stream the audio
+        async def audio_chunks() -> AsyncIterator[bytes]:
+            try:
+                async with self._request_slots:
+                    async with self.client.audio.speech.with_streaming_response.create(
+                        model="tts-1",
+                        voice=selected_voice,
+                        input=text,
+                        speed=speed,
+                        response_format=response_format
+                    ) as response:
+                        async for chunk in response.iter_bytes(chunk_size=TTS_STREAM_CHUNK_BYTES):
+                            yield chunk
+            except Exception as e:
+                logger.error(f"TTS streaming failed: {str(e)}")
+                raise RuntimeError(f"Failed to generate speech: {str(e)}")
+        
+        return audio_chunks()
+    
+    def _validate_request(
+        self, 
+        text: str, 
+        voice: Optional[str],
+        speed: float
+    ) -> Tuple[str, float]:
+        """
+        Validate a TTS request.
+        
+        Parameters:
+        - text: Text to convert to speech (must not be empty)
+        - voice: Requested voice (default voice if missing or invalid)
+        - speed: Requested speed (1.0 if outside 0.25 to 4.0)
+        
+        Returns:
+        - (voice, speed) to send to the API
+        
+        Called by:
+        - generate_speech() and stream_speech() methods
+        """
+        
+        # Step 1: Validate input
+        if not text or not text.strip():
+            logger.error("Empty text provided for TTS")
+            raise ValueError("Text cannot be empty")
+        
+        # Step 2: Use provided voice or default
+        selected_voice = voice if voice else self.default_voice
+        
+        # Validate voice option
+        valid_voices = ["alloy", "echo", "fable", "onyx", "nova", "shimmer"]
+        if selected_voice not in valid_voices:
+            logger.warning(f"Invalid voice '{selected_voice}', using default")
+            selected_voice = self.default_voice
+        
+        # Step 3: Validate speed
+        if speed < 0.25 or speed > 4.0:
+            logger.warning(f"Invalid speed {speed}, using 1.0")
+            speed = 1.0
+        
+        return selected_voice, speed
+    
+    async def generate_reminder_audio(
         self, 
         medicine_name: str, 
         dosage: str,
@@ -162,7 +288,7 @@ class TextToSpeechService:
         message = f"Time to take your medicine. {medicine_name}, {dosage}. Please take it now."
         
         # Generate speech with slower speed for clarity
-        audio = self.generate_speech(
+        audio = await self.generate_speech(
             text=message,
             voice="nova",  # Clear female voice
             speed=0.9  # Slightly slower for elderly users
@@ -170,7 +296,7 @@ class TextToSpeechService:
         
         return audio
     
-    def generate_confirmation_audio(self, message: str) -> bytes:
+    async def generate_confirmation_audio(self, message: str) -> bytes:
         """
         Generate confirmation message audio.
         
@@ -189,10 +315,24 @@ class TextToSpeechService:
         logger.info(f"Creating confirmation: {message}")
         
         # Generate speech with friendly voice
-        audio = self.generate_speech(
+        audio = await self.generate_speech(
             text=message,
             voice="nova",
             speed=1.0
         )
         
-        return audio
\ No newline at end of file
+        return audio
+
+
+@functools.lru_cache(maxsize=1)
+def get_tts_service(api_key: str) -> TextToSpeechService:
+    """
+    Return the process-wide TextToSpeechService for this API key.
+    
+    The service uses the shared OpenAI client from
+    app/services/openai_client.py, so its connection pool stays warm.
+    
+    Called by:
+    - API routes in app/api/voice.py
+    """
+    return TextToSpeechService(api_key=api_key)
@@ -5,196 +5,363 @@ This script checks exactly what API key is being loaded
 and why it might not be working.
 """
 
+import functools
+import io
 import os
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
+from typing import NamedTuple
 
-print("=" * 70)
-print("API KEY DEBUG SCRIPT")
-print("=" * 70)
+# Output is collected here and written in one go by _flush()
+# (one write instead of one per line)
+_out = io.StringIO()
+
+
+def _print(*args) -> None:
+    """print() into the output buffer."""
+    print(*args, file=_out)
+
+
+def _flush() -> None:
+    """Write the buffered output to stdout and empty the buffer."""
+    sys.stdout.write(_out.getvalue())
+    sys.stdout.flush()
+    _out.seek(0)
+    _out.truncate()
+
+
+# Parse .env once; every check below reads from this dict
+# (None if python-dotenv is not installed, {} if there is no .env file)
+try:
+    from dotenv import dotenv_values
+    _parsed_env = dotenv_values(".env") if Path(".env").exists() else {}
+except ImportError:
+    _parsed_env = None
+
+# Characters that break an API key when pasted into .env: whitespace and quotes
+_BAD_CHARS = re.compile(r'[\s"\']')
+
+# Characters an HTTP header cannot carry: non-ASCII (smart quotes, non-breaking
+# spaces from copy-paste) and control characters (newlines, tabs)
+_UNSENDABLE_CHARS = re.compile(r'[^\x20-\x7e]')
+
+class KeyReport(NamedTuple):
+    """Everything the checks print about one API key."""
+    length: int
+    prefix_ok: bool     # starts with sk-proj- or sk-
+    has_space: bool
+    has_quote: bool
+    has_newline: bool
+    has_unsendable: bool  # non-ASCII or control characters
+    head: str           # first 10 characters
+    tail: str           # last 10 characters
+    masked: str         # first 10 ... last 4
+
+
+@functools.lru_cache(maxsize=4)
+def _inspect_key(key: str) -> KeyReport:
+    """Inspect a key once; checks 3-5 see the same key and reuse the report."""
+    bad_chars = set(_BAD_CHARS.findall(key))
+    return KeyReport(
+        length=len(key),
+        prefix_ok=key.startswith("sk-"),  # also covers sk-proj-
+        has_space=' ' in bad_chars,
+        has_quote=bool(bad_chars & {'"', "'"}),
+        has_newline=bool(bad_chars & {'\n', '\r'}),
+        has_unsendable=bool(_UNSENDABLE_CHARS.search(key)),
+        head=key[:10],
+        tail=key[-10:],
+        masked=f"{key[:10]}...{key[-4:]}"
+    )
+
+
+# httpx timeouts apply per phase (connect, write, read, pool), so 2 s each
+# keeps the whole probe under the 10 s check 5 waits for it
+PROBE_PHASE_TIMEOUT_SECONDS = 2
+PROBE_WAIT_SECONDS = 10
+
+
+def _setting(name: str):
+    """A setting as the server sees it: shell variable first, then .env."""
+    return os.environ.get(name) or (_parsed_env or {}).get(name)
+
+
+def _probe_openai(api_key: str):
+    """
+    Network part of check 5: one authenticated request with the key.
+    
+    Returns the HTTP status code, or the exception if httpx is missing,
+    the key cannot be sent in a header, or the request failed (never
+    raises). Never cached: a revoked key must show up here.
+    """
+    
+    # Such a key fails while building the request, not at the API
+    if _inspect_key(api_key).has_unsendable:
+        return ValueError("key contains non-ASCII or control characters and cannot be sent")
+    
+    try:
+        import httpx  # Only imported when a probe actually runs
+    except ImportError as e:
+        return e
+    
+    # Same endpoint and organization/project the OpenAI SDK would use
+    base_url = (_setting("OPENAI_BASE_URL") or "https://api.openai.com/v1").rstrip("/")
+    headers = {"Authorization": f"Bearer {api_key}"}
+    if _setting("OPENAI_ORG_ID"):
+        headers["OpenAI-Organization"] = _setting("OPENAI_ORG_ID")
+    if _setting("OPENAI_PROJECT_ID"):
+        headers["OpenAI-Project"] = _setting("OPENAI_PROJECT_ID")
+    
+    # Cheapest authenticated call: one model's metadata
+    # (same 200/401 signal as listing every model, a fraction of the payload)
+    try:
+        response = httpx.get(
+            f"{base_url}/models/gpt-4o-mini",
+            headers=headers,
+            timeout=httpx.Timeout(PROBE_PHASE_TIMEOUT_SECONDS)
+        )
+    except httpx.TransportError as e:
+        # Network failure (DNS, TLS, timeout): the key was never checked
+        return ConnectionError(f"{type(e).__name__}: {e}")
+    except Exception as e:
+        # Anything else (bad header value, bad OPENAI_BASE_URL) is reported as is
+        return e
+    
+    return response.status_code
+
+
+# The key from .env, looked up once and shared by checks 3-5
+_API_KEY = (_parsed_env or {}).get("OPENAI_API_KEY")
+
+# Start the network probe now so it runs while checks 1-4 do local work.
+# config.py will see this key (a shell variable wins over .env);
+# check 5 probes again itself only if config ends up with another key.
+_PROBE_KEY = os.environ.get("OPENAI_API_KEY") or _API_KEY
+_probe_executor = ThreadPoolExecutor(max_workers=1)
+_probe_future = _probe_executor.submit(_probe_openai, _PROBE_KEY) if _PROBE_KEY else None
+
+_print("=" * 70)
+_print("API KEY DEBUG SCRIPT")
+_print("=" * 70)
 
 # Check 1: Current working directory
-print("\n1. CURRENT WORKING DIRECTORY")
-print(f"   {os.getcwd()}")
+_print("\n1. CURRENT WORKING DIRECTORY")
+_print(f"   {os.getcwd()}")
 
 # Check 2: Check if .env file exists in current directory
-print("\n2. CHECKING .env FILE LOCATION")
+_print("\n2. CHECKING .env FILE LOCATION")
 env_file = Path(".env")
 if env_file.exists():
-    print(f"   ✅ .env file found at: {env_file.absolute()}")
+    _print(f"   ✅ .env file found at: {env_file.absolute()}")
     
-    # Read .env file content
-    with open(env_file, 'r') as f:
-        content = f.read()
-        print(f"\n   .env file content:")
-        print("   " + "-" * 60)
-        for line in content.split('\n'):
-            if line.strip() and not line.startswith('#'):
-                # Mask the API key for security
-                if 'OPENAI_API_KEY' in line:
-                    parts = line.split('=')
-                    if len(parts) == 2:
-                        key = parts[1].strip()
-                        if len(key) > 10:
-                            masked = f"{key[:7]}...{key[-4:]}"
-                            print(f"   OPENAI_API_KEY={masked}")
-                        else:
-                            print(f"   ⚠️  OPENAI_API_KEY is too short: {line}")
-                    else:
-                        print(f"   ⚠️  Invalid format: {line}")
-                else:
-                    print(f"   {line}")
-    print("   " + "-" * 60)
+    # Show parsed .env content
+    _print(f"\n   .env file content:")
+    _print("   " + "-" * 60)
+    if _parsed_env is None:
+        _print(f"   (python-dotenv not installed, cannot parse .env)")
+    for name, value in (_parsed_env or {}).items():
+        if value is None:
+            _print(f"   ⚠️  Invalid format: {name}")
+        # Mask the API key for security
+        elif name == 'OPENAI_API_KEY':
+            if len(value) > 10:
+                masked = f"{value[:7]}...{value[-4:]}"
+                _print(f"   OPENAI_API_KEY={masked}")
+            else:
+                _print(f"   ⚠️  OPENAI_API_KEY is too short: {name}={value}")
+        else:
+            _print(f"   {name}={value}")
+    _print("   " + "-" * 60)
 else:
-    print(f"   ❌ .env file NOT found in current directory!")
-    print(f"   Looking for: {env_file.absolute()}")
+    _print(f"   ❌ .env file NOT found in current directory!")
+    _print(f"   Looking for: {env_file.absolute()}")
 
-# Check 3: Try loading with python-dotenv
-print("\n3. LOADING WITH python-dotenv")
-try:
-    from dotenv import load_dotenv
-    
-    # Load from current directory
-    result = load_dotenv()
-    print(f"   load_dotenv() returned: {result}")
-    
-    # Try to get the key
-    api_key = os.getenv("OPENAI_API_KEY")
-    
-    if api_key:
-        print(f"   ✅ API Key loaded successfully")
-        print(f"   Length: {len(api_key)} characters")
-        print(f"   Starts with: {api_key[:10]}...")
-        print(f"   Ends with: ...{api_key[-10:]}")
+# Check 3: Key as parsed by python-dotenv
+def _check_dotenv() -> None:
+    """Check 3: report the key exactly as python-dotenv parsed it."""
+    _print("\n3. LOADING WITH python-dotenv")
+    if _parsed_env is not None:
+        _print(f"   dotenv_values() found {len(_parsed_env)} variables")
         
-        # Check if it looks valid
-        if api_key.startswith("sk-proj-") or api_key.startswith("sk-"):
-            print(f"   ✅ Key format looks correct")
+        if _API_KEY:
+            report = _inspect_key(_API_KEY)
+            _print(f"   ✅ API Key loaded successfully")
+            _print(f"   Length: {report.length} characters")
+            _print(f"   Starts with: {report.head}...")
+            _print(f"   Ends with: ...{report.tail}")
+            
+            # Check if it looks valid
+            if report.prefix_ok:
+                _print(f"   ✅ Key format looks correct")
+            else:
+                _print(f"   ⚠️  Key doesn't start with 'sk-proj-' or 'sk-'")
+                _print(f"   First 20 chars: {_API_KEY[:20]}")
+            
+            # Check for common issues
+            if report.has_space:
+                _print(f"   ❌ WARNING: Key contains spaces!")
+            if report.has_quote:
+                _print(f"   ❌ WARNING: Key contains quotes!")
+            if report.has_newline:
+                _print(f"   ❌ WARNING: Key contains newline characters!")
+            if report.has_unsendable:
+                _print(f"   ❌ WARNING: Key contains non-ASCII or control characters!")
+                
         else:
-            print(f"   ⚠️  Key doesn't start with 'sk-proj-' or 'sk-'")
-            print(f"   First 20 chars: {api_key[:20]}")
-        
-        # Check for common issues
-        if ' ' in api_key:
-            print(f"   ❌ WARNING: Key contains spaces!")
-        if '"' in api_key or "'" in api_key:
-            print(f"   ❌ WARNING: Key contains quotes!")
-        if '\n' in api_key or '\r' in api_key:
-            print(f"   ❌ WARNING: Key contains newline characters!")
+            _print(f"   ❌ API Key is None (not loaded)")
+            _print(f"   Check if OPENAI_API_KEY is set in .env file")
             
     else:
-        print(f"   ❌ API Key is None (not loaded)")
-        print(f"   Check if OPENAI_API_KEY is set in .env file")
-        
-except ImportError:
-    print(f"   ❌ python-dotenv not installed")
-    print(f"   Install with: pip install python-dotenv")
+        _print(f"   ❌ python-dotenv not installed")
+        _print(f"   Install with: pip install python-dotenv")
+
 
 # Check 4: Try loading from app.config
-print("\n4. CHECKING app.config")
-try:
-    # Add app directory to path
-    sys.path.insert(0, os.path.join(os.getcwd(), 'app'))
-    
-    from config import OPENAI_API_KEY
-    
-    if OPENAI_API_KEY:
-        print(f"   ✅ API Key loaded from config.py")
-        print(f"   Length: {len(OPENAI_API_KEY)} characters")
-        print(f"   Starts with: {OPENAI_API_KEY[:10]}...")
-        print(f"   Ends with: ...{OPENAI_API_KEY[-10:]}")
+def _check_config() -> tuple:
+    """Check 4: import app config (the key the server uses); returns (key, import error)."""
+    # Import app config once here; check 5 reuses the result
+    # (config_error holds the exception if the import failed)
+    config_key = None
+    config_error = None
+    try:
+        # Add app directory to path
+        sys.path.insert(0, os.path.join(os.getcwd(), 'app'))
         
-        # Compare with direct load
-        direct_key = os.getenv("OPENAI_API_KEY")
-        if direct_key == OPENAI_API_KEY:
-            print(f"   ✅ Matches direct load from .env")
-        else:
-            print(f"   ⚠️  Different from direct load!")
-            if direct_key:
-                print(f"      Direct: {direct_key[:10]}...{direct_key[-10:]}")
-            print(f"      Config: {OPENAI_API_KEY[:10]}...{OPENAI_API_KEY[-10:]}")
+        from config import OPENAI_API_KEY as config_key
+    except Exception as e:
+        config_error = e
+    
+    _print("\n4. CHECKING app.config")
+    if isinstance(config_error, ImportError):
+        _print(f"   ❌ Could not import config: {config_error}")
+    elif config_error is not None:
+        _print(f"   ❌ Error: {config_error}")
     else:
-        print(f"   ❌ OPENAI_API_KEY is None in config.py")
+        OPENAI_API_KEY = config_key
         
-except ImportError as e:
-    print(f"   ❌ Could not import config: {e}")
-except Exception as e:
-    print(f"   ❌ Error: {e}")
+        if OPENAI_API_KEY:
+            report = _inspect_key(OPENAI_API_KEY)
+            _print(f"   ✅ API Key loaded from config.py")
+            _print(f"   Length: {report.length} characters")
+            _print(f"   Starts with: {report.head}...")
+            _print(f"   Ends with: ...{report.tail}")
+            
+            # Compare with direct load (a shell variable wins over .env in config.py)
+            direct_key = _API_KEY
+            if direct_key == OPENAI_API_KEY:
+                _print(f"   ✅ Matches direct load from .env")
+            else:
+                _print(f"   ⚠️  Different from direct load!")
+                if direct_key:
+                    _print(f"      Direct: {direct_key[:10]}...{direct_key[-10:]}")
+                _print(f"      Config: {report.head}...{report.tail}")
+        else:
+            _print(f"   ❌ OPENAI_API_KEY is None in config.py")
+    
+    return config_key, config_error
+
 
 # Check 5: Test actual OpenAI connection
-print("\n5. TESTING OPENAI CONNECTION")
-try:
-    from openai import OpenAI
+def _test_openai(test_key) -> None:
+    """Check 5: report the probe result for the key (usually already finished in the background)."""
+    _print("\n5. TESTING OPENAI CONNECTION")
     
-    # Get key from config or environment
-    test_key = None
-    try:
-        from config import OPENAI_API_KEY
-        test_key = OPENAI_API_KEY
-    except:
-        test_key = os.getenv("OPENAI_API_KEY")
+    if not test_key:
+        _print(f"   ❌ No API key available for testing")
+        return
     
-    if test_key:
-        print(f"   Testing with key: {test_key[:10]}...{test_key[-4:]}")
-        
+    _print(f"   Testing with key: {_inspect_key(test_key).masked}")
+    _print(f"   Testing API connection...")
+    _flush()  # Show progress while waiting for the probe
+    
+    if _probe_future is not None and test_key == _PROBE_KEY:
         try:
-            client = OpenAI(api_key=test_key)
-            print(f"   ✅ OpenAI client created successfully")
-            
-            # Try a simple API call (list models)
-            print(f"   Testing API connection...")
-            models = client.models.list()
-            print(f"   ✅ API CONNECTION SUCCESSFUL!")
-            print(f"   Your API key is VALID and WORKING!")
-            
+            result = _probe_future.result(timeout=PROBE_WAIT_SECONDS)
+        except FutureTimeoutError:
+            result = TimeoutError(f"no response within {PROBE_WAIT_SECONDS} seconds")
         except Exception as e:
-            print(f"   ❌ OpenAI API Error: {e}")
-            error_str = str(e)
-            if "401" in error_str:
-                print(f"   ❌ ERROR 401: Invalid API Key")
-                print(f"   The key is being loaded but is INVALID")
-            elif "429" in error_str:
-                print(f"   ⚠️  ERROR 429: Rate limit or quota exceeded")
-            else:
-                print(f"   Unknown error")
+            result = e
     else:
-        print(f"   ❌ No API key available for testing")
-        
-except ImportError:
-    print(f"   ❌ openai library not installed")
-    print(f"   Install with: pip install openai")
+        result = _probe_openai(test_key)
+    
+    if isinstance(result, ImportError):
+        _print(f"   ❌ httpx library not installed")
+        _print(f"   Install with: pip install httpx")
+    elif isinstance(result, ValueError):
+        _print(f"   ❌ Key not sent: {result}")
+        _print(f"   Retype the key (copy-paste can add smart quotes or hidden characters)")
+    elif isinstance(result, (ConnectionError, TimeoutError)):
+        _print(f"   ❌ Connection failed: {result}")
+        _print(f"   Could not reach the API; check network, proxy or OPENAI_BASE_URL")
+    elif isinstance(result, Exception):
+        _print(f"   ❌ OpenAI API Error: {result}")
+        _print(f"   Unknown error")
+    elif result == 200:
+        _print(f"   ✅ API CONNECTION SUCCESSFUL!")
+        _print(f"   Your API key is VALID and WORKING!")
+    elif result == 401:
+        _print(f"   ❌ ERROR 401: Invalid API Key")
+        _print(f"   The key is being loaded but is INVALID")
+    elif result in (403, 404):
+        _print(f"   ⚠️  ERROR {result}: Key valid, model not accessible")
+        _print(f"   The key authenticated but cannot use gpt-4o-mini (project or org permissions)")
+    elif result == 429:
+        _print(f"   ⚠️  ERROR 429: Rate limit or quota exceeded")
+    else:
+        _print(f"   ❌ OpenAI API Error: HTTP {result}")
+        _print(f"   Unknown error")
+
+
+# Check 3 reads ./.env only, so it is skipped without one.
+# Checks 4-5 always run: config.py's load_dotenv() also searches parent
+# directories, so the server may still find a key from the wrong cwd.
+if env_file.exists():
+    _check_dotenv()
+else:
+    _print("\n3. LOADING WITH python-dotenv")
+    _print("   Skipped: no .env file in the current directory")
+
+config_key, config_error = _check_config()
+
+# Get key from config, or (if config could not be imported) the key
+# config.py would pick: shell variable first, then .env
+_test_openai(config_key if config_error is None else _PROBE_KEY)
+_probe_executor.shutdown(wait=False, cancel_futures=True)
 
 # Check 6: Compare with what other person has
-print("\n6. COMPARISON CHECKLIST")
-print("   Ask the other person to run this script and compare:")
-print("   - .env file location")
-print("   - API key length (should be same)")
-print("   - API key first 10 and last 10 characters (should be same)")
-print("   - Whether OpenAI client creation succeeds")
+_print("\n6. COMPARISON CHECKLIST")
+_print("   Ask the other person to run this script and compare:")
+_print("   - .env file location")
+_print("   - API key length (should be same)")
+_print("   - API key first 10 and last 10 characters (should be same)")
+_print("   - Whether the OpenAI connection test succeeds")
 
-print("\n" + "=" * 70)
-print("DEBUG COMPLETE")
-print("=" * 70)
+_print("\n" + "=" * 70)
+_print("DEBUG COMPLETE")
+_print("=" * 70)
 
 # Final recommendations
-print("\n📋 RECOMMENDATIONS:")
-print("\nIf API key is loading but shows as invalid:")
-print("  1. Copy the EXACT key the other person is using")
-print("  2. Delete your entire .env file")
-print("  3. Create fresh .env file")
-print("  4. Paste: OPENAI_API_KEY=sk-proj-xxxxx")
-print("  5. Save with NO extra spaces, NO quotes")
-print("  6. Run this script again")
-print("  7. Restart your server")
-
-print("\nIf .env file is not being found:")
-print("  1. Make sure .env is in same directory as run.py")
-print("  2. Check file name is exactly '.env' (not '.env.txt')")
-print("  3. Make sure no spaces in filename")
-
-print("\nIf key loads but test shows 401 error:")
-print("  1. The key itself is invalid/expired")
-print("  2. Get fresh key from: https://platform.openai.com/api-keys")
-print("  3. The other person might be using different key")
-
-print("\n" + "=" * 70)
\ No newline at end of file
+_print("\n📋 RECOMMENDATIONS:")
+_print("\nIf API key is loading but shows as invalid:")
+_print("  1. Copy the EXACT key the other person is using")
+_print("  2. Delete your entire .env file")
+_print("  3. Create fresh .env file")
+_print("  4. Paste: OPENAI_API_KEY=sk-proj-xxxxx")
+_print("  5. Save with NO extra spaces, NO quotes")
+_print("  6. Run this script again")
+_print("  7. Restart your server")
+
+_print("\nIf .env file is not being found:")
+_print("  1. Make sure .env is in same directory as run.py")
+_print("  2. Check file name is exactly '.env' (not '.env.txt')")
+_print("  3. Make sure no spaces in filename")
+
+_print("\nIf key loads but test shows 401 error:")
+_print("  1. The key itself is invalid/expired")
+_print("  2. Get fresh key from: https://platform.openai.com/api-keys")
+_print("  3. The other person might be using different key")
+
+_print("\n" + "=" * 70)
+_flush()
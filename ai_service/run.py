@@ -5,23 +5,49 @@ This file is a simple entry point to run the FastAPI application
 using Uvicorn.
 
 It allows developers to start the server using:
-    python run.py
+    python run.py             (production-style: no auto-reload)
+    python run.py --reload    (development: restart on code changes)
+
+Environment variables:
+- MED_AI_RELOAD=1: same as --reload
+- MED_AI_WORKERS: number of worker processes (default 1, ignored with reload)
 
 No business logic should be written here.
 """
 
+import argparse
+import importlib.util
+import os
+
 import uvicorn
 
 
+def _installed_or_auto(module: str) -> str:
+    """Use the C implementation if it is installed (uvloop has no Windows build)."""
+    return module if importlib.util.find_spec(module) else "auto"
+
+
 if __name__ == "__main__":
+    # Auto-reload is opt-in: its file watcher costs startup time and
+    # keeps polling forever, which production does not need
+    parser = argparse.ArgumentParser(description="Run the AI service")
+    parser.add_argument("--reload", action="store_true", help="restart on code changes")
+    args = parser.parse_args()
+
+    reload = args.reload or os.environ.get("MED_AI_RELOAD") == "1"
+
+    # Several worker processes use all cores; uvicorn cannot combine them with reload
+    workers = 1 if reload else int(os.environ.get("MED_AI_WORKERS", "1"))
+
     # Start the FastAPI application
     # host="0.0.0.0" allows access from other devices if needed
-    # reload=True enables auto-reload during development
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True
+        reload=reload,
+        workers=workers,
+        # C event loop and C HTTP parser instead of asyncio's selector loop and h11
+        loop=_installed_or_auto("uvloop"),
+        http=_installed_or_auto("httptools")
     )
-
-